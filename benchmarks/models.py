@@ -0,0 +1,83 @@
+import math
+import numpy
+import epyc
+from epycsense.lhs.lhslab import UNIFORM_DISTRIBUTION
+
+# Reference material for the test functions:
+#
+# Ishigami T, Homma T.
+# "An importance quantification technique in uncertainty analysis for computer models."
+# Proc. First International Symposium on Uncertainty Modeling and Analysis 1990; 398-403. doi:10.1109/ISUMA.1990.151285
+#
+# Saltelli A, Sobol' IM.
+# "About the use of rank transformation in sensitivity analysis of model output."
+# Reliab Eng Syst Saf 1995; 50: 225-39. doi:10.1016/0951-8320(95)00099-2
+
+
+def ishigami(x1, x2, x3, a=7.0, b=0.1):
+    """
+    Ishigami function, for inputs uniform on [-pi, pi].
+    """
+    return numpy.sin(x1) + a * numpy.sin(x2) ** 2 + b * x3 ** 4 * numpy.sin(x1)
+
+
+def sobol_g(x, a):
+    """
+    Sobol' G function, for inputs uniform on [0, 1]. Smaller values of a give more important inputs.
+    :param x: array of inputs, with the parameters along the last axis
+    :param a: array of the coefficient of each parameter
+    """
+    return numpy.prod((numpy.abs(4 * x - 2) + a) / (1 + a), axis=-1)
+
+
+def parameter_name(i):
+    return 'x{0}'.format(i)
+
+
+def result_name(j):
+    return 'y{0}'.format(j)
+
+
+class IshigamiModel(epyc.Experiment):
+    """
+    Ishigami function of x0, x1 and x2 (any further parameters are ignored), with each output using a different
+    value of a so that the outputs differ.
+    """
+
+    def __init__(self, outputs=1):
+        epyc.Experiment.__init__(self)
+        self._outputs = outputs
+
+    def do(self, params):
+        x = [params[parameter_name(i)] for i in range(3)]
+        return {result_name(j): float(ishigami(x[0], x[1], x[2], a=7.0 + j)) for j in range(self._outputs)}
+
+
+class SobolGModel(epyc.Experiment):
+    """
+    Sobol' G function of x0 ... x(k-1), with each output using a different ordering of importance.
+    """
+
+    def __init__(self, parameters, outputs=1):
+        epyc.Experiment.__init__(self)
+        self._parameters = parameters
+        self._outputs = outputs
+
+    def do(self, params):
+        x = numpy.array([params[parameter_name(i)] for i in range(self._parameters)])
+        return {result_name(j): float(sobol_g(x, numpy.roll(numpy.arange(self._parameters) / 2.0, j)))
+                for j in range(self._outputs)}
+
+
+def uniform_parameters(k, low=0.0, high=1.0):
+    """
+    Lab parameters of k uncertain parameters, as used by the samplers.
+    """
+    return {parameter_name(i): [low, high, UNIFORM_DISTRIBUTION] for i in range(k)}
+
+
+def ishigami_parameters(k=3):
+    """
+    Lab parameters for the Ishigami model, with any parameters beyond the third having no effect.
+    """
+    return uniform_parameters(k, -math.pi, math.pi)
@@ -0,0 +1,307 @@
+"""
+Time and memory benchmarks of the samplers and analysers over scaling grids of parameter count, sample size,
+resamples and output count, using the synthetic models in models.py.
+
+Each case runs in a fresh process, so that its peak memory isn't hidden by an earlier case, and reports the best
+time of several repeats and the peak resident memory of the timed calls above that held by their inputs. On Linux
+the peak is reset once the inputs are set up, so that memory used only while setting them up isn't counted; elsewhere
+only growth beyond the peak reached during setup is seen. The cases with three parameters use the Ishigami model and
+the others Sobol' G. Results are written one JSON object per line, so that runs of different releases can be compared:
+
+    PYTHONPATH=. python benchmarks/run_benchmarks.py --scale full --output release.jsonl
+    PYTHONPATH=. python benchmarks/run_benchmarks.py --output current.jsonl --compare release.jsonl
+"""
+import argparse
+import itertools
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import shutil
+import sys
+import tempfile
+import time
+import traceback
+
+import numpy
+import pandas
+import epyc
+
+from epycsense import *
+from models import IshigamiModel, SobolGModel, uniform_parameters, ishigami_parameters
+
+# Scaling grids of each benchmark, as lists of values for each argument of the benchmark
+GRIDS = {
+    'quick': {
+        'lhs_samples': {'parameters': [5, 20], 'samples': [1000, 10000]},
+        'efast_sample_matrix': {'parameters': [5, 20], 'samples': [65, 257], 'resamples': [1, 5]},
+        'scatter_samples': {'parameters': [5, 20], 'values': [11, 101]},
+        'aggregate': {'parameters': [3, 5], 'samples': [1000], 'repetitions': [1, 10], 'outputs': [1, 10]},
+        'get_all_prcc': {'parameters': [3, 5, 20], 'samples': [1000], 'outputs': [1, 10]},
+        'generate_sensitivity_indices': {'parameters': [3, 5], 'samples': [65, 257], 'resamples': [1, 5],
+                                         'outputs': [1, 10]},
+    },
+    'full': {
+        'lhs_samples': {'parameters': [5, 20, 100], 'samples': [1000, 10000, 100000]},
+        'efast_sample_matrix': {'parameters': [5, 20, 100], 'samples': [65, 257, 1025], 'resamples': [1, 5, 10]},
+        'scatter_samples': {'parameters': [5, 20, 100], 'values': [11, 101, 1001]},
+        'aggregate': {'parameters': [3, 5, 20], 'samples': [1000, 10000], 'repetitions': [1, 10],
+                      'outputs': [1, 10, 100]},
+        'get_all_prcc': {'parameters': [3, 5, 20, 100], 'samples': [1000, 10000, 100000], 'outputs': [1, 10, 100]},
+        'generate_sensitivity_indices': {'parameters': [3, 5, 20], 'samples': [65, 257, 1025], 'resamples': [1, 5],
+                                         'outputs': [1, 10, 100]},
+    },
+}
+
+# Timed repeats of each case (the best is reported)
+REPEATS = 3
+# Interference factor of the EFAST designs
+INTERFERENCE = 4
+
+
+class Quiet(object):
+    """
+    Discard anything printed (the EFAST sampler reports the size of each design).
+    """
+
+    def __enter__(self):
+        self._stdout = sys.stdout
+        sys.stdout = open(os.devnull, 'w')
+
+    def __exit__(self, *args):
+        sys.stdout.close()
+        sys.stdout = self._stdout
+
+
+def model_for(parameters, outputs):
+    """
+    Ishigami for three parameters (which it's defined on) and Sobol' G otherwise.
+    :return: (model, lab parameters)
+    """
+    if parameters == 3:
+        return IshigamiModel(outputs), ishigami_parameters()
+    return SobolGModel(parameters, outputs), uniform_parameters(parameters)
+
+
+def fill_notebook(notebook, points, model, repetitions=1, noise=0.0):
+    """
+    Add the model's results at each point to the notebook, as a lab would, without the overhead of running the
+    experiments through a lab.
+    """
+    for params in points:
+        results = model.do(params)
+        for _ in range(repetitions):
+            run = {r: v + noise * numpy.random.randn() for (r, v) in results.iteritems()} if noise else results
+            notebook.addResult({epyc.Experiment.PARAMETERS: params,
+                                epyc.Experiment.RESULTS: run,
+                                epyc.Experiment.METADATA: {epyc.Experiment.STATUS: True}})
+
+
+# Each benchmark takes the values of its grid and a working directory, and returns the function to time (with its
+# inputs already set up) and the number of items it handles, from which a throughput is reported.
+
+def bench_lhs_samples(directory, parameters, samples):
+    ps = uniform_parameters(parameters)
+    return (lambda: lhs_samples(dict(ps), samples, seed=1)), samples
+
+
+def bench_efast_sample_matrix(directory, parameters, samples, resamples):
+    ps = uniform_parameters(parameters)
+    size = efast_design_size(samples, ps, resamples, [])
+    return (lambda: efast_sample_matrix(samples, INTERFERENCE, dict(ps), resamples, [], seed=1)), size
+
+
+def bench_scatter_samples(directory, parameters, values):
+    ps = {'x{0}'.format(i): list(numpy.linspace(0, 1, values)) for i in range(parameters)}
+    return (lambda: scatter_samples(ps)), parameters * (values - 1) + 1
+
+
+def bench_aggregate(directory, parameters, samples, repetitions, outputs):
+    model, ps = model_for(parameters, outputs)
+    nb = AggregationJSONNotebook(os.path.join(directory, 'aggregate.json'), create=True)
+    fill_notebook(nb, lhs_samples(ps, samples, seed=1), model, repetitions, noise=0.1)
+
+    def run():
+        # Re-aggregate every point each time, rather than timing the cached DataFrame
+        nb.set_reducer(MEAN)
+        return nb.dataframe_aggregated()
+
+    return run, samples * repetitions
+
+
+def bench_get_all_prcc(directory, parameters, samples, outputs):
+    model, ps = model_for(parameters, outputs)
+    nb = LatinHypercubeJSONNotebook(os.path.join(directory, 'prcc.json'), create=True)
+    fill_notebook(nb, lhs_samples(ps, samples, seed=1), model)
+    nb.dataframe_aggregated()
+    return nb.get_all_prcc, samples
+
+
+def bench_generate_sensitivity_indices(directory, parameters, samples, resamples, outputs):
+    model, ps = model_for(parameters, outputs)
+    nb = EFASTJSONNotebook(os.path.join(directory, 'efast.json'), create=True)
+    design = efast_sample_matrix(samples, INTERFERENCE, ps, resamples, [], seed=1)
+    fill_notebook(nb, design, model)
+    nb.dataframe_aggregated()
+    return nb.generate_sensitivity_indices, len(design)
+
+
+BENCHMARKS = {
+    'lhs_samples': bench_lhs_samples,
+    'efast_sample_matrix': bench_efast_sample_matrix,
+    'scatter_samples': bench_scatter_samples,
+    'aggregate': bench_aggregate,
+    'get_all_prcc': bench_get_all_prcc,
+    'generate_sensitivity_indices': bench_generate_sensitivity_indices,
+}
+
+
+def _status_mb(field):
+    # Memory reported by Linux for this process, or None on other platforms
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith(field + ':'):
+                    return int(line.split()[1]) / 1024.0
+    except IOError:
+        pass
+    return None
+
+
+def reset_peak_memory():
+    """
+    Reset the peak resident memory of this process to its current resident memory, where the platform allows it.
+    :return: the current resident memory in MB, or None if the peak can't be reset
+    """
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+    except IOError:
+        return None
+    return _status_mb('VmRSS')
+
+
+def peak_memory_mb():
+    peak = _status_mb('VmHWM')
+    if peak is not None:
+        return peak
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    scale = 1024.0 * 1024.0 if sys.platform == 'darwin' else 1024.0
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale
+
+
+def run_case(name, grid, queue):
+    """
+    Run one case of a benchmark (in its own process), putting its record on the queue.
+    """
+    directory = tempfile.mkdtemp(prefix='epycsense-bench-')
+    record = {'benchmark': name, 'grid': grid}
+    try:
+        with Quiet():
+            numpy.random.seed(1)
+            f, items = BENCHMARKS[name](directory, **grid)
+            # Memory held by the inputs, which isn't counted against the timed calls
+            before = reset_peak_memory()
+            if before is None:
+                before = peak_memory_mb()
+            times = []
+            for _ in range(REPEATS):
+                start = time.time()
+                f()
+                times.append(time.time() - start)
+            record.update({'seconds': min(times),
+                           'items': items,
+                           'items_per_second': items / min(times) if min(times) > 0 else None,
+                           'peak_memory_mb': peak_memory_mb() - before})
+    except Exception:
+        record['error'] = traceback.format_exc()
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+    queue.put(record)
+
+
+def cases(scale, names):
+    for name in names:
+        grid = GRIDS[scale][name]
+        keys = sorted(grid.keys())
+        for values in itertools.product(*[grid[k] for k in keys]):
+            yield name, dict(zip(keys, values))
+
+
+def environment():
+    return {'python': platform.python_version(),
+            'numpy': numpy.__version__,
+            'pandas': pandas.__version__,
+            'machine': platform.machine(),
+            'processors': multiprocessing.cpu_count()}
+
+
+def case_key(record):
+    return record['benchmark'], tuple(sorted(record['grid'].items()))
+
+
+def load_records(fn):
+    with open(fn) as f:
+        return {case_key(r): r for r in (json.loads(line) for line in f if line.strip())}
+
+
+def compare(records, baseline, threshold):
+    """
+    Report the cases that are slower (or use more memory) than the baseline by more than the threshold ratio.
+    :return: number of regressions
+    """
+    regressions = 0
+    for record in records:
+        base = baseline.get(case_key(record))
+        if base is None or 'error' in record or 'error' in base:
+            continue
+        for measure in ['seconds', 'peak_memory_mb']:
+            # Ignore differences in measurements too small to be reliable
+            if record[measure] > threshold * max(base[measure], 0.01 if measure == 'seconds' else 1.0):
+                regressions += 1
+                sys.stderr.write('REGRESSION {0} {1}: {2} {3:.3f} -> {4:.3f}\n'.format(
+                    record['benchmark'], record['grid'], measure, base[measure], record[measure]))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scale', choices=sorted(GRIDS.keys()), default='quick',
+                        help='size of the scaling grids')
+    parser.add_argument('--benchmark', action='append', choices=sorted(BENCHMARKS.keys()),
+                        help='benchmark to run (may be repeated; default all)')
+    parser.add_argument('--output', help='file to write the results to as JSON lines (default standard output)')
+    parser.add_argument('--compare', help='results of an earlier run to check for regressions against')
+    parser.add_argument('--threshold', type=float, default=1.5,
+                        help='ratio to the earlier run counted as a regression')
+    args = parser.parse_args(argv)
+
+    names = args.benchmark or sorted(BENCHMARKS.keys())
+    env = environment()
+    out = open(args.output, 'w') if args.output else sys.stdout
+    records = []
+    try:
+        for (name, grid) in cases(args.scale, names):
+            sys.stderr.write('{0} {1}\n'.format(name, grid))
+            queue = multiprocessing.Queue()
+            process = multiprocessing.Process(target=run_case, args=(name, grid, queue))
+            process.start()
+            record = queue.get()
+            process.join()
+            record.update({'scale': args.scale, 'environment': env})
+            records.append(record)
+            out.write(json.dumps(record, sort_keys=True) + '\n')
+            out.flush()
+    finally:
+        if args.output:
+            out.close()
+
+    failures = len([r for r in records if 'error' in r])
+    if args.compare:
+        failures += compare(records, load_records(args.compare), args.threshold)
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
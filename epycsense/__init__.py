@@ -1,4 +1,9 @@
+from design import *
+from parallel import *
 from correlation import *
 from lhs import *
 from efast import *
+from sobol import *
+from screening import *
+from surrogate import *
 from aggregated import *
\ No newline at end of file
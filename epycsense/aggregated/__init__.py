@@ -1 +1,3 @@
-from aggregationnotebook import *
\ No newline at end of file
+from aggregationnotebook import *
+from columnarnotebook import *
+from convergence import *
\ No newline at end of file
@@ -1,60 +1,455 @@
 from epyc import *
+from epyc.jsonlabnotebook import MetadataEncoder
 
+import os
+import json
 import numpy
 from pandas import DataFrame
 
+JOURNAL_EXTENSION = '.journal'
+
+# Reducers for the repetitions at a point
+MEAN = 'mean'
+MEDIAN = 'median'
+VARIANCE = 'var'
+
+
+def reduce_groups(grouped, reducer):
+    """
+    Reduce each group of a pandas GroupBy, vectorised over all groups and columns for the built-in reducers.
+    :param grouped: DataFrame grouped by point
+    :param reducer: MEAN, MEDIAN or VARIANCE (with one degree of freedom), a quantile (a number between 0 and 1), or
+    a function taking an array of the values in a group and returning their aggregate
+    :return: DataFrame with a row per group
+    """
+    if callable(reducer):
+        return grouped.agg(lambda values: reducer(numpy.asarray(values)))
+    elif reducer in [MEAN, MEDIAN, VARIANCE]:
+        return getattr(grouped, reducer)()
+    assert isinstance(reducer, (int, float)) and 0 <= reducer <= 1, "Invalid reducer: {0}".format(reducer)
+    return grouped.quantile(reducer)
+
+
+def reduce_arrays(values, counts, reducer):
+    """
+    Reduce groups of array-valued results element-wise, as reduce_groups does for single values.
+    :param values: array of shape (repetitions, result length), with the repetitions of each group together
+    :param counts: number of repetitions in each group
+    :param reducer: as for reduce_groups, with functions given an array of shape (repetitions, result length)
+    :return: array of shape (groups, result length)
+    """
+    starts = numpy.concatenate([[0], numpy.cumsum(counts)[:-1]])
+    if reducer == MEAN:
+        return numpy.add.reduceat(values, starts, axis=0) / numpy.asarray(counts, dtype=float)[:, numpy.newaxis]
+    if callable(reducer):
+        function = reducer
+    elif reducer == MEDIAN:
+        function = lambda group: numpy.median(group, axis=0)
+    elif reducer == VARIANCE:
+        function = lambda group: numpy.var(group, axis=0, ddof=1)
+    else:
+        assert isinstance(reducer, (int, float)) and 0 <= reducer <= 1, "Invalid reducer: {0}".format(reducer)
+        function = lambda group: numpy.percentile(group, 100.0 * reducer, axis=0)
+    return numpy.array([function(values[start:start + count]) for (start, count) in zip(starts, counts)])
+
+
+class RowColumns(object):
+    """
+    Named columns of values appended a row at a time (e.g. one row per run), each with an integer label, and
+    converted to NumPy arrays only when they are needed. Only the rows appended since the last conversion are
+    converted. A column missing from some rows holds NaN in them.
+    """
+
+    def __init__(self):
+        self._names = []
+        # Values and labels of the rows appended since the last conversion
+        self._lists = {}
+        self._labels = []
+        self._arrays = {}
+        self._label_array = numpy.zeros(0, dtype=int)
+        self._rows = 0
+
+    def __len__(self):
+        return self._rows
+
+    def names(self):
+        return list(self._names)
+
+    def append(self, values, label=0):
+        pending = len(self._labels)
+        for (name, v) in values.iteritems():
+            column = self._lists.get(name)
+            if column is None:
+                self._names.append(name)
+                column = self._lists[name] = [numpy.nan] * pending
+            column.append(v)
+        self._labels.append(label)
+        self._rows += 1
+        if len(values) < len(self._lists):
+            for column in self._lists.itervalues():
+                if len(column) == pending:
+                    column.append(numpy.nan)
+
+    def arrays(self):
+        """
+        :return: (dict of an array of the values of each column, array of labels)
+        """
+        if self._labels:
+            converted = len(self._label_array)
+            for name in self._names:
+                tail = numpy.asarray(self._lists[name])
+                if tail.dtype.kind in 'SU':
+                    tail = numpy.asarray(self._lists[name], dtype=object)
+                if name in self._arrays:
+                    self._arrays[name] = numpy.concatenate([self._arrays[name], tail])
+                elif converted == 0:
+                    self._arrays[name] = tail
+                else:
+                    # A new column, missing from the rows already converted
+                    head = numpy.empty((converted,) + tail.shape[1:], dtype=float if tail.dtype != object else object)
+                    head.fill(numpy.nan)
+                    self._arrays[name] = numpy.concatenate([head, tail])
+                self._lists[name] = []
+            self._label_array = numpy.concatenate([self._label_array, self._labels])
+            self._labels = []
+        return self._arrays, self._label_array
+
 
 class AggregationJSONNotebook(JSONLabNotebook):
+    """
+    JSON notebook which aggregates repeated runs at the same parameter point.
+
+    Results are journalled as they are added: each call to addResult appends a line to <name>.journal and flushes
+    it, so the cost of recording a run doesn't depend on the size of the notebook. Committing writes the notebook
+    (to a new file, which replaces the old one) and removes the journal. If a run is interrupted before it commits,
+    opening the notebook again replays the journal, so no completed results are lost.
+    """
+
+    # Whether results are journalled between commits
+    _journalled = True
+
     def __init__(self, name, create=False, description=None):
-        self._aggregated_results = []
+        # Parameters of each point with successful results, in the order they were first seen, and the position of
+        # each point (keyed as per the notebook's results) in them
+        self._points = RowColumns()
+        self._point_positions = {}
+        # Results of each successful run, labelled with the position of its point
+        self._runs = RowColumns()
+        # Positions of the points whose results have changed since they were last aggregated
+        self._stale_points = set()
+        # Aggregated value of each result at each point
+        self._aggregated_values = {}
+        self._aggregated_table = None
+        self._aggregated_results = None
+        self._uncertain_parameters = None
         self._parameters = []
         self._result_keys = []
+        self._reducer = MEAN
+        # Open journal file, and the number of times the journal has been compacted into the notebook
+        self._journal = None
+        self._journal_generation = 0
+        self._replaying_journal = False
         JSONLabNotebook.__init__(self, name, create, description)
 
+        if self._journalled:
+            if create:
+                self._remove_journal()
+            else:
+                self._replay_journal()
+
+    def journal_name(self):
+        return self.name() + JOURNAL_EXTENSION
+
+    def _load(self, fn):
+        # As JSONLabNotebook, but also reads the journal generation
+        if os.path.getsize(fn) == 0:
+            self._description = None
+            self._results = dict()
+            self._pending = dict()
+            self._journal_generation = 0
+        else:
+            with open(fn, 'r') as f:
+                j = json.load(f)
+            self._description = j['description']
+            self._pending = dict(j['pending'])
+            self._results = j['results']
+            self._journal_generation = j.get('journal_generation', 0)
+            self.patch()
+
+        # Anything loaded from file has yet to be aggregated
+        for (k, rs) in self._results.iteritems():
+            # Results are held newest first
+            for res in reversed(rs):
+                if isinstance(res, dict):
+                    self._record_run(k, res)
+
+    def _save(self, fn):
+        generation = self._journal_generation + 1
+        j = json.dumps({'description': self.description(),
+                        'pending': self._pending,
+                        'results': self._results,
+                        'journal_generation': generation},
+                       indent=4,
+                       cls=MetadataEncoder)
+
+        # Write alongside and then replace, so a crash while writing leaves the previous notebook (and the
+        # journal) intact. The journal is then redundant, and the generation marks it as such if it survives.
+        temporary = fn + '.tmp'
+        with open(temporary, 'w') as f:
+            f.write(j)
+            f.flush()
+            os.fsync(f.fileno())
+        os.rename(temporary, fn)
+        self._journal_generation = generation
+        self._remove_journal()
+
+    def _remove_journal(self):
+        if self._journal is not None:
+            self._journal.close()
+            self._journal = None
+        if os.path.exists(self.journal_name()):
+            os.remove(self.journal_name())
+
+    def _write_journal(self, result, jobids):
+        """
+        Append a result to the journal, starting the journal if needed. The journal is a header line holding the
+        generation of the notebook it extends, then a JSON line per call to addResult.
+        """
+        if self._journal is None:
+            self._journal = open(self.journal_name(), 'w')
+            self._journal.write(json.dumps({'generation': self._journal_generation}) + '\n')
+        self._journal.write(json.dumps({'result': result, 'jobids': jobids}, cls=MetadataEncoder) + '\n')
+        self._journal.flush()
+
+    def _replay_journal(self):
+        """
+        Add any results journalled since the notebook was last committed, and commit them.
+        """
+        fn = self.journal_name()
+        if not os.path.isfile(fn):
+            return
+
+        entries = []
+        with open(fn, 'r') as f:
+            for line in f:
+                try:
+                    entries.append(json.loads(line))
+                except ValueError:
+                    # A line cut short by a crash, which must be the last
+                    break
+        if not entries or entries[0]['generation'] < self._journal_generation:
+            # Empty, or already committed to the notebook
+            self._remove_journal()
+            return
+
+        self._replaying_journal = True
+        try:
+            for entry in entries[1:]:
+                result = entry['result']
+                self._patch_result(result)
+                jobids = entry['jobids']
+                if jobids is not None:
+                    # Pending results may have been cancelled since the notebook was committed
+                    jobids = [j for j in (jobids if isinstance(jobids, list) else [jobids]) if j in self._pending]
+                self.addResult(result, jobids)
+        finally:
+            self._replaying_journal = False
+        self.commit()
+
+    def _patch_result(self, result):
+        """Patch the timing metadata of journalled results back into datetimes, as patch() does on loading."""
+        if isinstance(result, list):
+            for res in result:
+                self._patch_result(res)
+        elif isinstance(result[Experiment.RESULTS], list):
+            self._patch_result(result[Experiment.RESULTS])
+        elif result[Experiment.METADATA][Experiment.STATUS]:
+            self._patchDatetimeMetadata(result, Experiment.START_TIME)
+            self._patchDatetimeMetadata(result, Experiment.END_TIME)
+
+    def addResult(self, result, jobids=None):
+        if self._journalled and not self._replaying_journal:
+            self._write_journal(result, jobids)
+        self._add_result(result)
+
+        # Resolve the pending results, as JSONLabNotebook does but without listing the keys
+        if jobids is not None:
+            for jobid in (jobids if isinstance(jobids, list) else [jobids]):
+                if jobid not in self._pending:
+                    raise RuntimeError('Internal structure error for {j}'.format(j=jobid))
+                k = self._pending.pop(jobid)
+                self._results[k].remove(jobid)
+
+    def _add_result(self, result):
+        """
+        Store a result, unpacking lists and nested results as JSONLabNotebook does. Each result is stored in
+        constant time, however many results the notebook holds.
+        """
+        if isinstance(result, list):
+            for res in result:
+                self._add_result(res)
+        elif isinstance(result, dict):
+            if isinstance(result[Experiment.RESULTS], list):
+                for res in result[Experiment.RESULTS]:
+                    self._add_result(res)
+            else:
+                k = self._parametersAsIndex(result[Experiment.PARAMETERS])
+                self._results.setdefault(k, []).insert(0, result)
+                self._record_run(k, result)
+        else:
+            raise Exception("Can't deal with results like this: {r}".format(r=result))
+
+    def _record_run(self, k, result):
+        """
+        Add a successful run to the run table, from which the repetitions at each point are aggregated.
+        :param k: key of the run's point
+        :param result: results dict of the run
+        """
+        if not result[Experiment.METADATA][Experiment.STATUS]:
+            return
+        position = self._point_positions.get(k)
+        if position is None:
+            position = self._point_positions[k] = len(self._points)
+            self._points.append(result[Experiment.PARAMETERS])
+        self._runs.append(result[Experiment.RESULTS], position)
+        self._stale_points.add(position)
+
+    def set_reducer(self, reducer):
+        """
+        Set how the repetitions at each point are aggregated, re-aggregating any points already aggregated.
+        :param reducer: MEAN, MEDIAN or VARIANCE, a quantile (a number between 0 and 1), or a function taking an
+        array of the repetitions (along its first axis) and returning their aggregate
+        """
+        self._reducer = reducer
+        self._stale_points.update(range(len(self._points)))
+
     def aggregate(self):
+        """
+        Aggregate the successful repetitions at every point whose results have changed since it was last aggregated.
+        The runs of all these points are taken from the run table and reduced together (see reduce_groups) rather
+        than point by point.
+        """
         # Warn if there's still results pending
         if self._pending:
             print "Warning: Some results are pending"
 
-        for k,r in self._results.iteritems():
-            params = r[0][Experiment.PARAMETERS]
-            if not self._parameters:
-                self._parameters = params.keys()
-            results = [k[Experiment.RESULTS] for k in r]
-            agg_result = self._aggregate_row(results)
-            if not self._result_keys:
-                self._result_keys = agg_result.keys()
-            self._aggregated_results.append({Experiment.PARAMETERS: params,
-                                             Experiment.RESULTS: agg_result})
+        params, _ = self._points.arrays()
+        runs, positions = self._runs.arrays()
+        self._parameters = self._points.names()
+        self._result_keys = self._runs.names()
+        points = len(self._points)
+
+        if self._stale_points:
+            if len(self._stale_points) < points:
+                stale = numpy.in1d(positions, numpy.fromiter(self._stale_points, dtype=int))
+                positions = positions[stale]
+                runs = {rk: values[stale] for (rk, values) in runs.iteritems()}
+            self._stale_points = set()
+            aggregated_positions, aggregated = self._reduce_repetitions(runs, positions)
+
+            for rk in self._result_keys:
+                values = aggregated[rk]
+                current = self._aggregated_values.get(rk)
+                if current is None or len(current) < points:
+                    # Room for the new points
+                    extended = numpy.empty((points,) + values.shape[1:], dtype=values.dtype)
+                    if extended.dtype.kind == 'f':
+                        extended.fill(numpy.nan)
+                    if current is not None:
+                        extended[:len(current)] = current
+                    current = self._aggregated_values[rk] = extended
+                elif current.dtype != values.dtype and values.dtype.kind not in 'biu':
+                    current = self._aggregated_values[rk] = current.astype(values.dtype)
+                current[aggregated_positions] = values
+
+        data = dict(params)
+        for rk in self._result_keys:
+            values = self._aggregated_values.get(rk, numpy.zeros(0))
+            if values.ndim > 1:
+                # Array-valued results are held as an array per row
+                rows = numpy.empty(len(values), dtype=object)
+                rows[:] = list(values)
+                values = rows
+            data[rk] = values
+        self._aggregated_table = DataFrame(data, columns=self._parameters + self._result_keys)
+        self._aggregated_results = None
+        self._uncertain_parameters = None
+
+    def _reduce_repetitions(self, runs, positions):
+        """
+        Reduce the repetitions of a number of points.
+        :param runs: dict of an array of the values of each result, one per run
+        :param positions: array of the position of the point of each run
+        :return: (array of the positions of the points, dict of an array of the aggregated values of each result)
+        """
+        order = numpy.argsort(positions, kind='mergesort')
+        aggregated_positions, counts = numpy.unique(positions[order], return_counts=True)
+        aggregated = {}
+        scalars = {}
+        for (rk, values) in runs.iteritems():
+            if values.ndim > 1:
+                aggregated[rk] = reduce_arrays(values[order].astype(float), counts, self._reducer)
+            else:
+                scalars[rk] = values
+
+        if scalars:
+            frame = DataFrame(scalars)
+            reduced = reduce_groups(frame.groupby(positions), self._reducer)
+            for rk in scalars:
+                if rk in reduced.columns:
+                    aggregated[rk] = reduced[rk].values
+                else:
+                    # Values that can't be reduced (e.g. text) are taken from the first repetition
+                    aggregated[rk] = frame[rk].groupby(positions).first().values
+        return aggregated_positions, aggregated
 
     def aggregated_results(self):
+        if self._aggregated_results is None or self._stale_points:
+            df = self.dataframe_aggregated()
+            self._aggregated_results = [{Experiment.PARAMETERS: {p: row[p] for p in self._parameters},
+                                         Experiment.RESULTS: {r: row[r] for r in self._result_keys}}
+                                        for row in df.to_dict('records')]
         return self._aggregated_results
 
-    def _aggregate_row(self, repetition_data):
-        if len(repetition_data) == 1:
-            return repetition_data
-        else:
-            return {rk: numpy.mean([rep[rk] for rep in repetition_data]) for rk in repetition_data[0].keys()}
-
     def dataframe_aggregated(self):
-        if not self._aggregated_results:
+        """
+        The aggregated results as a DataFrame. This is maintained as results are added, so repeated calls are cheap.
+        The DataFrame is shared, so should be copied before being modified.
+        :return:
+        """
+        if self._stale_points or self._aggregated_table is None:
             self.aggregate()
+        return self._aggregated_table
 
-        def extract(r):
-            rd = r[Experiment.PARAMETERS].copy()
-            rd.update(r[Experiment.RESULTS])
-            return rd
-
-        records = [r for r in map(extract, self._aggregated_results) if r is not None]
-        return DataFrame.from_records(records)
+    def result_matrix(self, result, data=None):
+        """
+        Values of an array-valued result, such as a trajectory over time, as a single matrix.
+        :param result: result key
+        :param data: rows of the aggregated results to use, in order (defaults to dataframe_aggregated())
+        :return: array of shape (points, result length)
+        """
+        if data is None:
+            data = self.dataframe_aggregated()
+        return numpy.vstack(data[result].values).astype(float)
 
     def uncertain_parameters(self):
         df = self.dataframe_aggregated()
-        return [q for q in self._parameters if len(set(df[q])) > 1]
+        if self._uncertain_parameters is None:
+            self._uncertain_parameters = [q for q in self._parameters if df[q].nunique() > 1]
+        return list(self._uncertain_parameters)
 
     def certain_parameters(self):
-        df = self.dataframe_aggregated()
-        return [q for q in self._parameters if len(set(df[q])) == 1]
+        uncertain = self.uncertain_parameters()
+        return [q for q in self._parameters if q not in uncertain]
 
     def result_keys(self):
         return self._result_keys
+
+    def scalar_result_keys(self):
+        """
+        Result keys with a single value at every point. Array-valued results (see result_matrix) are left out, as
+        they're analysed a time point at a time by the _over_time variants of the analyses.
+        :return: list of result keys
+        """
+        df = self.dataframe_aggregated()
+        return [rk for rk in self.result_keys() if len(df) == 0 or numpy.ndim(df[rk].iloc[0]) == 0]
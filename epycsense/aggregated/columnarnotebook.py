@@ -0,0 +1,631 @@
+from epyc import *
+from epyc.jsonlabnotebook import MetadataEncoder
+
+import os
+import json
+import zlib
+import numpy
+from datetime import datetime, timedelta
+from pandas import DataFrame
+from .aggregationnotebook import AggregationJSONNotebook, reduce_groups
+
+EPOCH = datetime(1970, 1, 1)
+
+FLOAT_COLUMN = 'float'
+INTEGER_COLUMN = 'integer'
+BOOLEAN_COLUMN = 'boolean'
+DATETIME_COLUMN = 'datetime'
+STRING_COLUMN = 'string'
+JSON_COLUMN = 'json'
+
+NUMERIC_COLUMNS = [FLOAT_COLUMN, INTEGER_COLUMN, BOOLEAN_COLUMN]
+
+# Encodings of a column's values in its file
+PLAIN_ENCODING = 'plain'
+# The same value in every run, held in the index rather than a file
+CONSTANT_ENCODING = 'constant'
+# An integer code per run into a list of the distinct values, held in the index
+DICTIONARY_ENCODING = 'dictionary'
+
+# Storage options
+STORE_CONSTANTS = 'constants'
+STORE_DICTIONARIES = 'dictionaries'
+STORE_FLOAT32 = 'float32'
+STORE_COMPRESSED = 'compressed'
+
+
+def _value_type(v):
+    if isinstance(v, (bool, numpy.bool_)):
+        return BOOLEAN_COLUMN
+    elif isinstance(v, (int, long, numpy.integer)):
+        return INTEGER_COLUMN
+    elif isinstance(v, (float, numpy.floating)):
+        return FLOAT_COLUMN
+    elif isinstance(v, datetime):
+        return DATETIME_COLUMN
+    elif isinstance(v, basestring):
+        return STRING_COLUMN
+    else:
+        return JSON_COLUMN
+
+
+def _int_dtype(low, high, dtypes=('<i1', '<i2', '<i4', '<i8')):
+    """Narrowest of the given integer types holding the given range of values."""
+    for dtype in dtypes:
+        info = numpy.iinfo(numpy.dtype(dtype))
+        if info.min <= low and high <= info.max:
+            return dtype
+    return dtypes[-1]
+
+
+def _code_dtype(categories):
+    return _int_dtype(0, max(categories - 1, 0), ('<u1', '<u2', '<u4'))
+
+
+def _merge_types(t1, t2):
+    """Type of column able to hold values of both types."""
+    if t1 == t2:
+        return t1
+    elif t1 in NUMERIC_COLUMNS and t2 in NUMERIC_COLUMNS:
+        return FLOAT_COLUMN
+    else:
+        return JSON_COLUMN
+
+
+class ColumnarStorage(object):
+    """
+    Storage for a notebook as typed, memory-mapped NumPy column files rather than a single JSON document.
+
+    The notebook's name is a small JSON index holding the description, pending results and the name, section
+    (parameters, results or metadata) and type of every column. The values of each column are held in a binary
+    file alongside the index (in <name>.columns/), one value per run. Opening a notebook maps the column files
+    rather than reading them, and committing appends only the runs added since the last commit. A column is only
+    rewritten if its type has to change to hold new values (e.g. a longer string).
+
+    Analysis works from the columns directly. The dict-based view of the results used by epyc (results(),
+    resultsFor() and pending results) is only built, from the columns, if it is used.
+
+    Columns can be stored more compactly (see set_storage): a column with the same value in every run (e.g. a
+    certain parameter) held once in the index, text columns (e.g. EFAST's parameter of interest) and integer
+    columns (e.g. run numbers) held as narrow integer codes, floats held in single precision, and the column files
+    compressed a block per commit. Compressed columns are read into memory rather than mapped.
+
+    This is used ahead of a JSON notebook class, e.g. class EFASTColumnarNotebook(ColumnarStorage,
+    EFASTJSONNotebook), keeping that class's analysis and replacing its persistence.
+    """
+
+    SECTIONS = [Experiment.PARAMETERS, Experiment.RESULTS, Experiment.METADATA]
+
+    # Commits only append the new runs, so there's no call for a journal between them
+    _journalled = False
+
+    def __init__(self, name, create=True, description=None):
+        # Column definitions: dicts of section, name, type and (for text) width, in file order
+        self._column_definitions = []
+        # Committed values of each column, keyed by (section, name)
+        self._columns = {}
+        self._committed_rows = 0
+        # Results added since the last commit
+        self._new_rows = []
+        # Dict view of the results, built on demand
+        self._results_view = None
+        self._run_table = None
+        self._aggregated_table = None
+        self._uncertain_parameters = None
+        self._parameters = []
+        self._result_keys = []
+        self._storage = {STORE_CONSTANTS: False, STORE_DICTIONARIES: False, STORE_FLOAT32: False,
+                         STORE_COMPRESSED: False}
+        super(ColumnarStorage, self).__init__(name, create, description)
+        if self._committed_rows == 0 and not self._pending:
+            # Nothing stored, so there's no need to keep a dict view
+            self._results_view = None
+
+    # ---------- Dict view of results ----------
+
+    def _get_results(self):
+        if self._results_view is None:
+            self._results_view = {}
+            for result in self._stored_results():
+                k = self._parametersAsIndex(result[Experiment.PARAMETERS])
+                self._results_view.setdefault(k, []).insert(0, result)
+            for (jobid, k) in self._pending.iteritems():
+                self._results_view.setdefault(k, []).insert(0, jobid)
+        return self._results_view
+
+    def _set_results(self, results):
+        self._results_view = results
+
+    _results = property(_get_results, _set_results)
+
+    def _stored_results(self):
+        """
+        Rebuild the results dicts of every run from the columns.
+        :return: list of results dicts
+        """
+        rows = [{section: {} for section in self.SECTIONS} for _ in range(self._committed_rows)]
+        for definition in self._column_definitions:
+            values = self._decode(definition, self._columns[(definition['section'], definition['name'])])
+            for (row, v) in zip(rows, values):
+                if v is not None:
+                    row[definition['section']][definition['name']] = v
+        return rows + self._new_rows
+
+    # ---------- Adding results ----------
+
+    def addResult(self, result, jobids=None):
+        if isinstance(result, list):
+            for res in result:
+                self.addResult(res)
+        elif isinstance(result, dict):
+            if isinstance(result[Experiment.RESULTS], list):
+                for res in result[Experiment.RESULTS]:
+                    self.addResult(res)
+            else:
+                self._new_rows.append(result)
+                self._run_table = None
+                self._aggregated_table = None
+                if self._results_view is not None:
+                    # Keep the dict view in line
+                    super(ColumnarStorage, self).addResult(result)
+        else:
+            raise Exception("Can't deal with results like this: {r}".format(r=result))
+
+        if jobids is not None:
+            # Resolve the pending results, which are held in the dict view
+            super(ColumnarStorage, self).addResult([], jobids)
+
+    def numberOfResults(self):
+        return self._committed_rows + len(self._new_rows)
+
+    # ---------- Persistence ----------
+
+    def _column_file(self, fn, index):
+        return os.path.join(fn + '.columns', '{0}.bin'.format(index))
+
+    def _dtype(self, definition):
+        if definition['type'] in [FLOAT_COLUMN, DATETIME_COLUMN]:
+            return numpy.dtype('<f8')
+        elif definition['type'] == INTEGER_COLUMN:
+            return numpy.dtype('<i8')
+        elif definition['type'] == BOOLEAN_COLUMN:
+            return numpy.dtype('?')
+        else:
+            return numpy.dtype('S{0}'.format(max(definition['width'], 1)))
+
+    def _stored_dtype(self, definition):
+        return numpy.dtype(definition['dtype']) if 'dtype' in definition else self._dtype(definition)
+
+    def _map_column(self, fn, index, definition):
+        """
+        Values of a committed column, as mapped from (or for a compressed column, read from) its file.
+        :return: array of the column's values, as encoded by _encode
+        """
+        dtype = self._dtype(definition)
+        if self._committed_rows == 0:
+            return numpy.empty(0, dtype=dtype)
+        encoding = definition.get('encoding', PLAIN_ENCODING)
+        if encoding == CONSTANT_ENCODING:
+            return numpy.broadcast_to(numpy.array(self._index_value(definition['value']), dtype=dtype),
+                                      (self._committed_rows,))
+
+        stored_dtype = self._stored_dtype(definition)
+        if 'blocks' in definition:
+            with open(self._column_file(fn, index), 'rb') as f:
+                stored = numpy.frombuffer(''.join([zlib.decompress(f.read(size)) for size in definition['blocks']]),
+                                          dtype=stored_dtype)
+        else:
+            stored = numpy.memmap(self._column_file(fn, index), dtype=stored_dtype, mode='r',
+                                  shape=(self._committed_rows,))
+
+        if encoding == DICTIONARY_ENCODING:
+            return numpy.array([self._index_value(c) for c in definition['categories']], dtype=dtype)[stored]
+        return stored
+
+    def _index_value(self, v):
+        # Text is stored in the index as unicode
+        return v.encode('utf-8') if isinstance(v, unicode) else v
+
+    def _load(self, fn):
+        self._results_view = None
+        self._run_table = None
+        self._aggregated_table = None
+        self._new_rows = []
+        self._column_definitions = []
+        self._columns = {}
+        self._committed_rows = 0
+
+        # An empty index is an empty notebook
+        if os.path.getsize(fn) == 0:
+            self._description = None
+            self._pending = dict()
+            return
+
+        with open(fn, 'r') as f:
+            self._read_index(json.load(f))
+        for (index, definition) in enumerate(self._column_definitions):
+            self._truncate_column(fn, index, definition)
+            self._columns[(definition['section'], definition['name'])] = self._map_column(fn, index, definition)
+
+    def _truncate_column(self, fn, index, definition):
+        """
+        Cut a column file back to the runs recorded in the index. The index is written after the columns, so a
+        commit interrupted in between leaves runs on the end of the files that the notebook doesn't hold, and which
+        would otherwise be followed by the runs of the next commit.
+        """
+        if definition.get('encoding', PLAIN_ENCODING) == CONSTANT_ENCODING:
+            return
+        if 'blocks' in definition:
+            size = sum(definition['blocks'])
+        else:
+            size = self._committed_rows * self._stored_dtype(definition).itemsize
+        column_file = self._column_file(fn, index)
+        if os.path.exists(column_file) and os.path.getsize(column_file) > size:
+            with open(column_file, 'r+b') as f:
+                f.truncate(size)
+
+    def _read_index(self, j):
+        """
+        Take the notebook's state from its index file, as written by _index.
+        :param j: the parsed index
+        """
+        self._description = j['description']
+        self._pending = dict(j['pending'])
+        self._committed_rows = j['rows']
+        self._column_definitions = j['columns']
+        self._storage.update(j.get('storage', {}))
+
+    def _index(self):
+        """
+        The notebook's state other than the column data, as written to its index file.
+        :return: dict
+        """
+        return {'description': self.description(),
+                'pending': self._pending,
+                'rows': self._committed_rows,
+                'columns': self._column_definitions,
+                'storage': self._storage}
+
+    def _save(self, fn):
+        if not os.path.isdir(fn + '.columns'):
+            os.makedirs(fn + '.columns')
+
+        if self._new_rows:
+            self._append_rows(fn, self._new_rows)
+            self._new_rows = []
+
+        # Write alongside and then replace (as AggregationJSONNotebook does), so a crash while writing leaves the
+        # previous index intact
+        j = json.dumps(self._index(), indent=4, cls=MetadataEncoder)
+        temporary = fn + '.tmp'
+        with open(temporary, 'w') as f:
+            f.write(j)
+            f.flush()
+            os.fsync(f.fileno())
+        os.rename(temporary, fn)
+
+    def _append_rows(self, fn, rows):
+        """
+        Write the given results to the end of the column files.
+        :param fn: the index file name
+        :param rows: results dicts
+        """
+        # Values of every column for the new rows
+        new_values = {}
+        for (r, row) in enumerate(rows):
+            for section in self.SECTIONS:
+                for (name, v) in (row.get(section) or {}).iteritems():
+                    new_values.setdefault((section, name), [None] * len(rows))[r] = v
+
+        # Add any columns not seen before, with all earlier runs missing a value
+        for key in sorted(new_values.keys()):
+            if key not in self._columns:
+                present = [v for v in new_values[key] if v is not None]
+                self._column_definitions.append({'section': key[0], 'name': key[1],
+                                                 'type': _value_type(present[0]), 'width': 0})
+                self._columns[key] = None
+
+        for (index, definition) in enumerate(self._column_definitions):
+            key = (definition['section'], definition['name'])
+            values = new_values.get(key, [None] * len(rows))
+            if self._columns[key] is None:
+                existing = [None] * self._committed_rows
+            else:
+                existing = None
+            before = definition.copy()
+            if self._fit(definition, values) and existing is None:
+                existing = self._decode(before, self._columns[key])
+            if existing is not None:
+                # Column is new or has changed type, so write it in full
+                self._fit(definition, existing)
+                column = numpy.concatenate([self._encode(definition, existing), self._encode(definition, values)])
+                self._choose_storage(definition, column)
+                self._write_column(fn, index, definition, column)
+            else:
+                encoded = self._encode(definition, values)
+                if self._extend_storage(definition, encoded):
+                    self._write_column(fn, index, definition, encoded, append=True)
+                else:
+                    # The new values don't fit the column's storage, so write it in full
+                    column = numpy.concatenate([numpy.asarray(self._columns[key]), encoded])
+                    self._choose_storage(definition, column)
+                    self._write_column(fn, index, definition, column)
+
+        self._committed_rows += len(rows)
+        for (index, definition) in enumerate(self._column_definitions):
+            self._columns[(definition['section'], definition['name'])] = self._map_column(fn, index, definition)
+
+    def _choose_storage(self, definition, column):
+        """
+        Set the most compact storage allowed by the storage options for a column holding the given values.
+        :param definition: column definition
+        :param column: values of the column for every run, as encoded by _encode
+        """
+        for k in ['encoding', 'value', 'categories', 'dtype', 'blocks']:
+            definition.pop(k, None)
+        t = definition['type']
+
+        if self._storage[STORE_CONSTANTS] and len(column) > 0 and (column == column[0]).all():
+            definition['encoding'] = CONSTANT_ENCODING
+            definition['value'] = column[0].item()
+        elif self._storage[STORE_DICTIONARIES] and t in [STRING_COLUMN, JSON_COLUMN]:
+            categories = numpy.unique(column).tolist()
+            definition['encoding'] = DICTIONARY_ENCODING
+            definition['categories'] = categories
+            definition['dtype'] = _code_dtype(len(categories))
+        elif self._storage[STORE_DICTIONARIES] and t == INTEGER_COLUMN and len(column) > 0:
+            definition['dtype'] = _int_dtype(column.min(), column.max())
+        elif self._storage[STORE_FLOAT32] and t == FLOAT_COLUMN:
+            definition['dtype'] = '<f4'
+
+        if self._storage[STORE_COMPRESSED] and definition.get('encoding') != CONSTANT_ENCODING:
+            # Sizes of the compressed blocks in the file
+            definition['blocks'] = []
+
+    def _extend_storage(self, definition, values):
+        """
+        Check whether further values can be appended to a column without changing its storage, adding any new
+        values to its dictionary.
+        :param definition: column definition
+        :param values: the new values, as encoded by _encode
+        :return: True if the values can be appended
+        """
+        encoding = definition.get('encoding', PLAIN_ENCODING)
+        if encoding == CONSTANT_ENCODING:
+            return (values == self._index_value(definition['value'])).all()
+        elif encoding == DICTIONARY_ENCODING:
+            categories = [self._index_value(c) for c in definition['categories']]
+            new = sorted(set(values.tolist()) - set(categories))
+            # Codes are positions in the dictionary, so new values go on the end
+            definition['categories'] = categories + new
+            return _code_dtype(len(definition['categories'])) == definition['dtype']
+        elif 'dtype' in definition and definition['type'] == INTEGER_COLUMN and len(values) > 0:
+            info = numpy.iinfo(numpy.dtype(definition['dtype']))
+            return info.min <= values.min() and values.max() <= info.max
+        return True
+
+    def _write_column(self, fn, index, definition, values, append=False):
+        """
+        Write values to a column's file, as a compressed block if the column is compressed.
+        :param values: values as encoded by _encode, for every run or (if appending) the new runs
+        :param append: append the values rather than replacing the file
+        """
+        encoding = definition.get('encoding', PLAIN_ENCODING)
+        if encoding == CONSTANT_ENCODING:
+            if os.path.exists(self._column_file(fn, index)):
+                os.remove(self._column_file(fn, index))
+            return
+        elif encoding == DICTIONARY_ENCODING:
+            categories = numpy.array([self._index_value(c) for c in definition['categories']], dtype=values.dtype)
+            order = numpy.argsort(categories)
+            values = order[numpy.searchsorted(categories, values, sorter=order)]
+
+        data = values.astype(self._stored_dtype(definition)).tostring()
+        if 'blocks' in definition:
+            if not append:
+                definition['blocks'] = []
+            data = zlib.compress(data)
+            definition['blocks'].append(len(data))
+        with open(self._column_file(fn, index), 'ab' if append else 'wb') as f:
+            f.write(data)
+
+    def set_storage(self, constants=False, dictionaries=False, float32=False, compressed=False):
+        """
+        Set how columns are stored. The options apply to columns as they are written in full, i.e. when first
+        committed or when they change type; use compact() to rewrite all the committed columns.
+        :param constants: hold a column with the same value in every run in the index, rather than a file
+        :param dictionaries: hold text columns as codes into a dictionary of their values, and integer columns in
+        the narrowest integer type that fits
+        :param float32: hold floating point columns in single precision
+        :param compressed: compress each block of runs committed to a column file
+        """
+        self._storage = {STORE_CONSTANTS: constants, STORE_DICTIONARIES: dictionaries, STORE_FLOAT32: float32,
+                         STORE_COMPRESSED: compressed}
+
+    def compact(self):
+        """
+        Rewrite every committed column with the current storage options, and commit.
+        """
+        fn = self.name()
+        for (index, definition) in enumerate(self._column_definitions):
+            column = numpy.array(self._columns[(definition['section'], definition['name'])],
+                                 dtype=self._dtype(definition))
+            self._choose_storage(definition, column)
+            self._write_column(fn, index, definition, column)
+        for (index, definition) in enumerate(self._column_definitions):
+            self._columns[(definition['section'], definition['name'])] = self._map_column(fn, index, definition)
+        self.commit()
+
+    def _text(self, definition, v):
+        if definition['type'] == JSON_COLUMN:
+            return json.dumps(v, cls=MetadataEncoder)
+        elif isinstance(v, unicode):
+            return v.encode('utf-8')
+        return v
+
+    def _fit(self, definition, values):
+        """
+        Change the column's type or width if needed to hold the given values.
+        :return: True if the column changed
+        """
+        present = [v for v in values if v is not None]
+        t = definition['type']
+        for v in present:
+            t = _merge_types(t, _value_type(v))
+        if t == INTEGER_COLUMN and len(present) < len(values):
+            # Integers can't represent missing values
+            t = FLOAT_COLUMN
+        changed = t != definition['type']
+        definition['type'] = t
+        if t in [STRING_COLUMN, JSON_COLUMN]:
+            width = max([len(self._text(definition, v)) for v in present] + [0])
+            if width > definition['width']:
+                definition['width'] = width
+                changed = True
+        return changed
+
+    def _encode(self, definition, values):
+        t = definition['type']
+        if t == FLOAT_COLUMN:
+            values = [numpy.nan if v is None else v for v in values]
+        elif t == BOOLEAN_COLUMN:
+            values = [bool(v) for v in values]
+        elif t == DATETIME_COLUMN:
+            values = [numpy.nan if v is None else (v - EPOCH).total_seconds() for v in values]
+        elif t in [STRING_COLUMN, JSON_COLUMN]:
+            values = ['' if v is None else self._text(definition, v) for v in values]
+        return numpy.array(values, dtype=self._dtype(definition))
+
+    def _decode(self, definition, column):
+        """
+        Convert stored column values back to Python values, with None for missing values.
+        :return: list of values
+        """
+        t = definition['type']
+        values = column.tolist()
+        if t == FLOAT_COLUMN:
+            return [None if v != v else v for v in values]
+        elif t == DATETIME_COLUMN:
+            return [None if v != v else EPOCH + timedelta(seconds=v) for v in values]
+        elif t == STRING_COLUMN:
+            return [None if v == '' else v for v in values]
+        elif t == JSON_COLUMN:
+            return [None if v == '' else json.loads(v) for v in values]
+        return values
+
+    # ---------- Columnar access ----------
+
+    def column_names(self, section):
+        """
+        Names of the columns in the given section, across all runs added so far.
+        :param section: Experiment.PARAMETERS, Experiment.RESULTS or Experiment.METADATA
+        :return: list of names
+        """
+        names = [d['name'] for d in self._column_definitions if d['section'] == section]
+        for row in self._new_rows:
+            names.extend([n for n in (row.get(section) or {}).keys() if n not in names])
+        return names
+
+    def column(self, section, name):
+        """
+        Values of a column for every run. Numeric columns of committed runs are returned as mapped from file,
+        with NaN for missing values; other columns are returned as arrays of Python values.
+        :param section: Experiment.PARAMETERS, Experiment.RESULTS or Experiment.METADATA
+        :param name: column name
+        :return: array
+        """
+        key = (section, name)
+        definition = None
+        if key in self._columns:
+            definition = [d for d in self._column_definitions if (d['section'], d['name']) == key][0]
+
+        if not self._new_rows and definition is not None and definition['type'] in NUMERIC_COLUMNS:
+            return self._columns[key]
+
+        values = self._decode(definition, self._columns[key]) if definition is not None \
+            else [None] * self._committed_rows
+        values.extend([(row.get(section) or {}).get(name) for row in self._new_rows])
+        types = set(_value_type(v) for v in values if v is not None)
+        if types and all(t in NUMERIC_COLUMNS for t in types):
+            if None in values:
+                return numpy.array([numpy.nan if v is None else v for v in values], dtype=float)
+            return numpy.array(values)
+        array = numpy.empty(len(values), dtype=object)
+        array[:] = values
+        return array
+
+    def dataframe(self, only_successful=True):
+        """
+        Metadata, parameters and results of every run as a DataFrame, built from the columns. As for
+        epyc.LabNotebook.dataframe, results take precedence over parameters, which take precedence over metadata.
+        :param only_successful: include only successful experiments (defaults to True)
+        :return: DataFrame with one row per run
+        """
+        table = {}
+        for section in [Experiment.METADATA, Experiment.PARAMETERS, Experiment.RESULTS]:
+            for name in self.column_names(section):
+                table[name] = self.column(section, name)
+        df = DataFrame(table)
+        if only_successful and Experiment.STATUS in self.column_names(Experiment.METADATA):
+            df = df[self.column(Experiment.METADATA, Experiment.STATUS).astype(bool)]
+            df = df.dropna(axis=1, how='all')
+        return df
+
+    def run_table(self):
+        """
+        Parameters and results of every successful run as a DataFrame, built from the columns.
+        :return: DataFrame with one row per run
+        """
+        if self._run_table is None:
+            params = self.column_names(Experiment.PARAMETERS)
+            results = [r for r in self.column_names(Experiment.RESULTS) if r not in params]
+            table = {}
+            for p in params:
+                table[p] = self.column(Experiment.PARAMETERS, p)
+            for r in results:
+                table[r] = self.column(Experiment.RESULTS, r)
+            df = DataFrame(table, columns=params + results)
+            if Experiment.STATUS in self.column_names(Experiment.METADATA):
+                df = df[self.column(Experiment.METADATA, Experiment.STATUS).astype(bool)]
+            self._run_table = df
+        return self._run_table
+
+    # ---------- Aggregation ----------
+
+    def set_reducer(self, reducer):
+        self._reducer = reducer
+        self._aggregated_table = None
+
+    def aggregate(self):
+        """
+        Aggregate the repetitions at each point in the parameter space, grouping the runs by their parameters.
+        """
+        if self._pending:
+            print "Warning: Some results are pending"
+        runs = self.run_table()
+        self._parameters = self.column_names(Experiment.PARAMETERS)
+        self._result_keys = [r for r in runs.columns if r not in self._parameters and runs[r].dtype.kind in 'biuf']
+        if len(runs) == 0:
+            self._aggregated_table = DataFrame(columns=self._parameters + self._result_keys)
+        else:
+            self._aggregated_table = reduce_groups(runs.groupby(self._parameters, sort=False)[self._result_keys],
+                                                   self._reducer).reset_index()
+        self._uncertain_parameters = None
+
+    def dataframe_aggregated(self):
+        if self._aggregated_table is None:
+            self.aggregate()
+        return self._aggregated_table
+
+    def aggregated_results(self):
+        df = self.dataframe_aggregated()
+        return [{Experiment.PARAMETERS: {p: row[p] for p in self._parameters},
+                 Experiment.RESULTS: {r: row[r] for r in self._result_keys}}
+                for row in df.to_dict('records')]
+
+
+class AggregationColumnarNotebook(ColumnarStorage, AggregationJSONNotebook):
+    """
+    AggregationJSONNotebook analysis over memory-mapped column storage.
+    """
+    pass
@@ -0,0 +1,73 @@
+import numpy
+
+
+def index_ranking(indices, top=None):
+    """
+    Rank the parameters by the magnitude of their sensitivity index, separately for each result.
+    :param indices: dict of {(parameter, result): index value}
+    :param top: number of leading parameters to keep for each result. If None, keeps all.
+    :return: dict of {result: list of parameters, most sensitive first}
+    """
+    rankings = {}
+    for ((p, r), v) in sorted(indices.iteritems()):
+        rankings.setdefault(r, []).append((p, v))
+    return {r: [p for (p, v) in sorted(pvs, key=lambda pv: -abs(pv[1]))][:top] for (r, pvs) in rankings.iteritems()}
+
+
+def indices_converged(previous, current, tolerance, top=None):
+    """
+    Decide whether sensitivity indices have stopped changing between two successive batches of runs. The indices
+    have converged when no index has moved by more than the tolerance and, if top is given, the top-n ranking of the
+    parameters for every result is unchanged.
+    :param previous: dict of {(parameter, result): index value} from the earlier batch
+    :param current: dict of {(parameter, result): index value} from the later batch
+    :param tolerance: largest change in any index allowed
+    :param top: number of leading parameters whose ranking must not change. If None, the ranking is not checked.
+    :return: True if converged
+    """
+    if previous is None or sorted(previous.keys()) != sorted(current.keys()):
+        return False
+    change = numpy.max(numpy.abs([current[k] - previous[k] for k in current.keys()] + [0]))
+    if numpy.isnan(change) or change > tolerance:
+        return False
+    if top is not None and index_ranking(previous, top) != index_ranking(current, top):
+        return False
+    return True
+
+
+class Convergent(object):
+    """
+    Lab which runs its design in batches, growing the design after each batch until the sensitivity indices computed
+    from its notebook stop changing (see indices_converged).
+
+    This is used ahead of epyc.Lab or epyc.ClusterLab in the bases of a lab class, which provides the indices to
+    check and how the design grows between batches:
+
+    - _start_convergence(e) runs any first batch and returns the indices to compare the next batch with (or None)
+    - _next_batch(limit) grows the design for the next batch, or returns False if that would pass the limit
+    - _convergence_indices() returns the indices from the notebook as a dict of {(parameter, result): value}
+    """
+
+    def _run_until_converged(self, e, tolerance, top, limit):
+        """
+        Run batches of the experiment until the indices converge or the design reaches its limit.
+        :param e: the experiment
+        :param tolerance: largest change in any index between batches allowed for convergence
+        :param top: number of most sensitive parameters of each result whose ranking must be unchanged
+        :param limit: size of design at which to stop, even if not converged, or None
+        :return: True if the indices converged
+        """
+        previous = self._start_convergence(e)
+        while self._next_batch(limit):
+            self._run_batch(e)
+            current = self._convergence_indices()
+            if indices_converged(previous, current, tolerance, top):
+                return True
+            previous = current
+        return False
+
+    def _run_batch(self, e):
+        self.runExperiment(e)
+        # Cluster labs return before the results are in
+        if not self.ready():
+            self.wait()
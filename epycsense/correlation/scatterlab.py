@@ -1,4 +1,10 @@
 import epyc
+from .scatternotebook import ScatterJSONNotebook
+from ..design.oat import oat_baselines, oat_parameter_space, trajectory_parameter_space
+from ..design.resume import Resumable
+from ..design.streams import SeededDesign
+from ..parallel.chunkedsubmission import ChunkedSubmission
+from ..parallel.processpool import ProcessPoolExecution
 
 
 def scatter_samples(parameters):
@@ -7,62 +13,64 @@ def scatter_samples(parameters):
     middle value of all other samples.
 
     :returns: list of dicts"""
-    baseline_values = {}
+    space = oat_parameter_space(parameters)
+    if len(space.names()) == 0:
+        # Only certain parameters, so the baseline is the only sample
+        return [space.constants()]
+    return list(space)
 
-    param_samples = []
-    # Determine if each parameter is certain or uncertain
-    for param, param_range in parameters.iteritems():
-        if len(param_range) > 1:
-            baseline_values[param] = param_range[len(param_range) / 2]
-        else:
-            # Only one value so parameter is certain
-            baseline_values[param] = param_range[0]
 
-    # For every parameter, look all through all possible values
-    for param, param_range in parameters.iteritems():
-        for v in param_range:
-            # Don't use the baseline value (all params at baseline is included below)
-            if v != baseline_values[param]:
-                # Copy the baseline values
-                sample = baseline_values.copy()
-                # Overwrite the current param with the value
-                sample[param] = v
-                param_samples.append(sample)
+class ScatterDesign(SeededDesign):
+    """
+    Choice between a sweep and Morris trajectories, and the parameter space of either, shared by ScatterLab and
+    ScatterClusterLab. A seed makes the trajectories (a sweep isn't random) and the order in which a cluster lab
+    submits its points reproducible.
+    """
 
-    # Add sample with all parameters at baseline
-    param_samples.append(baseline_values.copy())
+    _trajectories = None
 
-    # Return the parameter space
-    return param_samples
+    def set_trajectories(self, trajectories):
+        """
+        Run Morris trajectories through the values of the parameters rather than a sweep of each parameter from the
+        baseline (see trajectory_parameter_space).
+        :param trajectories: number of trajectories, or None for a sweep
+        """
+        assert trajectories is None or trajectories >= 1, "Must have at least 1 trajectory"
+        self._trajectories = trajectories
 
+    def parameterSpace(self):
+        """Return the parameter space of the experiment as a sequence of dicts,
+        with each dict mapping each parameter name to a value. The dicts are
+        only created as the space is iterated over.
 
-class ScatterLab(epyc.Lab):
-    def __init__(self, notebook):
-        epyc.Lab.__init__(self, notebook)
-
-    def parameterSpace( self ):
-        """Return the parameter space of the experiment as a list of dicts,
-        with each dict mapping each parameter name to a value.
-
-        :returns: the parameter space as a list of dicts"""
+        :returns: the parameter space as a OneAtATimeSpace"""
         ps = self.parameters()
         if len(ps) == 0:
             return []
-        else:
-            return scatter_samples(self._parameters)
+        sweep = self._trajectories is None
+        # Record the baselines of a sweep (trajectories have none), so the notebook's scatter graphs needn't work
+        # them out from the results
+        if isinstance(self.notebook(), ScatterJSONNotebook):
+            self.notebook().set_baselines(oat_baselines(self._parameters) if sweep else {})
+        if sweep:
+            return self._remaining(oat_parameter_space(self._parameters))
+        return self._remaining(trajectory_parameter_space(self._parameters, self._trajectories, self._seed))
+
+
+class ScatterLab(ScatterDesign, Resumable, epyc.Lab):
+    pass
 
 
-class ScatterClusterLab(epyc.ClusterLab):
+class ScatterProcessPoolLab(ProcessPoolExecution, ScatterLab):
+    """
+    ScatterLab running on a pool of local worker processes rather than in this process.
+    """
+    pass
+
+class ScatterClusterLab(ChunkedSubmission, ScatterDesign, Resumable, epyc.ClusterLab):
     def __init__(self, notebook):
         epyc.ClusterLab.__init__(self, notebook)
 
-    def parameterSpace( self ):
-        """Return the parameter space of the experiment as a list of dicts,
-        with each dict mapping each parameter name to a value.
-
-        :returns: the parameter space as a list of dicts"""
-        ps = self.parameters()
-        if len(ps) == 0:
-            return []
-        else:
-            return scatter_samples(self._parameters)
+    def _mixup(self, ps):
+        # Shuffle the order of the points rather than swapping generated dicts
+        return ps.shuffle(self._seed)
@@ -1,75 +1,219 @@
 import epyc
+import json
 import matplotlib
 matplotlib.use('agg')
 import matplotlib.pyplot as plt
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+import multiprocessing
 import os
-import itertools
 import numpy
+from pandas import DataFrame
+from ..aggregated.aggregationnotebook import reduce_groups, MEAN
+from ..aggregated.columnarnotebook import ColumnarStorage
+from epyc.jsonlabnotebook import MetadataEncoder
+
+
+def scatter_baseline(values):
+    """
+    Baseline value of a parameter in a scatter design, for notebooks with no baseline recorded by the lab. Every
+    point but those varying the parameter itself has the parameter at its baseline, so this is the most common
+    value, or the middle value if the parameter is the only one varied.
+    :param values: array of the parameter's value at each point
+    :return: baseline value
+    """
+    unique, counts = numpy.unique(values, return_counts=True)
+    if (counts == counts.max()).sum() > 1:
+        return unique[len(unique) / 2]
+    return unique[numpy.argmax(counts)]
+
+
+def _render_scatter(task):
+    """
+    Render a scatter graph to file with the object-oriented Agg API, so that it needs none of pyplot's global state
+    and can be run in any process.
+    """
+    param, result, x_data, y_data, filename = task
+    figure = Figure()
+    FigureCanvasAgg(figure)
+    axes = figure.add_subplot(111)
+    axes.scatter(x_data, y_data)
+    axes.set_title('Correlation: {0} vs {1}'.format(param, result))
+    axes.set_xlabel(param)
+    axes.set_ylabel(result)
+    figure.savefig(filename)
+    return filename
 
 
 class ScatterJSONNotebook(epyc.JSONLabNotebook):
+    BASELINES = 'baselines'
+
     # TODO - using a JSON notebook, could be just a notebook
     def __init__(self, name, create=True, description=None):
+        # Baseline value of each uncertain parameter of a sweep, as recorded by the lab
+        self._baselines = {}
         epyc.JSONLabNotebook.__init__(self, name, create, description)
 
-    def _aggregate(self, data_row):
+    def _load(self, fn):
+        # As JSONLabNotebook, but also reads the baselines
+        if os.path.getsize(fn) == 0:
+            self._description = None
+            self._results = dict()
+            self._pending = dict()
+        else:
+            with open(fn, 'r') as f:
+                j = json.load(f)
+            self._description = j['description']
+            self._pending = dict(j['pending'])
+            self._results = j['results']
+            self._baselines = j.get(ScatterJSONNotebook.BASELINES, {})
+            self.patch()
+
+    def _save(self, fn):
+        j = json.dumps({'description': self.description(),
+                        'pending': self._pending,
+                        'results': self._results,
+                        ScatterJSONNotebook.BASELINES: self._baselines},
+                       indent=4,
+                       cls=MetadataEncoder)
+        with open(fn, 'w') as f:
+            f.write(j)
+
+    def set_baselines(self, baselines):
         """
-        Obtain results. Moved to a separate function to allow aggregation, average over repetitions or
-        :return:
+        Record the baseline of each uncertain parameter of a sweep (see oat_baselines). ScatterLab does this when it
+        generates a sweep.
+        :param baselines: dict of parameter name to baseline value
         """
-        # Multiple repetitions, so process
-        if len(data_row) > 1:
-            # Get parameters from first rep (will be same for all reps) and average the values over other rows
-            agg_row = {epyc.Experiment.PARAMETERS: data_row[0][epyc.Experiment.PARAMETERS],
-                       epyc.Experiment.RESULTS: {r: numpy.mean([rep[epyc.Experiment.RESULTS][r] for rep in data_row])
-                                                for r in data_row[0][epyc.Experiment.RESULTS]}}
-            return agg_row
-        # Only 1 run so just return it
-        else:
-            return data_row[0]
+        self._baselines = dict(baselines)
+
+    def baselines(self):
+        """
+        Baseline of each uncertain parameter of the sweep run into the notebook.
+        :return: dict of parameter name to baseline value, empty if no sweep has been recorded
+        """
+        return dict(self._baselines)
+
+    def column_names(self, section):
+        """
+        Names of the parameters, results or metadata values across all runs.
+        :param section: Experiment.PARAMETERS, Experiment.RESULTS or Experiment.METADATA
+        :return: list of names
+        """
+        names = []
+        seen = set()
+        for result in self.results():
+            for n in result.get(section) or {}:
+                if n not in seen:
+                    seen.add(n)
+                    names.append(n)
+        return names
+
+    def run_table(self):
+        """
+        Parameters and results of every successful run as a DataFrame.
+        :return: DataFrame with one row per run
+        """
+        params = self.column_names(epyc.Experiment.PARAMETERS)
+        results = [r for r in self.column_names(epyc.Experiment.RESULTS) if r not in params]
+        records = []
+        for result in self.results():
+            if result[epyc.Experiment.METADATA][epyc.Experiment.STATUS]:
+                record = dict(result[epyc.Experiment.PARAMETERS])
+                record.update(result[epyc.Experiment.RESULTS])
+                records.append(record)
+        return DataFrame.from_records(records, columns=params + results)
+
+    def scatter_series(self):
+        """
+        The data of every scatter graph, i.e. each uncertain parameter against each result, with the repetitions at
+        each point averaged. A graph of a parameter includes the points that vary it and the baseline point, but not
+        the points that hold it at its baseline while varying another parameter. The baselines are those recorded by
+        the lab (see set_baselines). Any parameter with no recorded baseline (e.g. in a notebook written before
+        baselines were recorded, or a design of Morris trajectories) has it worked out from the results (see
+        scatter_baseline).
+
+        Which points differ from the baseline in which parameter is worked out once, for all parameters, and each
+        series is then selected from the points with it.
+        :return: dict of (parameter, result) to (x values, y values) arrays
+        """
+        runs = self.run_table()
+        params = self.column_names(epyc.Experiment.PARAMETERS)
+        results = [r for r in runs.columns if r not in params and runs[r].dtype.kind in 'biuf']
+        points = reduce_groups(runs.groupby(params, sort=False)[results], MEAN).reset_index()
+
+        uncertain_parameters = [p for p in params if points[p].nunique() > 1]
+        values = points[uncertain_parameters].values
+        baselines = numpy.array([self._baselines[p] if p in self._baselines else scatter_baseline(points[p].values)
+                                 for p in uncertain_parameters], dtype=values.dtype)
+        # Points that differ from the baseline in each parameter, and the baseline point itself
+        differs = values != baselines
+        baseline_point = ~differs.any(axis=1)
+
+        outputs = {r: points[r].values for r in results}
+        series = {}
+        for i in range(len(uncertain_parameters)):
+            include = differs[:, i] | baseline_point
+            x_data = values[include, i]
+            for r in results:
+                series[(uncertain_parameters[i], r)] = (x_data, outputs[r][include])
+        return series
 
-    def plot_scatter_graphs(self, save=True, folder='', show=False):
+    def plot_scatter_graphs(self, save=True, folder='', show=False, processes=None):
+        """
+        Plot a scatter graph of each uncertain parameter against each result (see scatter_series), saving each as
+        <parameter>_<result>.png.
+        :param save: save the graphs to file
+        :param folder: folder to save the graphs in, created if needed
+        :param show: show each graph with pyplot (which is done in this process, after any saving)
+        :param processes: number of worker processes to render the graphs in. If None, renders in this process.
+        """
         if self.pendingResults():
             raise Exception("Not all results complete")
 
-        parameters = self.results()[0][epyc.Experiment.PARAMETERS].keys()
-        uncertain_parameters = {p: list(set(self.dataframe()[p].tolist())) for p in parameters if
-                                       len(set(self.dataframe()[p].tolist())) > 1}
-        baselines = {k: v[len(v)/2] for (k,v) in uncertain_parameters.iteritems()}
-
-        # Get the result keys
-        result_keys = self.results()[0][epyc.Experiment.RESULTS].keys()
-        # Create a dictionary of (uncertain_param, result_key) tuples
-        plots = {k: ([], []) for k in itertools.product(uncertain_parameters, result_keys)}
-
-        # Loop through all rows of the output
-        for row in self._results.values():
-            row = self._aggregate(row)
-            # For every parameter row combination
-            for p,r in plots:
-                # Check if param value = baseline value, only include this row if all values are baseline
-                if row[epyc.Experiment.PARAMETERS][p] == baselines[p] and \
-                        any([row[epyc.Experiment.PARAMETERS][q] !=  baselines[q] for q in uncertain_parameters]):
-                    pass
-                else:
-                    plots[(p, r)][0].append(row[epyc.Experiment.PARAMETERS][p])
-                    plots[(p, r)][1].append(row[epyc.Experiment.RESULTS][r])
-
-        for ((param, result), (x_data, y_data)) in plots.iteritems():
-            plt.scatter(x_data, y_data)
-            plt.title('Correlation: {0} vs {1}'.format(param, result))
-            plt.xlabel(param)
-            plt.ylabel(result)
-            if save:
-                if folder:
-                    try:
-                        if not os.path.exists(folder):
-                            os.makedirs(folder)
-                    except OSError as o:
-                        print ('Error creating directory ' + folder + ":" + o.message)
-                    folder = folder + '/'
-                plt.savefig(folder + param + '_' + result + ".png")
-            if show:
+        plots = self.scatter_series()
+
+        if save:
+            if folder:
+                try:
+                    if not os.path.exists(folder):
+                        os.makedirs(folder)
+                except OSError as o:
+                    print ('Error creating directory ' + folder + ":" + o.message)
+            tasks = [(param, result, x_data, y_data, os.path.join(folder, param + '_' + result + ".png"))
+                     for ((param, result), (x_data, y_data)) in plots.iteritems()]
+            if processes is None:
+                for task in tasks:
+                    _render_scatter(task)
+            else:
+                pool = multiprocessing.Pool(processes)
+                try:
+                    pool.map(_render_scatter, tasks, chunksize=max(1, len(tasks) / (4 * processes)))
+                finally:
+                    pool.close()
+                    pool.join()
+
+        if show:
+            for ((param, result), (x_data, y_data)) in plots.iteritems():
+                plt.scatter(x_data, y_data)
+                plt.title('Correlation: {0} vs {1}'.format(param, result))
+                plt.xlabel(param)
+                plt.ylabel(result)
                 plt.show()
-            # Refresh figure window
-            plt.close()
+                # Refresh figure window
+                plt.close()
+
+
+class ScatterColumnarNotebook(ColumnarStorage, ScatterJSONNotebook):
+    """
+    ScatterJSONNotebook over memory-mapped column storage.
+    """
+
+    def _read_index(self, j):
+        ColumnarStorage._read_index(self, j)
+        self._baselines = j.get(ScatterJSONNotebook.BASELINES, {})
+
+    def _index(self):
+        j = ColumnarStorage._index(self)
+        j[ScatterJSONNotebook.BASELINES] = self._baselines
+        return j
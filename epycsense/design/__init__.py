@@ -0,0 +1,4 @@
+from parameterspace import *
+from streams import *
+from resume import *
+from oat import *
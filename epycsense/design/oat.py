@@ -0,0 +1,138 @@
+import numpy
+from .parameterspace import ArrayParameterSpace
+from .streams import resolve_seed, uniform_rows
+
+# Reference material for Morris trajectories:
+#
+# Morris MD.
+# "Factorial sampling plans for preliminary computational experiments."
+# Technometrics 1991; 33: 161-74. doi:10.1080/00401706.1991.10484804
+
+# Varied parameter of a point that doesn't vary any parameter, i.e. the baseline of a sweep or the start of a
+# trajectory
+NO_VARIED_PARAMETER = ''
+
+
+class OneAtATimeSpace(ArrayParameterSpace):
+    """
+    ArrayParameterSpace of a one-at-a-time design, recording the parameter that each point varies (from the baseline
+    of a sweep, or from the previous point of a trajectory).
+    """
+
+    def __init__(self, columns, constants=None, order=None, varied=None):
+        """
+        :param varied: array of the parameter varied by each row, or NO_VARIED_PARAMETER
+        """
+        ArrayParameterSpace.__init__(self, columns, constants, order)
+        self._varied = numpy.asarray(varied, dtype=object)
+        assert len(self._varied) == len(self), "Varied parameters must be the same length as the columns"
+
+    def varied(self):
+        """
+        Parameter varied by each point, in the order the points are produced.
+        :return: array of parameter names, with NO_VARIED_PARAMETER for points that vary none
+        """
+        return self._varied if self._order is None else self._varied[self._order]
+
+    def subset(self, positions):
+        rows = self._subset_rows(positions)
+        return OneAtATimeSpace([(n, c[rows]) for (n, c) in zip(self._names, self._columns)], self._constants,
+                               varied=self._varied[rows])
+
+
+def _split_parameters(parameters):
+    uncertain = [(p, numpy.asarray(v)) for (p, v) in parameters.iteritems() if len(v) > 1]
+    certain = {p: v[0] for (p, v) in parameters.iteritems() if len(v) == 1}
+    return uncertain, certain
+
+
+def oat_baselines(parameters):
+    """
+    Baseline of each uncertain parameter in a one-at-a-time sweep: the middle of its list of values, as given.
+    :param parameters: dict of parameter name to list of values (a single value for certain parameters)
+    :return: dict of parameter name to baseline value
+    """
+    uncertain, _ = _split_parameters(parameters)
+    return {p: values[len(values) / 2].item() for (p, values) in uncertain}
+
+
+def oat_parameter_space(parameters):
+    """
+    One-at-a-time sweep of the parameters: each value of each uncertain parameter with all the others at their
+    baseline (the middle of their list of values), plus the baseline point itself.
+
+    Values are placed by their position in each parameter's list rather than compared with the baseline, so a grid
+    of floats gives exactly one point per value. All the points varying a parameter are filled into its column at
+    once.
+    :param parameters: dict of parameter name to list of values (a single value for certain parameters)
+    :return: OneAtATimeSpace with the points varying each parameter in turn and the baseline last
+    """
+    uncertain, certain = _split_parameters(parameters)
+    names = [p for (p, _) in uncertain]
+    # Number of points varying each parameter (every value except its baseline)
+    sizes = numpy.array([len(v) - 1 for (_, v) in uncertain], dtype=int)
+    which = numpy.append(numpy.repeat(numpy.arange(len(uncertain)), sizes), len(uncertain))
+
+    columns = []
+    for (i, (p, values)) in enumerate(uncertain):
+        baseline = len(values) / 2
+        column = numpy.repeat(values[baseline:baseline + 1], len(which))
+        column[which == i] = numpy.delete(values, baseline)
+        columns.append((p, column))
+
+    varied = numpy.array(names + [NO_VARIED_PARAMETER], dtype=object)[which]
+    return OneAtATimeSpace(columns, certain, varied=varied)
+
+
+def morris_levels(levels, trajectories, seed=None):
+    """
+    Morris trajectories over a grid of levels of each parameter, as level indices.
+
+    Each trajectory starts at a random point of the grid and moves each parameter once, in a random order, by a
+    jump of half its number of levels (up or down, at random where both stay on the grid). The points of all the
+    trajectories are built at once as the cumulative sum of their moves.
+    :param levels: array of the number of levels of each parameter (each at least 2)
+    :param trajectories: number of trajectories
+    :param seed: integer or RandomState for a reproducible design (see resolve_seed), or None
+    :return: (indices, varied), where indices is an integer array with a row per point (trajectory by trajectory,
+    each of k + 1 points for k parameters) and a column per parameter, and varied is the position of the parameter
+    moved to reach each point, or -1 at the start of each trajectory
+    """
+    levels = numpy.asarray(levels, dtype=int)
+    k = len(levels)
+    assert (levels >= 2).all(), "Every parameter needs at least 2 levels"
+    assert trajectories >= 1, "Must have at least 1 trajectory"
+
+    u = uniform_rows(resolve_seed(seed), 0, trajectories, 3 * k)
+    start = (u[:, :k] * levels).astype(int)
+    jump = levels / 2
+    # Move up or down at random, unless only one stays on the grid
+    up = numpy.where(start + jump > levels - 1, False, numpy.where(start - jump < 0, True, u[:, k:2 * k] < 0.5))
+    step = numpy.where(up, jump, -jump)
+    order = numpy.argsort(u[:, 2 * k:], axis=1)
+
+    # The move of each step of each trajectory, and the points as the start plus the moves so far
+    t = numpy.arange(trajectories)[:, numpy.newaxis]
+    moves = numpy.zeros((trajectories, k, k), dtype=int)
+    moves[t, numpy.arange(k)[numpy.newaxis, :], order] = step[t, order]
+    points = start[:, numpy.newaxis, :] + numpy.concatenate([numpy.zeros((trajectories, 1, k), dtype=int),
+                                                              numpy.cumsum(moves, axis=1)], axis=1)
+    varied = numpy.concatenate([-numpy.ones((trajectories, 1), dtype=int), order], axis=1)
+    return points.reshape((-1, k)), varied.ravel()
+
+
+def trajectory_parameter_space(parameters, trajectories, seed=None):
+    """
+    Morris trajectories through the values of the parameters (see morris_levels), taking the list of values of each
+    uncertain parameter as its levels.
+    :param parameters: dict of parameter name to list of values (a single value for certain parameters)
+    :param trajectories: number of trajectories
+    :param seed: integer or RandomState for a reproducible design (see resolve_seed), or None
+    :return: OneAtATimeSpace of the points of each trajectory in turn
+    """
+    uncertain, certain = _split_parameters(parameters)
+    names = [p for (p, _) in uncertain]
+    indices, varied = morris_levels([len(v) for (_, v) in uncertain], trajectories, seed)
+    columns = [(p, values[indices[:, i]]) for (i, (p, values)) in enumerate(uncertain)]
+    varied = numpy.array(names + [NO_VARIED_PARAMETER], dtype=object)[varied]
+    return OneAtATimeSpace(columns, certain, varied=varied)
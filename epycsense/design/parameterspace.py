@@ -0,0 +1,125 @@
+import numpy
+from .streams import random_state, ORDER_STREAM
+
+
+class ArrayParameterSpace(object):
+    """
+    A parameter space backed by arrays of values, one per parameter, rather than a list of dicts. The dict for each
+    point in the space is only created when that point is requested, so iterating over the space (as epyc does when
+    running an experiment) holds only a chunk of dicts in memory at any time, however large the design.
+
+    Parameters whose value is the same at every point are held once as constants. A space with no varying
+    parameters is empty.
+    """
+
+    # Number of points converted to dicts at a time when iterating
+    CHUNK_SIZE = 1000
+
+    def __init__(self, columns, constants=None, order=None):
+        """
+        :param columns: list of (parameter name, array of values) pairs, with all arrays of the same length
+        :param constants: dict of parameter values common to all points
+        :param order: array of row indices giving the order in which points are produced (defaults to row order)
+        """
+        self._names = [name for (name, _) in columns]
+        self._columns = [numpy.asarray(values) for (_, values) in columns]
+        self._constants = constants.copy() if constants else {}
+        self._size = len(self._columns[0]) if self._columns else 0
+        for values in self._columns:
+            assert len(values) == self._size, "All columns must be the same length"
+        self._order = order
+
+    def names(self):
+        """
+        Names of the parameters that vary across the space (i.e. excluding constants)
+        :return: list of parameter names
+        """
+        return list(self._names)
+
+    def column(self, name):
+        """
+        Values of the given parameter, in the order the points are produced.
+        :param name: parameter name
+        :return: array of values
+        """
+        values = self._columns[self._names.index(name)]
+        return values if self._order is None else values[self._order]
+
+    def matrix(self, names=None):
+        """
+        Values of the given parameters as a single array, in the order the points are produced, for analysis or
+        models which work on arrays rather than dicts.
+        :param names: parameter names (defaults to all that vary across the space)
+        :return: array with a row per point and a column per parameter
+        """
+        if names is None:
+            names = self._names
+        values = numpy.column_stack([self._columns[self._names.index(n)] for n in names]) if names \
+            else numpy.empty((self._size, 0))
+        return values if self._order is None else values[self._order]
+
+    def constants(self):
+        return self._constants.copy()
+
+    def __len__(self):
+        return self._size
+
+    def _rows(self, index):
+        """
+        Build the dicts for the given rows.
+        :param index: slice or array of row indices into the columns
+        :return: list of dicts
+        """
+        values = [c[index].tolist() for c in self._columns]
+        rows = []
+        for vs in zip(*values):
+            row = self._constants.copy()
+            row.update(zip(self._names, vs))
+            rows.append(row)
+        return rows
+
+    def _index(self, start, stop):
+        if self._order is None:
+            return slice(start, stop)
+        else:
+            return self._order[start:stop]
+
+    def __iter__(self):
+        for start in xrange(0, self._size, self.CHUNK_SIZE):
+            for row in self._rows(self._index(start, min(start + self.CHUNK_SIZE, self._size))):
+                yield row
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            start, stop, step = i.indices(self._size)
+            return self.subset(numpy.arange(start, stop, step))
+        if i < 0:
+            i += self._size
+        if not 0 <= i < self._size:
+            raise IndexError("Parameter space index out of range")
+        return self._rows(self._index(i, i + 1))[0]
+
+    def subset(self, positions):
+        """
+        The points at the given positions in the order they are produced, as a new space.
+        :param positions: array of positions (or a boolean mask over the positions)
+        :return: ArrayParameterSpace
+        """
+        rows = self._subset_rows(positions)
+        return ArrayParameterSpace([(n, c[rows]) for (n, c) in zip(self._names, self._columns)], self._constants)
+
+    def _subset_rows(self, positions):
+        """
+        Rows of the columns at the given positions in the order the points are produced.
+        """
+        return numpy.arange(self._size)[positions] if self._order is None else self._order[positions]
+
+    def shuffle(self, seed=None):
+        """
+        Randomise the order in which the points are produced, without moving any values.
+        :param seed: integer seed for a reproducible order (see resolve_seed), or None
+        :return: the space
+        """
+        order = numpy.arange(self._size) if self._order is None else self._order
+        self._order = random_state(seed, ORDER_STREAM).permutation(order)
+        return self
@@ -0,0 +1,42 @@
+import numpy
+from .parameterspace import ArrayParameterSpace
+
+
+def unfinished_points(space, notebook):
+    """
+    The points of a parameter space for which the notebook holds neither a result nor a pending result, e.g. those
+    of an interrupted run still to be done. The design must be reproducible (e.g. seeded) for its points to match
+    those already run.
+    :param space: ArrayParameterSpace or list of dicts
+    :param notebook: notebook the space is run into
+    :return: the unfinished points, as the same kind of space
+    """
+    results = notebook._results
+    if isinstance(space, ArrayParameterSpace):
+        unfinished = numpy.array([not results.get(notebook._parametersAsIndex(p)) for p in space], dtype=bool)
+        return space.subset(unfinished)
+    return [p for p in space if not results.get(notebook._parametersAsIndex(p))]
+
+
+class Resumable(object):
+    """
+    Lab which can resume an interrupted run of its design, running only the points that its notebook (including any
+    journalled results) doesn't already hold.
+
+    This is used ahead of epyc.Lab or epyc.ClusterLab in the bases of a lab class, whose parameterSpace() passes its
+    design through _remaining().
+    """
+
+    _resume = False
+
+    def set_resume(self, resume):
+        """
+        Whether to skip the points of the design that already have results (or pending results) in the notebook.
+        :param resume: True to run only the unfinished points
+        """
+        self._resume = resume
+
+    def _remaining(self, space):
+        if not self._resume:
+            return space
+        return unfinished_points(space, self.notebook())
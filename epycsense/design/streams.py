@@ -0,0 +1,76 @@
+import numpy
+
+# Number of rows of a design drawn from each random stream
+BLOCK_SIZE = 1024
+
+# Streams used for different purposes within a design, so they never share random numbers
+SAMPLE_STREAM = 0
+ORDER_STREAM = 1
+
+
+def resolve_seed(seed):
+    """
+    Turn a seed given to a sampler or lab into the integer from which its random streams are derived.
+    :param seed: None (use numpy's global random state, so results are not reproducible), an integer in
+        [0, 2**32), or a numpy RandomState from which an integer seed is drawn
+    :return: integer seed, or None
+    """
+    if isinstance(seed, numpy.random.RandomState):
+        return int(seed.randint(2 ** 32, dtype=numpy.uint64))
+    if seed is not None:
+        assert 0 <= seed < 2 ** 32, "Seed must be in [0, 2**32)"
+        return int(seed)
+    return None
+
+
+def random_state(seed, *stream):
+    """
+    The random state for a stream derived from the seed. Each distinct stream key gives an independent sequence,
+    which is the same every time it's requested, in any process.
+    :param seed: integer seed (see resolve_seed), or None for numpy's global random state
+    :param stream: integers identifying the stream
+    :return: RandomState (or the numpy.random module if the seed is None)
+    """
+    if seed is None:
+        return numpy.random
+    return numpy.random.RandomState([resolve_seed(seed)] + [int(s) for s in stream])
+
+
+def uniform_rows(seed, start, stop, width, stream=SAMPLE_STREAM):
+    """
+    Rows start to stop of a (conceptually unbounded) array of uniform random numbers on [0,1) with the given
+    number of columns. Each block of BLOCK_SIZE rows comes from its own stream, so any range of rows can be generated
+    independently (e.g. by a worker process creating one chunk of a large design) and matches the same rows of a
+    single serial call exactly.
+    :param seed: integer seed (see resolve_seed), or None to draw from numpy's global random state
+    :param start: first row
+    :param stop: row after the last
+    :param width: number of columns
+    :param stream: integer identifying the purpose of the numbers, so that e.g. two parts of the same design don't
+        share random numbers
+    :return: array of shape (stop - start, width)
+    """
+    if seed is None:
+        return numpy.random.rand(stop - start, width)
+    rows = []
+    for block in range(start // BLOCK_SIZE, (stop - 1) // BLOCK_SIZE + 1):
+        values = random_state(seed, stream, block).random_sample((BLOCK_SIZE, width))
+        first = block * BLOCK_SIZE
+        rows.append(values[max(start - first, 0):min(stop - first, BLOCK_SIZE)])
+    return numpy.concatenate(rows) if rows else numpy.empty((0, width))
+
+
+class SeededDesign(object):
+    """
+    Lab whose design can be seeded so that it is reproducible, including any later extensions of the design and the
+    order in which a cluster lab submits its points. This is used in the bases of the lab classes of each method.
+    """
+
+    _seed = None
+
+    def set_seed(self, seed):
+        """
+        Seed the design, so that it is reproducible.
+        :param seed: integer or RandomState (see resolve_seed), or None to use numpy's global random state
+        """
+        self._seed = resolve_seed(seed)
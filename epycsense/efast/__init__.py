@@ -1,2 +1,4 @@
 from efastlab import *
-from efastnotebook import *
\ No newline at end of file
+from efastnotebook import *
+from rbdfastlab import *
+from rbdfastnotebook import *
@@ -3,6 +3,12 @@ import math
 import numpy as np
 import scipy.stats as stats
 from .efastnotebook import EFASTJSONNotebook
+from ..design.parameterspace import ArrayParameterSpace
+from ..design.resume import Resumable
+from ..design.streams import SeededDesign, resolve_seed, uniform_rows
+from ..aggregated.convergence import Convergent
+from ..parallel.chunkedsubmission import ChunkedSubmission
+from ..parallel.processpool import ProcessPoolExecution
 
 UNIFORM_DISTRIBUTION = 'uniform_distribution'
 NORMAL_DISTRIBUTION = 'normal_distribution'
@@ -23,13 +29,16 @@ LOGNORMAL_DISTRIBUTION = 'lognormal_distribution'
 # J Theor Biol 2008; 254: 178-96. doi:10.1016/j.jtbi.2008.04.011
 
 
-def efast_sample_matrix(sample_number, interference, parameters, resample_number, required_parameters):
+def efast_parameter_space(sample_number, interference, parameters, resample_number, required_parameters,
+                          first_resample=0, seed=None):
     """
     Generate model inputs for the extended Fourier Amplitude Sensitivity Test (FAST).
 
-    Returns a NumPy matrix containing the model inputs required by the Fourier
+    Builds a NumPy matrix containing the model inputs required by the Fourier
     Amplitude sensitivity test.  The resulting matrix contains N rows and K
-    columns, where K is the number of parameters.
+    columns, where K is the number of parameters. This is returned as a parameter
+    space backed by the matrix, which only creates the dict for each run as it is
+    required.
 
     Code modified from SALib (due to an inability to install) https://salib.readthedocs.io/en/latest/
 
@@ -39,7 +48,11 @@ def efast_sample_matrix(sample_number, interference, parameters, resample_number
     :param parameters: parameters and values (from epyc)
     :param resample_number
     :param required_parameters: parameters to get values for. If empty, will be all uncertain parameters.
-    :return:
+    :param first_resample: number given to the first resample, so that a further batch of resamples can be added
+        to an existing design
+    :param seed: integer or RandomState for a reproducible sample (see resolve_seed), or None. Each resample has
+        its own random stream, so a resample is the same whether generated alone or with others.
+    :return: ArrayParameterSpace
     """
     assert sample_number > 4 * interference ** 2, "Sample size N > 4M^2 is required. M=4 by default."
     assert resample_number >= 1, "Resample number must be >= 1"
@@ -83,35 +96,27 @@ def efast_sample_matrix(sample_number, interference, parameters, resample_number
     # Discretisation of the frequency space, s (vector of length samples with values 0-2pi)
     s = (2 * math.pi / sample_number) * np.arange(sample_number)
 
-    # Transformation to get points in the X space
-    x = np.zeros([k * resample_number * sample_number, k])
+    # Only the parameters of interest that are required get a search curve
+    names = [q[0] for q in uncertain_params]
+    poi_positions = np.array([q for q in range(k) if names[q] in required_parameters], dtype=int)
 
-    # Taking each parameter as the parameter of interest
-    for parameter_of_interest_pos in range(k):
-        # Complimentary frequencies
-        omega2 = np.zeros([k])
+    # Frequencies used for each parameter of interest (rows) across all parameters (columns). The parameter of
+    # interest gets omega_max (omega[0]) and the remaining parameters get the complementary frequencies in order.
+    columns = np.arange(k)[np.newaxis, :]
+    frequency_index = np.where(columns < poi_positions[:, np.newaxis], columns + 1, columns)
+    frequency_index[columns == poi_positions[:, np.newaxis]] = 0
+    omega2 = omega[frequency_index]
 
-        # Assign the omega_max frequency to the parameter of interest
-        omega2[parameter_of_interest_pos] = omega[0]
+    # Random phase shift on [0, 2pi) following [Saltelli et al. 1999 - Sect 2.2], one per parameter of each resample
+    phi = uniform_rows(resolve_seed(seed), first_resample, first_resample + resample_number, len(poi_positions) * k)
+    phi = 2 * math.pi * phi.reshape((resample_number, len(poi_positions), k)).swapaxes(0, 1)
 
-        # Assign the remaining frequencies to all other parameters
-        # Get list [0:k] excluding the parameter of interest to use as index
-        idx = list(range(parameter_of_interest_pos)) + list(range(parameter_of_interest_pos + 1, k))
-        # Assign values
-        omega2[idx] = omega[1:]
-
-        # Assign a value (in range [0,1]) to each parameter for each run based on their frequency and phase shift
-        for rs in range(0, resample_number):
-            # Calculate the run IDs for this resample of this parameter
-            run_numbers = range(sample_number*(parameter_of_interest_pos*resample_number + rs),
-                                sample_number*(parameter_of_interest_pos*resample_number + rs + 1))
-
-            # random phase shift on [0, 2pi) following [Saltelli et al. 1999 - Sect 2.2]
-
-            for param in range(k):
-                phi = 2 * math.pi * np.random.rand()
-                g = 0.5 + (1 / math.pi) * np.arcsin(np.sin(omega2[param] * s + phi))
-                x[run_numbers, param] = g
+    # Assign a value (in range [0,1]) to each parameter for each run based on their frequency and phase shift. Axes
+    # are (parameter of interest, resample, run, parameter), which flatten to rows in run number order.
+    x = 0.5 + (1 / math.pi) * np.arcsin(np.sin(omega2[:, np.newaxis, np.newaxis, :] *
+                                                s[np.newaxis, np.newaxis, :, np.newaxis] +
+                                                phi[:, :, np.newaxis, :]))
+    x = x.reshape((-1, k))
 
     # Convert 0-1 values into values within the parameter range, based on distribution values and distribution type.
     for q in range(len(uncertain_params)):
@@ -128,32 +133,55 @@ def efast_sample_matrix(sample_number, interference, parameters, resample_number
             # checking for valid parameters
             x[:, q] = np.exp(stats.norm.ppf(x[:, q], loc=d1, scale=d2))
 
-    # Then add to the sample list
-    samples = []
-    rows_per_poi = resample_number*sample_number
-
-    for row in range(x.shape[0]):
-        sample = certain_params.copy()
-        # Calculate the EFAST parameters (needed for analysis)
-        sample[EFASTJSONNotebook.PARAMETER_OF_INTEREST] = uncertain_params[row / rows_per_poi][0]
-        if sample[EFASTJSONNotebook.PARAMETER_OF_INTEREST] in required_parameters:
-            sample[EFASTJSONNotebook.RESAMPLE_NUMBER] = (row % rows_per_poi) / sample_number
-            sample[EFASTJSONNotebook.RUN_NUMBER] = row % sample_number
-            for q in range(len(uncertain_params)):
-                sample[uncertain_params[q][0]] = x[row,q]
-            samples.append(sample)
+    # Bookkeeping columns for each row
+    rows_per_poi = resample_number * sample_number
+    params_of_interest = np.repeat(np.array(names)[poi_positions], rows_per_poi)
+    resamples = np.tile(np.repeat(first_resample + np.arange(resample_number), sample_number), len(poi_positions))
+    runs = np.tile(np.arange(sample_number), len(poi_positions) * resample_number)
+
+    columns = [(names[q], x[:, q]) for q in range(k)]
+    # The EFAST parameters (needed for analysis)
+    columns.extend([(EFASTJSONNotebook.PARAMETER_OF_INTEREST, params_of_interest),
+                    (EFASTJSONNotebook.RESAMPLE_NUMBER, resamples),
+                    (EFASTJSONNotebook.RUN_NUMBER, runs)])
+    samples = ArrayParameterSpace(columns, certain_params)
 
     print "Sample generated of length {0}".format(len(samples))
     return samples
 
 
-class EFASTLab(epyc.Lab):
-    def __init__(self, notebook):
-        epyc.Lab.__init__(self, notebook)
-        self._sample_number = 0
-        self._interference = 0
-        self._resample_number = 0
-        self._required_parameters = []
+def efast_sample_matrix(sample_number, interference, parameters, resample_number, required_parameters, seed=None):
+    """
+    Generate model inputs for the extended Fourier Amplitude Sensitivity Test (FAST) as a list of dicts. See
+    efast_parameter_space.
+    :return: list of dicts
+    """
+    return list(efast_parameter_space(sample_number, interference, parameters, resample_number, required_parameters,
+                                      seed=seed))
+
+
+def efast_design_size(sample_number, parameters, resample_number, required_parameters):
+    """
+    Number of runs in an EFAST design, without generating it.
+    :return: number of runs
+    """
+    uncertain_params = [p for (p, v) in parameters.iteritems() if len(v) > 1] + [EFASTJSONNotebook.DUMMY]
+    if len(required_parameters) > 0:
+        uncertain_params = [p for p in uncertain_params if p in required_parameters]
+    return len(uncertain_params) * resample_number * sample_number
+
+
+class EFASTDesign(SeededDesign, Convergent):
+    """
+    Settings and parameter space of an EFAST design, and running it in batches of resamples until the indices
+    converge, shared by EFASTLab and EFASTClusterLab.
+    """
+
+    _sample_number = 0
+    _interference = 0
+    _resample_number = 0
+    _required_parameters = ()
+    _first_resample = 0
 
     def set_sample_number(self, samples):
         self._sample_number = samples
@@ -167,10 +195,18 @@ class EFASTLab(epyc.Lab):
     def set_required_parameters(self, params):
         self._required_parameters = params
 
+    def __len__(self):
+        """The number of runs in the design, without generating it."""
+        if len(self._parameters) == 0:
+            return 0
+        return efast_design_size(self._sample_number, self._parameters, self._resample_number,
+                                 self._required_parameters)
+
     def parameterSpace(self):
-        """Return the parameter space of the experiment as a list of dicts,
-        with each dict mapping each parameter name to a value.
-        :returns: the parameter space as a list of dicts"""
+        """Return the parameter space of the experiment as a sequence of dicts,
+        with each dict mapping each parameter name to a value. The dicts are
+        only created as the space is iterated over.
+        :returns: the parameter space as an ArrayParameterSpace"""
         if len(self._parameters) == 0:
             return []
         else:
@@ -180,42 +216,63 @@ class EFASTLab(epyc.Lab):
                 .format(self._interference, self.set_interference_factor.__name__)
             assert (self._resample_number >= 1), "Resample value invalid: {0}. Set using {1}()" \
                 .format(self._interference, self.set_resample_number.__name__)
-            return efast_sample_matrix(self._sample_number, self._interference, self._parameters, self._resample_number,
-                                       self._required_parameters)
-
+            return self._remaining(efast_parameter_space(self._sample_number, self._interference, self._parameters,
+                                                         self._resample_number, self._required_parameters,
+                                                         self._first_resample, self._seed))
+
+    def run_until_converged(self, e, tolerance=0.05, top=None, max_resamples=None):
+        """
+        Run the experiment in batches of the set resample number, adding further resamples to the design after each
+        batch until the first and total-order indices (averaged over the resamples) of every parameter for every
+        result have converged (see indices_converged). Requires the notebook to be an EFASTJSONNotebook.
+
+        Any resamples already held in the notebook are kept and the new resamples numbered after them.
+        :param e: the experiment
+        :param tolerance: largest change in any index between batches allowed for convergence
+        :param top: number of most sensitive parameters of each result whose ranking must be unchanged
+        :param max_resamples: total number of resamples at which to stop, even if not converged
+        :return: True if the indices converged
+        """
+        return self._run_until_converged(e, tolerance, top, max_resamples)
+
+    def _start_convergence(self, e):
+        if self.notebook().numberOfResults() > 0:
+            return self._convergence_indices()
+        return None
+
+    def _next_batch(self, max_resamples):
+        # Number the next batch of resamples on from those already held
+        nb = self.notebook()
+        if nb.numberOfResults() > 0:
+            self._first_resample = int(nb.dataframe_aggregated()[EFASTJSONNotebook.RESAMPLE_NUMBER].max()) + 1
+        return max_resamples is None or self._first_resample + self._resample_number <= max_resamples
+
+    def _convergence_indices(self):
+        """
+        First and total-order indices averaged over the resamples, keyed by (parameter, (result, index)) so that
+        each index of each result is ranked separately.
+        """
+        S1, ST = self.notebook().generate_sensitivity_indices()
+        indices = {}
+        for (name, values) in [('S1', S1), ('ST', ST)]:
+            indices.update({(p, (rk, name)): np.mean(v) for ((rk, p), v) in values.iteritems() if len(v) > 0})
+        return indices
+
+
+class EFASTLab(EFASTDesign, Resumable, epyc.Lab):
+    pass
+
+
+class EFASTProcessPoolLab(ProcessPoolExecution, EFASTLab):
+    """
+    EFASTLab running on a pool of local worker processes rather than in this process.
+    """
+    pass
 
-class EFASTClusterLab(epyc.ClusterLab):
+class EFASTClusterLab(ChunkedSubmission, EFASTDesign, Resumable, epyc.ClusterLab):
     def __init__(self, notebook, profile, debug=False):
         epyc.ClusterLab.__init__(self, notebook, profile=profile, debug=debug)
-        self._sample_number = 0
-        self._interference = 0
-        self._resample_number = 0
-        self._required_parameters = []
 
-    def set_sample_number(self, samples):
-        self._sample_number = samples
-
-    def set_interference_factor(self, factor):
-        self._interference = factor
-
-    def set_resample_number(self, resamples):
-        self._resample_number = resamples
-
-    def set_required_parameters(self, params):
-        self._required_parameters = params
-
-    def parameterSpace(self):
-        """Return the parameter space of the experiment as a list of dicts,
-        with each dict mapping each parameter name to a value.
-        :returns: the parameter space as a list of dicts"""
-        if len(self._parameters) == 0:
-            return []
-        else:
-            assert (self._sample_number > 0), "Sample number invalid: {0}. Set using {1}()" \
-                .format(self._sample_number, self.set_sample_number.__name__)
-            assert (self._interference > 0), "Interference value invalid: {0}. Set using {1}()" \
-                .format(self._interference, self.set_interference_factor.__name__)
-            assert (self._resample_number >= 1), "Resample value invalid: {0}. Set using {1}()" \
-                .format(self._interference, self.set_resample_number.__name__)
-            return efast_sample_matrix(self._sample_number, self._interference, self._parameters, self._resample_number,
-                                       self._required_parameters)
+    def _mixup(self, ps):
+        # Shuffle the order of the points rather than swapping generated dicts
+        return ps.shuffle(self._seed)
@@ -2,10 +2,97 @@ import numpy as np
 import math
 import json
 import itertools
+import multiprocessing
+from multiprocessing.sharedctypes import RawArray
+from pandas import DataFrame, Index
 from ..aggregated.aggregationnotebook import *
+from ..aggregated.columnarnotebook import ColumnarStorage
 from epyc.jsonlabnotebook import MetadataEncoder
 
 
+def efast_indices(outputs, interference_factor):
+    """
+    Calculate the first and total-order EFAST sensitivity indices from the model outputs along search curves.
+
+    The spectrum of every search curve is found with a single real FFT along the run axis, and the indices are then
+    reductions over the relevant frequencies, so any number of curves and outputs are handled in one call.
+    :param outputs: array of shape (..., sample_number, outputs), with runs along the search curve in order
+    :param interference_factor: number of harmonics of the maximum frequency included in the first-order index
+    :return: (S1, ST) arrays of shape (..., outputs)
+    """
+    sample_number = outputs.shape[-2]
+
+    # Frequency of the parameter of interest, as used in the sampling
+    omega = int(math.floor((sample_number - 1.0) / (2.0 * interference_factor)))
+
+    f = np.fft.rfft(outputs, axis=-2)
+    Sp = np.power(np.absolute(f[..., 1:int((sample_number + 1) / 2), :]) / sample_number, 2)
+
+    V = 2 * np.sum(Sp, axis=-2)
+    q = np.arange(1, int(interference_factor) + 1) * omega - 1
+    D1 = 2 * np.sum(Sp[..., q, :], axis=-2)
+    q2 = np.arange(int(omega / 2))
+    Dt = 2 * np.sum(Sp[..., q2, :], axis=-2)
+
+    return D1 / V, 1 - Dt / V
+
+
+# Outputs shared with the worker processes of parallel_efast_indices
+_shared_outputs = None
+
+
+def _init_efast_worker(buffer, shape):
+    global _shared_outputs
+    _shared_outputs = np.frombuffer(buffer, dtype=float).reshape(shape)
+
+
+def _efast_indices_task(task):
+    poi, start, stop, interference_factor = task
+    return efast_indices(_shared_outputs[poi, ..., start:stop], interference_factor)
+
+
+def parallel_efast_indices(outputs, interference_factor, processes):
+    """
+    Calculate EFAST sensitivity indices as per efast_indices, spreading the parameters of interest and blocks of
+    outputs across a pool of processes. The outputs are placed in shared memory once rather than being pickled to
+    each worker, and each block is analysed exactly as it would be serially.
+    :param outputs: array of shape (parameter of interest, resample, run, output)
+    :param interference_factor: number of harmonics of the maximum frequency included in the first-order index
+    :param processes: number of worker processes
+    :return: (S1, ST) arrays of shape (parameter of interest, resample, output)
+    """
+    num_outputs = outputs.shape[-1]
+    if num_outputs == 0:
+        # Nothing to analyse (and no blocks to share out)
+        return np.empty(outputs.shape[:2] + (0,)), np.empty(outputs.shape[:2] + (0,))
+
+    buffer = RawArray('d', outputs.size)
+    np.frombuffer(buffer, dtype=float).reshape(outputs.shape)[...] = outputs
+
+    block = int(math.ceil(float(num_outputs) / processes))
+    tasks = [(poi, start, min(start + block, num_outputs), interference_factor)
+             for poi in range(outputs.shape[0]) for start in range(0, num_outputs, block)]
+
+    pool = multiprocessing.Pool(processes, initializer=_init_efast_worker, initargs=(buffer, outputs.shape))
+    try:
+        indices = pool.map(_efast_indices_task, tasks)
+    finally:
+        pool.close()
+        pool.join()
+
+    S1 = np.empty(outputs.shape[:2] + (num_outputs,))
+    ST = np.empty(outputs.shape[:2] + (num_outputs,))
+    for ((poi, start, stop, _), (s1, st)) in zip(tasks, indices):
+        S1[poi, :, start:stop] = s1
+        ST[poi, :, start:stop] = st
+    return S1, ST
+
+
+# Interference factor the designs are assumed to have been sampled with
+# TODO - hard-coded
+_INTERFERENCE_FACTOR = 4
+
+
 class EFASTJSONNotebook(AggregationJSONNotebook):
     RUN_NUMBER = 'run_number'
     PARAMETER_OF_INTEREST = 'parameter_of_interest'
@@ -27,12 +114,33 @@ class EFASTJSONNotebook(AggregationJSONNotebook):
         :return:
         """
         params = AggregationJSONNotebook.uncertain_parameters(self)
-        params.remove(EFASTJSONNotebook.RUN_NUMBER)
-        params.remove(EFASTJSONNotebook.PARAMETER_OF_INTEREST)
-        params.remove(EFASTJSONNotebook.RESAMPLE_NUMBER)
+        # A design of one resample (or one parameter of interest) has the same value throughout
+        for p in [EFASTJSONNotebook.RUN_NUMBER, EFASTJSONNotebook.PARAMETER_OF_INTEREST,
+                  EFASTJSONNotebook.RESAMPLE_NUMBER]:
+            if p in params:
+                params.remove(p)
         return params
 
-    def generate_sensitivity_indices(self):
+    def _search_curves(self):
+        """
+        The aggregated results in order along the search curves, checking that every curve is complete.
+        :return: (data sorted by parameter of interest, then resample, then run number, parameters of interest,
+        number of resamples, number of runs along each curve)
+        """
+        data = self.dataframe_aggregated().sort_values(by=[EFASTJSONNotebook.PARAMETER_OF_INTEREST,
+                                                           EFASTJSONNotebook.RESAMPLE_NUMBER,
+                                                           EFASTJSONNotebook.RUN_NUMBER])
+        # Sorted, so matches the order of the rows
+        required_parameters = np.unique(data[EFASTJSONNotebook.PARAMETER_OF_INTEREST]).tolist()
+
+        sample_number = max(data[EFASTJSONNotebook.RUN_NUMBER]) + 1
+        resample_number = max(data[EFASTJSONNotebook.RESAMPLE_NUMBER]) + 1
+
+        # Check we have all expected results (NS * k)
+        assert len(data) == len(required_parameters) * sample_number * resample_number, "Invalid data length"
+        return data, required_parameters, resample_number, sample_number
+
+    def generate_sensitivity_indices(self, processes=None):
         """
         Performs the Fourier Amplitude Sensitivity Test (FAST) on model outputs.
 
@@ -53,59 +161,62 @@ class EFASTJSONNotebook(AggregationJSONNotebook):
         Marino S, Hogue IB, Ray CJ, Kirschner DE.
         "A methodology for performing global uncertainty and sensitivity analysis in systems biology."
         J Theor Biol 2008; 254: 178-96. doi:10.1016/j.jtbi.2008.04.011
+
+        Only results with a single value at each point are included (see scalar_result_keys). Use
+        generate_sensitivity_indices_over_time for array-valued results.
+        :param processes: number of worker processes to spread the analysis over. If None, runs in this process.
         :return:
         """
-        num_uncertain_params = len(self.uncertain_parameters())
-
-        # Reduce to only the actual results, sort by parameter of interest, then resample, then run number
-        data = self.dataframe_aggregated().sort_values(by=[EFASTJSONNotebook.PARAMETER_OF_INTEREST,
-                                                           EFASTJSONNotebook.RESAMPLE_NUMBER,
-                                                           EFASTJSONNotebook.RUN_NUMBER])
-        params_of_interest = data[EFASTJSONNotebook.PARAMETER_OF_INTEREST]
-        required_parameters = list(set(params_of_interest))
+        data, required_parameters, resample_number, sample_number = self._search_curves()
+        results = self.scalar_result_keys()
+
+        # Outputs as (parameter of interest, resample, run, result)
+        outputs = np.asarray(data[results], dtype=float).reshape((len(required_parameters), resample_number,
+                                                                  sample_number, len(results)))
+        if processes is None:
+            s1, st = efast_indices(outputs, _INTERFERENCE_FACTOR)
+        else:
+            s1, st = parallel_efast_indices(outputs, _INTERFERENCE_FACTOR, processes)
 
-        sample_number = max(data[EFASTJSONNotebook.RUN_NUMBER]) + 1
-        resample_number =  max(data[EFASTJSONNotebook.RESAMPLE_NUMBER]) + 1
-        # TODO - hard-coded
-        interference_factor = 4
+        # First-order sensitivity indices
+        S1 = {(rk, p): [] for (rk,p) in itertools.product(results, self.uncertain_parameters())}
+        # Total-order sensitivity indices
+        ST = {(rk, p): [] for (rk,p) in itertools.product(results, self.uncertain_parameters())}
 
-        # Check we have all expected results (NS * k)
-        assert len(data) == len(required_parameters) * sample_number * resample_number, "Invalid data length"
+        for i in range(len(required_parameters)):
+            for j in range(len(results)):
+                S1[(results[j], required_parameters[i])] = s1[i, :, j].tolist()
+                ST[(results[j], required_parameters[i])] = st[i, :, j].tolist()
 
-        # Recreate the frequency vector used in the sampling
-        omega = np.zeros([num_uncertain_params])
-        omega[0] = math.floor((sample_number - 1.0) / (2.0 * interference_factor))
+        return S1, ST
 
-        # Recreate the complimentary parameter frequencies
-        m = math.floor(omega[0] / (2.0 * interference_factor))
-        if m >= (num_uncertain_params - 1):
-            omega[1:] = np.floor(np.linspace(1, m, num_uncertain_params - 1))
+    def generate_sensitivity_indices_over_time(self, result, processes=None):
+        """
+        Calculate the EFAST indices of every parameter of interest at every time point of an array-valued result
+        (e.g. a trajectory). All time points are analysed together, as the outputs of generate_sensitivity_indices
+        are, and the indices are averaged over the resamples.
+        :param result: result key, whose values are arrays of the same length at every point
+        :param processes: number of worker processes to spread the analysis over. If None, runs in this process.
+        :return: (S1, ST) DataFrames indexed by time point with a column per parameter, ready for plotting
+        """
+        data, required_parameters, resample_number, sample_number = self._search_curves()
+
+        # Time points take the place of the results, as (parameter of interest, resample, run, time)
+        trajectories = self.result_matrix(result, data)
+        outputs = trajectories.reshape((len(required_parameters), resample_number, sample_number,
+                                        trajectories.shape[1]))
+        if processes is None:
+            s1, st = efast_indices(outputs, _INTERFERENCE_FACTOR)
         else:
-            omega[1:] = np.arange(num_uncertain_params - 1) % m + 1
+            s1, st = parallel_efast_indices(outputs, _INTERFERENCE_FACTOR, processes)
 
-        # First-order sensitivity indices
-        S1 = {(rk, p): [] for (rk,p) in itertools.product(self._result_keys, self.uncertain_parameters())}
-        # Total-order sensitivity indices
-        ST = {(rk, p): [] for (rk,p) in itertools.product(self._result_keys, self.uncertain_parameters())}
+        index = Index(range(trajectories.shape[1]), name='time')
+        return (DataFrame(s1.mean(axis=1).T, index=index, columns=required_parameters),
+                DataFrame(st.mean(axis=1).T, index=index, columns=required_parameters))
 
-        # Loop through each uncertain parameter
-        for i in range(len(required_parameters)):
-            poi = required_parameters[i]
-            for rs in range(resample_number):
-                relevant_rows = data[(data.parameter_of_interest==poi) & (data.resample_number==rs)]
-                for result_key in self._result_keys:
-                    result_data = relevant_rows[result_key]
-                    f = np.fft.fft(result_data)
-                    Sp = np.power(np.absolute(f[np.arange(1, int((sample_number + 1) / 2))]) /
-                                          sample_number, 2)
-
-                    q = np.arange(1, int(interference_factor) + 1) * int(omega[0]) - 1
-                    V = 2 * np.sum(Sp)
-                    D1 = 2 * np.sum(Sp[q])
-                    S1[(result_key, poi)].append(D1 / V)
-
-                    q2 = np.arange(int(omega[0] / 2))
-                    Dt = 2 * sum(Sp[q2])
-                    ST[(result_key, poi)].append(1 - Dt/V)
-
-        return S1, ST
\ No newline at end of file
+
+class EFASTColumnarNotebook(ColumnarStorage, EFASTJSONNotebook):
+    """
+    EFASTJSONNotebook analysis over memory-mapped column storage, for designs too large to hold as JSON.
+    """
+    pass
@@ -0,0 +1,108 @@
+import epyc
+import math
+import numpy as np
+import scipy.stats as stats
+from .efastlab import UNIFORM_DISTRIBUTION, NORMAL_DISTRIBUTION, LOGNORMAL_DISTRIBUTION
+from ..design.parameterspace import ArrayParameterSpace
+from ..design.resume import Resumable
+from ..design.streams import SeededDesign, resolve_seed, uniform_rows
+from ..parallel.chunkedsubmission import ChunkedSubmission
+from ..parallel.processpool import ProcessPoolExecution
+
+# Reference material for RBD-FAST:
+#
+# Tarantola S, Gatelli D, Mara TA.
+# "Random balance designs for the estimation of first order global sensitivity indices."
+# Reliab Eng Syst Saf 2006; 91: 717-27. doi:10.1016/j.ress.2005.06.003
+
+
+def rbd_fast_parameter_space(sample_number, parameters, seed=None):
+    """
+    Generate model inputs for the random balance design Fourier Amplitude Sensitivity Test (RBD-FAST).
+
+    Every uncertain parameter follows the same search curve, x = 1/2 + arcsin(sin(s))/pi over N points s of
+    [-pi, pi), but each in an independent random order, so a single design of N runs gives the first-order indices
+    of all parameters rather than the N runs per parameter (and resample) of EFAST.
+
+    Parameters are specified as for efast_parameter_space, i.e. [low, high, distribution] for uncertain parameters
+    and a single value for certain ones.
+    :param sample_number: number of runs
+    :param parameters: parameters and values (from epyc)
+    :param seed: integer or RandomState for a reproducible sample (see resolve_seed), or None
+    :return: ArrayParameterSpace
+    """
+    uncertain_params = [(p, v[0], v[1], v[2]) for (p, v) in parameters.iteritems() if len(v) > 1]
+    certain_params = {p: v[0] for (p, v) in parameters.iteritems() if len(v) == 1}
+    names = [q[0] for q in uncertain_params]
+    k = len(uncertain_params)
+
+    # Points of the search curve, and an independent permutation of them for each parameter
+    s = -math.pi + (2 * math.pi / sample_number) * (np.arange(sample_number) + 0.5)
+    order = np.argsort(uniform_rows(resolve_seed(seed), 0, sample_number, k), axis=0)
+    x = 0.5 + (1 / math.pi) * np.arcsin(np.sin(s[order]))
+
+    # Convert 0-1 values into values within the parameter range, based on distribution values and distribution type.
+    for q in range(k):
+        _, d1, d2, dist = uncertain_params[q]
+        if dist == UNIFORM_DISTRIBUTION:
+            assert d1 < d2, "Second value must exceed first for uniform distribution: {0}, {1}".format(d1, d2)
+            x[:, q] = x[:, q] * (d2 - d1) + d1
+        elif dist == NORMAL_DISTRIBUTION:
+            assert d2 > 0, "Standard deviation for normal must exceed 0"
+            x[:, q] = stats.norm.ppf(x[:, q], loc=d1, scale=d2)
+        # lognormal distribution (ln-space, not base-10), as for EFAST
+        elif dist == LOGNORMAL_DISTRIBUTION:
+            x[:, q] = np.exp(stats.norm.ppf(x[:, q], loc=d1, scale=d2))
+        else:
+            raise Exception("Invalid distribtion")
+
+    samples = ArrayParameterSpace([(names[q], x[:, q]) for q in range(k)], certain_params)
+    return samples
+
+
+class RBDFASTDesign(SeededDesign):
+    """
+    Settings and parameter space of an RBD-FAST design, shared by RBDFASTLab and RBDFASTClusterLab.
+    """
+
+    _sample_number = 0
+
+    def set_sample_number(self, samples):
+        self._sample_number = samples
+
+    def __len__(self):
+        """The number of runs in the design, without generating it."""
+        if len(self._parameters) == 0:
+            return 0
+        return self._sample_number
+
+    def parameterSpace(self):
+        """Return the parameter space of the experiment as a sequence of dicts,
+        with each dict mapping each parameter name to a value. The dicts are
+        only created as the space is iterated over.
+        :returns: the parameter space as an ArrayParameterSpace"""
+        if len(self._parameters) == 0:
+            return []
+        else:
+            assert (self._sample_number > 0), "Sample number invalid: {0}. Set using {1}()"\
+                .format(self._sample_number, self.set_sample_number.__name__)
+            return self._remaining(rbd_fast_parameter_space(self._sample_number, self._parameters, self._seed))
+
+
+class RBDFASTLab(RBDFASTDesign, Resumable, epyc.Lab):
+    pass
+
+
+class RBDFASTProcessPoolLab(ProcessPoolExecution, RBDFASTLab):
+    """
+    RBDFASTLab running on a pool of local worker processes rather than in this process.
+    """
+    pass
+
+class RBDFASTClusterLab(ChunkedSubmission, RBDFASTDesign, Resumable, epyc.ClusterLab):
+    def __init__(self, notebook, profile, debug=False):
+        epyc.ClusterLab.__init__(self, notebook, profile=profile, debug=debug)
+
+    def _mixup(self, ps):
+        # Shuffle the order of the points rather than swapping generated dicts
+        return ps.shuffle(self._seed)
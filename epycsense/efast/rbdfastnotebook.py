@@ -0,0 +1,86 @@
+import numpy as np
+from pandas import DataFrame, MultiIndex
+from ..aggregated.aggregationnotebook import *
+from ..aggregated.columnarnotebook import ColumnarStorage
+
+# Reference material for RBD-FAST:
+#
+# Tarantola S, Gatelli D, Mara TA.
+# "Random balance designs for the estimation of first order global sensitivity indices."
+# Reliab Eng Syst Saf 2006; 91: 717-27. doi:10.1016/j.ress.2005.06.003
+#
+# Plischke E.
+# "An effective algorithm for computing global sensitivity indices (EASI)."
+# Reliab Eng Syst Saf 2010; 95: 354-60. doi:10.1016/j.ress.2009.11.005
+#
+# Tissot J-Y, Prieur C.
+# "Bias correction for the estimation of sensitivity indices based on random balance designs."
+# Reliab Eng Syst Saf 2012; 107: 205-13. doi:10.1016/j.ress.2012.06.010
+
+
+def rbd_fast_indices(x, outputs, interference_factor=6):
+    """
+    Calculate first-order sensitivity indices of every parameter from a single random balance design.
+
+    The runs are put in order along a search curve for each parameter by sorting them on that parameter's values
+    (taking every other run upwards and the rest back down, as per Plischke, 2010), and the first-order index is the
+    fraction of the variance in the first harmonics of the spectrum along that curve, with the bias correction of
+    Tissot and Prieur (2012). The reorderings of all parameters are gathered at once and their spectra found with a
+    single real FFT, so all parameters and outputs are handled in one call.
+    :param x: array of shape (runs, parameters) of the parameter values of each run
+    :param outputs: array of shape (runs, outputs)
+    :param interference_factor: number of harmonics included in the first-order index
+    :return: array of S1 of shape (parameters, outputs)
+    """
+    sample_number = len(x)
+    order = np.argsort(x, axis=0)
+    order = np.concatenate([order[::2], order[1::2][::-1]])
+
+    # Outputs along the curve of each parameter, as (parameter, run, output)
+    y = np.swapaxes(outputs[order], 0, 1)
+    f = np.fft.rfft(y, axis=1)
+    Sp = np.power(np.absolute(f[:, 1:int((sample_number + 1) / 2), :]) / sample_number, 2)
+
+    V = np.sum(Sp, axis=1)
+    D1 = np.sum(Sp[:, :int(interference_factor), :], axis=1)
+    S1 = D1 / V
+
+    # Remove the bias from the harmonics of the noise
+    bias = 2.0 * interference_factor / sample_number
+    return S1 - bias / (1 - bias) * (1 - S1)
+
+
+class RBDFASTJSONNotebook(AggregationJSONNotebook):
+    S1 = 'S1'
+
+    """
+    epyc Notebook for analysing results out of an epyc.RBDFASTLab or epyc.RBDFASTClusterLab
+    """
+
+    def __init__(self, name, create=True, description=None):
+        AggregationJSONNotebook.__init__(self, name, create, description)
+
+    def calculate_sensitivity_indices(self, interference_factor=6):
+        """
+        Calculate the first-order index of every uncertain parameter for every result (see rbd_fast_indices). Only
+        results with a single value at each point are included (see scalar_result_keys).
+        :param interference_factor: number of harmonics included in the first-order index
+        :return: DataFrame indexed by (parameter, result) with column S1
+        """
+        data = self.dataframe_aggregated()
+        params = self.uncertain_parameters()
+        results = self.scalar_result_keys()
+        assert len(data) > 2 * interference_factor, "Sample size must exceed twice the interference factor"
+
+        S1 = rbd_fast_indices(np.asarray(data[params], dtype=float), np.asarray(data[results], dtype=float),
+                              interference_factor)
+
+        index = MultiIndex.from_product([params, results], names=['parameter', 'result'])
+        return DataFrame({RBDFASTJSONNotebook.S1: S1.ravel()}, index=index, columns=[RBDFASTJSONNotebook.S1])
+
+
+class RBDFASTColumnarNotebook(ColumnarStorage, RBDFASTJSONNotebook):
+    """
+    RBDFASTJSONNotebook analysis over memory-mapped column storage, for designs too large to hold as JSON.
+    """
+    pass
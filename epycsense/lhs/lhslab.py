@@ -1,93 +1,219 @@
 import epyc
 import numpy
 import scipy.stats as stats
+from ..design.parameterspace import ArrayParameterSpace
+from ..design.resume import Resumable
+from ..design.streams import SeededDesign, resolve_seed, uniform_rows, SAMPLE_STREAM
+from ..aggregated.convergence import Convergent
+from ..parallel.chunkedsubmission import ChunkedSubmission
+from ..parallel.processpool import ProcessPoolExecution
 
 UNIFORM_DISTRIBUTION = 'uniform_distribution'
 NORMAL_DISTRIBUTION = 'normal_distribution'
 LOGNORMAL_DISTRIBUTION = 'lognormal_distribution'
 
+# Parameter added to every design, which should show no correlation with any result (Marino et al., 2008)
+DUMMY = 'dummy'
 
-def lhs_samples(parameters, stratifications):
-    uncertain_params = {}
-    certain_params = {}
 
-    parameters['dummy'] = [0,10,UNIFORM_DISTRIBUTION]
+def _lhs_matrix(parameters, quantiles, seed=None, stream=SAMPLE_STREAM):
+    """
+    Latin hypercube design placing every uncertain parameter at each of the given quantiles exactly once, in an
+    independent random order for each parameter.
 
+    The orders of all parameters come from a single array of random keys (each column argsorted independently), and
+    the quantile functions are applied to all the parameters of each distribution at once.
+    :param parameters: parameters and values (from epyc)
+    :param quantiles: array of quantiles in (0,1), one per design point
+    :param seed: integer seed (see resolve_seed), or None to use numpy's global random state
+    :param stream: random stream of the seed to use
+    :return: (matrix, names, certain parameters), where the matrix has a row per design point and a column per
+        uncertain parameter, as named, and certain parameters is a dict of the values of the other parameters
+    """
+    parameters[DUMMY] = [0,10,UNIFORM_DISTRIBUTION]
+
+    # Determine if each parameter is certain or uncertain
+    names = [p for (p, v) in parameters.iteritems() if len(v) > 1]
+    certain_params = {p: v[0] for (p, v) in parameters.iteritems() if len(v) == 1}
+
+    v1 = numpy.array([parameters[p][0] for p in names], dtype=float)
+    v2 = numpy.array([parameters[p][1] for p in names], dtype=float)
+    dists = numpy.array([parameters[p][2] for p in names])
+    for dist in set(dists):
+        if dist not in [UNIFORM_DISTRIBUTION, NORMAL_DISTRIBUTION, LOGNORMAL_DISTRIBUTION]:
+            raise Exception("Invalid distribtion")
+
+    # An independent permutation of the quantiles for each parameter
+    order = numpy.argsort(uniform_rows(seed, 0, len(quantiles), len(names), stream), axis=0)
+    matrix = numpy.asarray(quantiles, dtype=float)[order]
+
+    uniform = dists == UNIFORM_DISTRIBUTION
+    matrix[:, uniform] = v1[uniform] + (v2[uniform] - v1[uniform]) * matrix[:, uniform]
+    normal = dists == NORMAL_DISTRIBUTION
+    matrix[:, normal] = stats.norm.ppf(matrix[:, normal], v1[normal], v2[normal])
+    lognormal = dists == LOGNORMAL_DISTRIBUTION
+    matrix[:, lognormal] = stats.lognorm.ppf(matrix[:, lognormal], v1[lognormal], v2[lognormal])
+
+    return matrix, names, certain_params
+
+
+def _lhs_space(parameters, quantiles, seed=None, stream=SAMPLE_STREAM):
+    matrix, names, certain_params = _lhs_matrix(parameters, quantiles, seed, stream)
+    # Each sample takes the i-th row of the matrix, with the certain params
+    return ArrayParameterSpace([(names[q], matrix[:, q]) for q in range(len(names))], certain_params)
+
+
+def lhs_sample_matrix(parameters, stratifications, seed=None):
+    """
+    Latin hypercube sample of the parameters as an array, without creating any dicts.
+    :param parameters: parameters and values (from epyc)
+    :param stratifications: number of samples
+    :param seed: integer or RandomState for a reproducible sample (see resolve_seed), or None
+    :return: (matrix, names), where the matrix has shape (stratifications, number of uncertain parameters) and
+        names gives the parameter of each column
+    """
+    d = numpy.linspace(0,1,stratifications+2)[1:-1]
+    matrix, names, _ = _lhs_matrix(parameters, d, resolve_seed(seed))
+    return matrix, names
+
+
+def lhs_parameter_space(parameters, stratifications, seed=None):
+    """
+    Latin hypercube sample of the parameters, as a parameter space which produces each sample only when required.
+    :param parameters: parameters and values (from epyc)
+    :param stratifications: number of samples
+    :param seed: integer or RandomState for a reproducible sample (see resolve_seed), or None
+    :return: ArrayParameterSpace
+    """
     # Linspace 0-1, split into the number of stratfications sections
     d = numpy.linspace(0,1,stratifications+2)[1:-1]
+    return _lhs_space(parameters, d, resolve_seed(seed))
 
-    # Determine if each parameter is certain or uncertain
-    for param, param_range in parameters.iteritems():
-        if len(param_range) > 1:
-            v1, v2, dist = param_range
-            if dist == UNIFORM_DISTRIBUTION:
-                values = [v1 + (v2 - v1) * y for y in d]
-            elif dist == NORMAL_DISTRIBUTION:
-                values = stats.norm.ppf(d, v1, v2)
-            elif dist == LOGNORMAL_DISTRIBUTION:
-                values = stats.lognorm.ppf(d, v1, v2)
-            else:
-                raise Exception("Invalid distribtion")
-            uncertain_params[param] = values
-        else:
-            # Only one value so parameter is certain
-            certain_params[param] = param_range[0]
 
-    # Create the samples
-    param_samples = []
+def lhs_refinement_parameter_space(parameters, stratifications, seed=None):
+    """
+    The points which extend a Latin hypercube sample of the given number of stratifications (as produced by
+    lhs_parameter_space) into one of 2 * stratifications + 1 stratifications.
 
-    # Shuffle the range for each uncertain parameter
-    for p, param_range in uncertain_params.iteritems():
-        numpy.random.shuffle(uncertain_params[p])
+    The existing design places each parameter at the quantiles i / (n + 1). The doubled design uses the quantiles
+    j / (2n + 2), the even ones of which are exactly the existing values, so only the n + 1 odd quantiles need new
+    points. Each parameter takes every new quantile once, so the combined design is itself a Latin hypercube and the
+    existing runs don't need to be repeated.
+    :param parameters: parameters and values (from epyc)
+    :param stratifications: number of samples in the existing design
+    :param seed: integer or RandomState for a reproducible sample (see resolve_seed), or None
+    :return: ArrayParameterSpace of the n + 1 new points
+    """
+    d = numpy.linspace(0,1,2*stratifications+3)[1:-1]
+    # A stream of its own for each size of design, distinct from that of the original design
+    return _lhs_space(parameters, d[::2], resolve_seed(seed), 2*stratifications+1)
 
-    # Assign a parameter set based on the shuffled values
-    for i in range(stratifications):
-        sample = {p: v[i] for (p,v) in uncertain_params.iteritems()}
-        # Set the certain params
-        sample.update(certain_params)
-        param_samples.append(sample)
 
+def lhs_samples(parameters, stratifications, seed=None):
     # return the complete parameter space
-    return param_samples
+    return list(lhs_parameter_space(parameters, stratifications, seed))
 
 
-class LatinHypercubeLab(epyc.Lab):
+class LatinHypercubeDesign(SeededDesign, Convergent):
+    """
+    Sizing and generating a Latin hypercube design, doubling it without rerunning the points already run, and running
+    it in batches until the PRCCs converge, shared by LatinHypercubeLab and LatinHypercubeClusterLab.
+    """
 
-    def __init__(self, notebook):
-        self._stratifications = 0
-        epyc.Lab.__init__(self, notebook)
+    _stratifications = 0
+    _existing_stratifications = 0
 
     def set_stratifications(self, value):
         self._stratifications = value
+        self._existing_stratifications = 0
+
+    def double_stratifications(self):
+        """
+        Extend the design to 2n + 1 stratifications, where n is the number of stratifications already run. The next
+        experiment run submits only the n + 1 new points (see lhs_refinement_parameter_space), so the points already
+        in the notebook are kept. If no stratification number has been set on this lab, n is taken from the design
+        held in the notebook.
+        """
+        existing = self._stratifications
+        if existing == 0:
+            existing = self.notebook().stratifications()
+        assert existing > 0, "No existing design to extend"
+        self._existing_stratifications = existing
+        self._stratifications = 2 * existing + 1
+
+    def __len__(self):
+        """The number of points in the design, without generating it."""
+        if len(self.parameters()) == 0:
+            return 0
+        return self._stratifications - self._existing_stratifications
+
+    def run_until_converged(self, e, tolerance=0.05, top=None, max_stratifications=None):
+        """
+        Run the experiment in batches, doubling the design after each batch (see double_stratifications) until the
+        PRCC of every parameter against every result has converged (see indices_converged). Requires the notebook
+        to be a LatinHypercubeJSONNotebook.
+
+        If a stratification number has been set, the first batch is a design of that size. Otherwise the design
+        already held in the notebook is extended.
+        :param e: the experiment
+        :param tolerance: largest change in any PRCC between batches allowed for convergence
+        :param top: number of most sensitive parameters of each result whose ranking must be unchanged
+        :param max_stratifications: size of design at which to stop, even if not converged
+        :return: True if the PRCCs converged
+        """
+        return self._run_until_converged(e, tolerance, top, max_stratifications)
+
+    def _start_convergence(self, e):
+        if self._stratifications > 0 and self._existing_stratifications == 0:
+            self._run_batch(e)
+        return self._convergence_indices()
+
+    def _next_batch(self, max_stratifications):
+        existing = self._stratifications if self._stratifications > 0 else self.notebook().stratifications()
+        if max_stratifications is not None and 2 * existing + 1 > max_stratifications:
+            return False
+        self.double_stratifications()
+        return True
+
+    def _convergence_indices(self):
+        return {k: prcc for (k, (prcc, _)) in self.notebook().get_all_prcc().iteritems()}
 
-    def parameterSpace( self ):
-        """Return the parameter space of the experiment as a list of dicts,
-        with each dict mapping each parameter name to a value.
+    def parameterSpace(self):
+        """Return the parameter space of the experiment as a sequence of dicts,
+        with each dict mapping each parameter name to a value. The dicts are
+        only created as the space is iterated over.
 
-        :returns: the parameter space as a list of dicts"""
+        :returns: the parameter space as an ArrayParameterSpace"""
         ps = self.parameters()
         if len(ps) == 0:
             return []
         else:
             assert self._stratifications > 0, "Must set stratification number"
-            return lhs_samples(self._parameters, self._stratifications)
+            if self._existing_stratifications == self._stratifications:
+                # The refinement has already been produced, and there is nothing new until the design is doubled again
+                return []
+            if self._existing_stratifications > 0:
+                space = lhs_refinement_parameter_space(self._parameters, self._existing_stratifications, self._seed)
+                # Once its new points have been produced, the doubled design is the existing one
+                self._existing_stratifications = self._stratifications
+                return self._remaining(space)
+            return self._remaining(lhs_parameter_space(self._parameters, self._stratifications, self._seed))
 
 
-class LatinHypercubeClusterLab(epyc.ClusterLab):
-    def __init__(self, notebook, profile, debug=False):
-        epyc.ClusterLab.__init__(self, notebook, profile=profile, debug=debug)
+class LatinHypercubeLab(LatinHypercubeDesign, Resumable, epyc.Lab):
+    pass
 
-    def set_stratifications(self, value):
-        self._stratifications = value
 
-    def parameterSpace(self):
-        """Return the parameter space of the experiment as a list of dicts,
-        with each dict mapping each parameter name to a value.
+class LatinHypercubeProcessPoolLab(ProcessPoolExecution, LatinHypercubeLab):
+    """
+    LatinHypercubeLab running on a pool of local worker processes rather than in this process.
+    """
+    pass
 
-        :returns: the parameter space as a list of dicts"""
-        ps = self.parameters()
-        if len(ps) == 0:
-            return []
-        else:
-            assert self._stratifications > 0, "Must set stratification number"
-            return lhs_samples(self._parameters, self._stratifications)
+class LatinHypercubeClusterLab(ChunkedSubmission, LatinHypercubeDesign, Resumable, epyc.ClusterLab):
+    def __init__(self, notebook, profile, debug=False):
+        epyc.ClusterLab.__init__(self, notebook, profile=profile, debug=debug)
+
+    def _mixup(self, ps):
+        # Shuffle the order of the points rather than swapping generated dicts
+        return ps.shuffle(self._seed)
@@ -5,18 +5,109 @@ import matplotlib.pyplot as plt
 from sklearn import linear_model
 import numpy
 import scipy.stats as stats
-from pandas import DataFrame
+from pandas import DataFrame, Index, MultiIndex
 from ..aggregated.aggregationnotebook import AggregationJSONNotebook
+from ..aggregated.columnarnotebook import ColumnarStorage
+from ..design.streams import resolve_seed, random_state
 
 import matplotlib
 # matplotlib.use('agg')
 import matplotlib.pyplot as plt
 
 
+def prcc_matrix(parameter_data, result_data):
+    """
+    Calculate the partial correlation coefficient between every parameter column and every result column.
+
+    The residuals of each parameter against the remaining parameters are never built explicitly. With the
+    (centred) parameter data X, G = X'X and B = G^-1 X'Y, the partial correlation of parameter j and result r is
+    B[j,r] / sqrt(G^-1[j,j] * |R[:,r]|^2 + B[j,r]^2), where R = Y - XB are the residuals of the results against all
+    parameters. This is identical to correlating the two sets of regression residuals used in calculate_prcc.
+
+    Data is expected to be rank transformed already (for PRCC). Leading dimensions are treated as a batch, so
+    (..., n, k) parameters and (..., n, m) results give (..., k, m) coefficients.
+    :param parameter_data: array of shape (..., n, k)
+    :param result_data: array of shape (..., n, m)
+    :return: (coefficients, p_values), both of shape (..., k, m)
+    """
+    x = parameter_data - parameter_data.mean(axis=-2)[..., numpy.newaxis, :]
+    y = result_data - result_data.mean(axis=-2)[..., numpy.newaxis, :]
+    n = x.shape[-2]
+
+    xt = numpy.swapaxes(x, -1, -2)
+    g_inv = numpy.linalg.inv(numpy.matmul(xt, x))
+    b = numpy.matmul(g_inv, numpy.matmul(xt, y))
+    residuals = y - numpy.matmul(x, b)
+    residual_ss = numpy.sum(residuals ** 2, axis=-2)
+
+    g_diag = numpy.diagonal(g_inv, axis1=-2, axis2=-1)
+    corr = b / numpy.sqrt(g_diag[..., :, numpy.newaxis] * residual_ss[..., numpy.newaxis, :] + b ** 2)
+    corr = numpy.clip(corr, -1.0, 1.0)
+
+    # Two-tailed test of the correlation being non-zero, as per stats.pearsonr
+    df = n - 2
+    with numpy.errstate(divide='ignore'):
+        t_squared = corr ** 2 * (df / ((1.0 - corr) * (1.0 + corr)))
+    p_values = 2 * stats.t.sf(numpy.sqrt(t_squared), df)
+
+    return corr, p_values
+
+
+def _prcc_block(task):
+    parameter_data, result_data, rows = task
+    return prcc_matrix(parameter_data[rows], result_data[rows])[0]
+
+
+def prcc_bootstrap(parameter_data, result_data, resamples=1000, confidence_level=0.95, block_size=100, pool=None,
+                   seed=None):
+    """
+    Bootstrap confidence intervals for the coefficients of prcc_matrix.
+
+    The rows of every resample are drawn at once, and each block of resamples is a single batched call to
+    prcc_matrix, so no regression is fitted per resample or per (parameter, result) pair. Rows are resampled from
+    the data as given, i.e. with the ranks of the full sample.
+    :param parameter_data: array of shape (n, k)
+    :param result_data: array of shape (n, m)
+    :param resamples: number of bootstrap resamples
+    :param confidence_level: confidence level of the (percentile) intervals
+    :param block_size: number of resamples in each call to prcc_matrix (limits memory use)
+    :param pool: multiprocessing.Pool to spread the blocks over, or None to run them here
+    :param seed: integer or RandomState for reproducible resamples (see resolve_seed), or None
+    :return: (lower, upper) bounds, both of shape (k, m)
+    """
+    n = parameter_data.shape[0]
+    rows = random_state(resolve_seed(seed)).randint(n, size=(resamples, n))
+    tasks = [(parameter_data, result_data, rows[start:start + block_size])
+             for start in range(0, resamples, block_size)]
+    blocks = pool.map(_prcc_block, tasks) if pool is not None else map(_prcc_block, tasks)
+
+    estimates = numpy.concatenate(blocks)
+    tail = 50.0 * (1 - confidence_level)
+    lower, upper = numpy.nanpercentile(estimates, [tail, 100.0 - tail], axis=0)
+    return lower, upper
+
+
 class LatinHypercubeJSONNotebook(AggregationJSONNotebook):
+    PRCC = 'prcc'
+    P_VALUE = 'p_value'
+    PRCC_LOWER = 'prcc_lower'
+    PRCC_UPPER = 'prcc_upper'
+
     def __init__(self, name, create=True, description=None):
         AggregationJSONNotebook.__init__(self, name, create, description)
 
+    def stratifications(self):
+        """
+        Number of points in the design held in the notebook, which may have been built up over several experiments
+        by doubling the design (see LatinHypercubeLab.double_stratifications). A Latin hypercube design has a
+        distinct value of every uncertain parameter at each point.
+        :return: number of points
+        """
+        df = self.dataframe_aggregated()
+        for p in self.uncertain_parameters():
+            assert df[p].nunique() == len(df), "Design is not a Latin hypercube in parameter {0}".format(p)
+        return len(df)
+
     def get_all_pearson_correlation_coefficients(self):
         pccs = {}
         for p in self.uncertain_parameters():
@@ -59,11 +150,80 @@ class LatinHypercubeJSONNotebook(AggregationJSONNotebook):
         return stats.spearmanr(df[parameter], df[result])
 
     def get_all_prcc(self):
-        prccs = {}
-        for p in self.uncertain_parameters():
-            for r in self.result_keys():
-                prccs[(p, r)] = self.calculate_prcc(p, r)
-        return prccs
+        table = self.calculate_all_prcc()
+        return {(p, r): (row[LatinHypercubeJSONNotebook.PRCC], row[LatinHypercubeJSONNotebook.P_VALUE])
+                for ((p, r), row) in table.iterrows()}
+
+    def calculate_all_prcc(self):
+        """
+        Calculate the PRCC of every uncertain parameter against every result in a single pass.
+
+        The design is ranked once and the residual problems for all parameters and results are solved together (see
+        prcc_matrix), rather than fitting two regression models per (parameter, result) pair. Only results with a
+        single value at each point are included (see scalar_result_keys); use calculate_prcc_over_time for
+        array-valued results.
+        :return: DataFrame indexed by (parameter, result) with columns PRCC and P_VALUE
+        """
+        df = self.dataframe_aggregated()
+        params = self.uncertain_parameters()
+        results = self.scalar_result_keys()
+
+        ranked_params = numpy.asarray(DataFrame.rank(df[params]), dtype=float)
+        ranked_results = numpy.asarray(DataFrame.rank(df[results]), dtype=float)
+
+        prcc, p_values = prcc_matrix(ranked_params, ranked_results)
+
+        index = MultiIndex.from_product([params, results], names=['parameter', 'result'])
+        return DataFrame({LatinHypercubeJSONNotebook.PRCC: prcc.ravel(),
+                          LatinHypercubeJSONNotebook.P_VALUE: p_values.ravel()},
+                         index=index, columns=[LatinHypercubeJSONNotebook.PRCC, LatinHypercubeJSONNotebook.P_VALUE])
+
+    def calculate_prcc_over_time(self, result):
+        """
+        Calculate the PRCC of every uncertain parameter against every time point of an array-valued result (e.g. a
+        trajectory), with all time points ranked and solved together in one call to prcc_matrix.
+        :param result: result key, whose values are arrays of the same length at every point
+        :return: (PRCC, p-values) DataFrames indexed by time point with a column per parameter, ready for plotting
+        """
+        df = self.dataframe_aggregated()
+        params = self.uncertain_parameters()
+
+        ranked_params = numpy.asarray(DataFrame.rank(df[params]), dtype=float)
+        ranked_results = numpy.asarray(DataFrame(self.result_matrix(result, df)).rank(), dtype=float)
+
+        prcc, p_values = prcc_matrix(ranked_params, ranked_results)
+
+        index = Index(range(ranked_results.shape[1]), name='time')
+        return (DataFrame(prcc.T, index=index, columns=params),
+                DataFrame(p_values.T, index=index, columns=params))
+
+    def calculate_prcc_confidence_intervals(self, resamples=1000, confidence_level=0.95, pool=None, seed=None):
+        """
+        Calculate the PRCC of every uncertain parameter against every result with bootstrap confidence intervals
+        (see prcc_bootstrap). Array-valued results are left out, as for calculate_all_prcc.
+        :param resamples: number of bootstrap resamples
+        :param confidence_level: confidence level of the intervals
+        :param pool: multiprocessing.Pool to run the resamples on, or None
+        :param seed: integer or RandomState for reproducible intervals, or None
+        :return: DataFrame indexed by (parameter, result) with columns PRCC, PRCC_LOWER and PRCC_UPPER
+        """
+        df = self.dataframe_aggregated()
+        params = self.uncertain_parameters()
+        results = self.scalar_result_keys()
+
+        ranked_params = numpy.asarray(DataFrame.rank(df[params]), dtype=float)
+        ranked_results = numpy.asarray(DataFrame.rank(df[results]), dtype=float)
+
+        prcc, _ = prcc_matrix(ranked_params, ranked_results)
+        lower, upper = prcc_bootstrap(ranked_params, ranked_results, resamples, confidence_level, pool=pool,
+                                      seed=seed)
+
+        index = MultiIndex.from_product([params, results], names=['parameter', 'result'])
+        return DataFrame({LatinHypercubeJSONNotebook.PRCC: prcc.ravel(),
+                          LatinHypercubeJSONNotebook.PRCC_LOWER: lower.ravel(),
+                          LatinHypercubeJSONNotebook.PRCC_UPPER: upper.ravel()},
+                         index=index, columns=[LatinHypercubeJSONNotebook.PRCC, LatinHypercubeJSONNotebook.PRCC_LOWER,
+                                               LatinHypercubeJSONNotebook.PRCC_UPPER])
 
     def calculate_prcc(self, parameter, result, plot=False):
         """
@@ -86,7 +246,7 @@ class LatinHypercubeJSONNotebook(AggregationJSONNotebook):
         df = self.dataframe_aggregated()
 
         ranked_params = DataFrame.rank(df[self.uncertain_parameters()])
-        ranked_results = DataFrame.rank(df[self._result_keys])
+        ranked_results = DataFrame.rank(df[self.scalar_result_keys()])
 
         # Turn data into numpy arrays
 
@@ -124,3 +284,10 @@ class LatinHypercubeJSONNotebook(AggregationJSONNotebook):
         corr, p = stats.pearsonr(param_resid, result_resid)
 
         return (corr, p)
+
+
+class LatinHypercubeColumnarNotebook(ColumnarStorage, LatinHypercubeJSONNotebook):
+    """
+    LatinHypercubeJSONNotebook analysis over memory-mapped column storage, for designs too large to hold as JSON.
+    """
+    pass
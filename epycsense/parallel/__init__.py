@@ -0,0 +1,2 @@
+from chunkedsubmission import *
+from processpool import *
\ No newline at end of file
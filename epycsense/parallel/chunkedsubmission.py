@@ -0,0 +1,126 @@
+import epyc
+import time
+
+# Separates the job id of a chunk from the position of a point within it, in the ids of pending results
+CHUNK_SEPARATOR = '#'
+
+
+def chunk_job_id(jobid, i):
+    """
+    Id of the pending result for a point of a chunk submitted as one job.
+    :param jobid: id of the job running the chunk
+    :param i: position of the point in the chunk
+    :return: pending result id
+    """
+    return '{0}{1}{2}'.format(jobid, CHUNK_SEPARATOR, i)
+
+
+def split_chunk_job_id(pending):
+    """
+    Inverse of chunk_job_id.
+    :param pending: pending result id
+    :return: (job id, position in chunk), or (pending, None) if the result isn't part of a chunk
+    """
+    jobid, separator, i = pending.rpartition(CHUNK_SEPARATOR)
+    if separator and i.isdigit():
+        return jobid, int(i)
+    return pending, None
+
+
+def run_chunk(e, points):
+    """
+    Run an experiment at each point of a chunk, on a compute engine.
+    :param e: the experiment
+    :param points: the parameter points, e.g. a slice of an ArrayParameterSpace
+    :return: flat list of a results dict per point, in the order of the points
+    """
+    return [e.set(p).run() for p in points]
+
+
+class ChunkedSubmission(object):
+    """
+    Submission of the parameter space of an epyc.ClusterLab in chunks of points, rather than one job per point.
+
+    Each chunk is a single job: the slice of the parameter space (for an ArrayParameterSpace, its arrays of values
+    and the certain parameters) is sent to an engine once, the engine runs every point and the results of all the
+    points come back together. This cuts the scheduling and messaging per run for large designs of cheap
+    experiments. Every point still has its own pending result in the notebook, so results are stored as usual.
+
+    This is used ahead of epyc.ClusterLab, e.g. class EFASTClusterLab(ChunkedSubmission, epyc.ClusterLab). Points
+    are submitted individually unless a chunk size is set. The engines must be able to import epycsense.
+    """
+
+    _chunk_size = None
+
+    def set_chunk_size(self, size):
+        """
+        Number of points submitted to an engine as a single job.
+        :param size: points per chunk, or None to submit each point separately
+        """
+        assert size is None or size >= 1, "Chunk size must be at least 1"
+        self._chunk_size = size
+
+    def runExperiment(self, e):
+        """Run the experiment across the parameter space, submitting it to the
+        cluster in chunks of points if a chunk size has been set. This method
+        returns immediately.
+
+        :param e: the experiment"""
+        if self._chunk_size is None:
+            return super(ChunkedSubmission, self).runExperiment(e)
+
+        space = self.parameterSpace()
+        if len(space) > 0:
+            nb = self.notebook()
+
+            # randomise the order of the points, as for individual submission
+            ps = self._mixup(space)
+
+            try:
+                self.open()
+                view = self._client.load_balanced_view()
+                for start in range(0, len(ps), self._chunk_size):
+                    chunk = ps[start:start + self._chunk_size]
+                    jobid = view.apply_async(run_chunk, e, chunk).msg_ids[0]
+                    for (i, p) in enumerate(chunk):
+                        nb.addPendingResult(p, chunk_job_id(jobid, i))
+
+                    # avoid jobs being dropped when submitted too quickly (as per epyc.ClusterLab)
+                    time.sleep(0.01)
+            finally:
+                nb.commit()
+                self.close()
+
+    def updateResults(self):
+        """Update our results within any pending results that have completed since we
+        last retrieved results from the cluster, whether submitted individually or
+        in chunks.
+
+        :returns: the number of pending results completed at this call"""
+        nb = self.notebook()
+
+        n = 0
+        if nb.numberOfPendingResults() > 0:
+            # group the pending results by the job that will provide them
+            jobs = {}
+            for pending in set(nb.pendingResults()):
+                jobid, i = split_chunk_job_id(pending)
+                jobs.setdefault(jobid, []).append((i, pending))
+
+            self.open()
+            for (jobid, points) in jobs.iteritems():
+                # the result of a single job is the value returned on the engine, without any further nesting
+                result = self._client.get_result(jobid, block=False)
+                if result.ready():
+                    r = result.get()
+                    if points[0][0] is None:
+                        # an individually-submitted point, with its results dict
+                        nb.addResult(r, points[0][1])
+                    else:
+                        # a chunk, with the list of results from run_chunk, of which some points may have been
+                        # cancelled since submission
+                        nb.addResult([r[i] for (i, _) in points], [pending for (_, pending) in points])
+                    nb.commit()
+                    self._client.purge_hub_results(jobid)
+                    n = n + len(points)
+        return n
@@ -0,0 +1,80 @@
+import math
+import multiprocessing
+from .chunkedsubmission import run_chunk
+
+
+def _run_chunk_task(task):
+    e, points = task
+    return run_chunk(e, points)
+
+
+class ProcessPoolExecution(object):
+    """
+    Running the parameter space of an epyc.Lab on a pool of local worker processes, for using all the cores of a
+    single machine without setting up an ipyparallel cluster.
+
+    The space is split into chunks of points, each of which is sent to a worker (for an ArrayParameterSpace, as its
+    arrays of values) and run there, with the results of the chunk returned together. Results are added to the lab's
+    notebook as each chunk completes, either in the order of the parameter space or as soon as they are available,
+    and the notebook is committed once all have been run.
+
+    This is used ahead of a lab class, e.g. class EFASTProcessPoolLab(ProcessPoolExecution, EFASTLab). Experiments
+    must be picklable, i.e. defined at the top level of a module.
+    """
+
+    _processes = None
+    _chunk_size = None
+    _ordered = True
+
+    def set_processes(self, processes):
+        """
+        Number of worker processes.
+        :param processes: number of workers, or None for one per CPU
+        """
+        assert processes is None or processes >= 1, "Must have at least 1 process"
+        self._processes = processes
+
+    def set_chunk_size(self, size):
+        """
+        Number of points run by a worker as a single task.
+        :param size: points per chunk, or None to split the space into a few chunks per worker
+        """
+        assert size is None or size >= 1, "Chunk size must be at least 1"
+        self._chunk_size = size
+
+    def set_ordered(self, ordered):
+        """
+        Whether results are added to the notebook in the order of the parameter space, or as soon as they are
+        available.
+        :param ordered: True for the order of the parameter space
+        """
+        self._ordered = ordered
+
+    def runExperiment(self, e):
+        """Run an experiment over all the points in the parameter space, on a
+        pool of worker processes. The results will be stored in the notebook.
+
+        :param e: the experiment"""
+        ps = self.parameterSpace()
+        nb = self.notebook()
+
+        if len(ps) > 0:
+            processes = self._processes or multiprocessing.cpu_count()
+            chunk_size = self._chunk_size or int(math.ceil(len(ps) / (4.0 * processes)))
+            tasks = ((e, ps[start:start + chunk_size]) for start in range(0, len(ps), chunk_size))
+
+            pool = multiprocessing.Pool(processes)
+            try:
+                results = pool.imap(_run_chunk_task, tasks) if self._ordered \
+                    else pool.imap_unordered(_run_chunk_task, tasks)
+                for res in results:
+                    nb.addResult(res)
+                pool.close()
+            except:
+                pool.terminate()
+                raise
+            finally:
+                pool.join()
+
+        # commit the results
+        nb.commit()
@@ -0,0 +1,2 @@
+from morrislab import *
+from morrisnotebook import *
@@ -0,0 +1,205 @@
+import epyc
+import numpy as np
+import scipy.stats as stats
+from scipy.spatial.distance import cdist
+from .morrisnotebook import MorrisJSONNotebook
+from ..design.oat import morris_levels
+from ..design.parameterspace import ArrayParameterSpace
+from ..design.resume import Resumable
+from ..design.streams import SeededDesign
+from ..parallel.chunkedsubmission import ChunkedSubmission
+from ..parallel.processpool import ProcessPoolExecution
+from ..lhs.lhslab import UNIFORM_DISTRIBUTION, NORMAL_DISTRIBUTION, LOGNORMAL_DISTRIBUTION
+
+# Reference material for Morris screening:
+#
+# Morris MD.
+# "Factorial sampling plans for preliminary computational experiments."
+# Technometrics 1991; 33: 161-74. doi:10.1080/00401706.1991.10484804
+#
+# Campolongo F, Cariboni J, Saltelli A.
+# "An effective screening design for sensitivity analysis of large models."
+# Environ Model Softw 2007; 22: 1509-18. doi:10.1016/j.envsoft.2006.10.004
+
+# Number of distances between points found at once when comparing candidate trajectories (limits memory use)
+DISTANCE_BLOCK_SIZE = 2 ** 22
+
+
+def trajectory_distances(points):
+    """
+    Distance between every pair of trajectories, as the sum of the distances between each point of one and each point
+    of the other (Campolongo et al., 2007). The distances of a block of trajectories to all the others are found at
+    once, with the block sized so that about DISTANCE_BLOCK_SIZE point distances are held at a time.
+    :param points: array of shape (trajectories, points per trajectory, parameters)
+    :return: symmetric array of shape (trajectories, trajectories)
+    """
+    n, m, k = points.shape
+    flat = points.reshape((-1, k))
+    block = max(1, DISTANCE_BLOCK_SIZE // (n * m * m))
+    distances = np.empty((n, n))
+    for start in range(0, n, block):
+        stop = min(start + block, n)
+        d = cdist(flat[start * m:stop * m], flat)
+        distances[start:stop] = d.reshape((stop - start, m, n, m)).sum(axis=(1, 3))
+    return distances
+
+
+def select_trajectories(points, trajectories):
+    """
+    Choose the trajectories that are most spread out from a larger set of candidates, so that a few trajectories
+    still explore the whole parameter space.
+
+    Campolongo et al. (2007) choose the set maximising the square root of the sum of the squared distances between
+    each pair of its trajectories. Searching all sets is combinatorial, so they are chosen greedily: first the two
+    most distant candidates, then at each step the candidate adding most to the sum.
+    :param points: array of shape (candidates, points per trajectory, parameters)
+    :param trajectories: number of trajectories to choose
+    :return: array of the positions of the chosen candidates
+    """
+    candidates = len(points)
+    assert trajectories <= candidates, "Cannot choose {0} trajectories from {1}".format(trajectories, candidates)
+    squared = trajectory_distances(points) ** 2
+    chosen = list(np.unravel_index(np.argmax(squared), squared.shape))[:trajectories]
+    spread = squared[chosen].sum(axis=0)
+    spread[chosen] = -np.inf
+    while len(chosen) < trajectories:
+        c = int(np.argmax(spread))
+        chosen.append(c)
+        spread += squared[c]
+        spread[chosen] = -np.inf
+    return np.array(chosen)
+
+
+def morris_parameter_space(parameters, trajectories, levels=4, candidates=None, seed=None):
+    """
+    Generate model inputs for Morris elementary-effects screening.
+
+    Each uncertain parameter takes one of a number of levels, at evenly-spaced quantiles (i + 0.5) / levels of its
+    distribution, and each trajectory moves every uncertain parameter once, in a random order, by half the number of
+    levels (see morris_levels). If a number of candidates is given, that many trajectories are generated and the
+    most spread out chosen from them (see select_trajectories).
+
+    Parameters are specified as for lhs_samples, i.e. [low, high, distribution] for uncertain parameters and a single
+    value for certain ones. Each point records its trajectory, its step along the trajectory, the parameter moved to
+    reach it and the size of the move in quantiles, for the analysis.
+    :param parameters: parameters and values (from epyc)
+    :param trajectories: number of trajectories
+    :param levels: number of levels of each parameter (even numbers give moves of exactly half the range)
+    :param candidates: number of candidate trajectories to choose from, or None to use the trajectories generated
+    :param seed: integer or RandomState for a reproducible sample (see resolve_seed), or None
+    :return: ArrayParameterSpace of trajectories * (k + 1) points for k uncertain parameters
+    """
+    assert levels >= 2, "Must have at least 2 levels"
+    assert trajectories >= 1, "Must have at least 1 trajectory"
+
+    uncertain_params = [(p, v[0], v[1], v[2]) for (p, v) in parameters.iteritems() if len(v) > 1]
+    certain_params = {p: v[0] for (p, v) in parameters.iteritems() if len(v) == 1}
+    names = [q[0] for q in uncertain_params]
+    k = len(uncertain_params)
+
+    generated = trajectories if candidates is None else candidates
+    indices, varied = morris_levels(np.repeat(levels, k), generated, seed)
+    if candidates is not None:
+        chosen = select_trajectories(indices.reshape((candidates, k + 1, k)), trajectories)
+        indices = indices.reshape((candidates, k + 1, k))[chosen].reshape((-1, k))
+        varied = varied.reshape((candidates, k + 1))[chosen].ravel()
+
+    # Quantile of each level, and the signed move of the parameter varied at each step
+    x = (indices + 0.5) / levels
+    steps = np.arange(len(x)) % (k + 1)
+    delta = np.zeros(len(x))
+    moved = steps > 0
+    delta[moved] = x[moved, varied[moved]] - x[np.flatnonzero(moved) - 1, varied[moved]]
+
+    # Convert quantiles into values within the parameter range, based on distribution values and distribution type.
+    for q in range(k):
+        _, d1, d2, dist = uncertain_params[q]
+        if dist == UNIFORM_DISTRIBUTION:
+            assert d1 < d2, "Second value must exceed first for uniform distribution: {0}, {1}".format(d1, d2)
+            x[:, q] = x[:, q] * (d2 - d1) + d1
+        elif dist == NORMAL_DISTRIBUTION:
+            assert d2 > 0, "Standard deviation for normal must exceed 0"
+            x[:, q] = stats.norm.ppf(x[:, q], loc=d1, scale=d2)
+        elif dist == LOGNORMAL_DISTRIBUTION:
+            x[:, q] = stats.lognorm.ppf(x[:, q], d1, d2)
+        else:
+            raise Exception("Invalid distribtion")
+
+    columns = [(names[q], x[:, q]) for q in range(k)]
+    columns.extend([(MorrisJSONNotebook.TRAJECTORY, np.arange(len(x)) // (k + 1)),
+                    (MorrisJSONNotebook.STEP, steps),
+                    (MorrisJSONNotebook.VARIED_PARAMETER,
+                     np.array(names + [MorrisJSONNotebook.NO_PARAMETER])[varied]),
+                    (MorrisJSONNotebook.DELTA, delta)])
+    samples = ArrayParameterSpace(columns, certain_params)
+    return samples
+
+
+def morris_design_size(parameters, trajectories):
+    """
+    Number of runs in a Morris design, without generating it.
+    :return: number of runs
+    """
+    k = len([p for (p, v) in parameters.iteritems() if len(v) > 1])
+    return trajectories * (k + 1)
+
+
+class MorrisDesign(SeededDesign):
+    """
+    Settings and parameter space of a Morris design, shared by MorrisLab and MorrisClusterLab.
+    """
+
+    _trajectories = 0
+    _levels = 4
+    _candidates = None
+
+    def set_trajectories(self, trajectories):
+        self._trajectories = trajectories
+
+    def set_levels(self, levels):
+        self._levels = levels
+
+    def set_candidates(self, candidates):
+        """
+        Choose the trajectories as the most spread out of a larger number of candidates.
+        :param candidates: number of candidate trajectories, or None to use the trajectories as generated
+        """
+        self._candidates = candidates
+
+    def __len__(self):
+        """The number of runs in the design, without generating it."""
+        if len(self._parameters) == 0:
+            return 0
+        return morris_design_size(self._parameters, self._trajectories)
+
+    def parameterSpace(self):
+        """Return the parameter space of the experiment as a sequence of dicts,
+        with each dict mapping each parameter name to a value. The dicts are
+        only created as the space is iterated over.
+        :returns: the parameter space as an ArrayParameterSpace"""
+        if len(self._parameters) == 0:
+            return []
+        else:
+            assert (self._trajectories >= 1), "Trajectories invalid: {0}. Set using {1}()"\
+                .format(self._trajectories, self.set_trajectories.__name__)
+            return self._remaining(morris_parameter_space(self._parameters, self._trajectories, self._levels,
+                                                          self._candidates, self._seed))
+
+
+class MorrisLab(MorrisDesign, Resumable, epyc.Lab):
+    pass
+
+
+class MorrisProcessPoolLab(ProcessPoolExecution, MorrisLab):
+    """
+    MorrisLab running on a pool of local worker processes rather than in this process.
+    """
+    pass
+
+class MorrisClusterLab(ChunkedSubmission, MorrisDesign, Resumable, epyc.ClusterLab):
+    def __init__(self, notebook, profile, debug=False):
+        epyc.ClusterLab.__init__(self, notebook, profile=profile, debug=debug)
+
+    def _mixup(self, ps):
+        # Shuffle the order of the points rather than swapping generated dicts
+        return ps.shuffle(self._seed)
@@ -0,0 +1,128 @@
+import numpy as np
+from pandas import DataFrame, MultiIndex
+from ..aggregated.aggregationnotebook import *
+from ..aggregated.columnarnotebook import ColumnarStorage
+
+# Reference material for Morris screening:
+#
+# Morris MD.
+# "Factorial sampling plans for preliminary computational experiments."
+# Technometrics 1991; 33: 161-74. doi:10.1080/00401706.1991.10484804
+#
+# Campolongo F, Cariboni J, Saltelli A.
+# "An effective screening design for sensitivity analysis of large models."
+# Environ Model Softw 2007; 22: 1509-18. doi:10.1016/j.envsoft.2006.10.004
+
+
+def elementary_effects(outputs, delta, varied, parameters):
+    """
+    Elementary effects of every parameter on every output along Morris trajectories. Each effect is the difference
+    between consecutive points of a trajectory divided by the move between them, taken for all trajectories and
+    outputs at once.
+    :param outputs: array of shape (trajectories, k + 1, outputs), with the points of each trajectory in order
+    :param delta: array of shape (trajectories, k + 1) of the signed move of the varied parameter to each point
+    :param varied: array of shape (trajectories, k + 1) of the position of the parameter moved to reach each point
+    (ignored at the start of each trajectory)
+    :param parameters: number of parameters, k
+    :return: array of shape (trajectories, parameters, outputs)
+    """
+    effects = np.diff(outputs, axis=1) / delta[:, 1:, np.newaxis]
+    # Put the effects of each trajectory in parameter order
+    order = np.argsort(varied[:, 1:], axis=1)
+    t = np.arange(len(outputs))[:, np.newaxis]
+    assert (varied[t, 1 + order] == np.arange(parameters)).all(), "Each trajectory must move every parameter once"
+    return effects[t, order]
+
+
+class MorrisJSONNotebook(AggregationJSONNotebook):
+    TRAJECTORY = 'trajectory'
+    STEP = 'trajectory_step'
+    VARIED_PARAMETER = 'varied_parameter'
+    DELTA = 'morris_delta'
+    # Varied parameter of the first point of each trajectory
+    NO_PARAMETER = 'none'
+
+    MU = 'mu'
+    MU_STAR = 'mu_star'
+    SIGMA = 'sigma'
+
+    """
+    epyc Notebook for analysing results out of an epyc.MorrisLab or epyc.MorrisClusterLab
+    """
+
+    def __init__(self, name, create=True, description=None):
+        AggregationJSONNotebook.__init__(self, name, create, description)
+
+    def uncertain_parameters(self):
+        """
+        Uncertain parameters (excludes the Morris design values)
+        :return:
+        """
+        params = AggregationJSONNotebook.uncertain_parameters(self)
+        for p in [MorrisJSONNotebook.TRAJECTORY, MorrisJSONNotebook.STEP, MorrisJSONNotebook.VARIED_PARAMETER,
+                  MorrisJSONNotebook.DELTA]:
+            if p in params:
+                params.remove(p)
+        return params
+
+    def elementary_effects(self):
+        """
+        Elementary effects of every parameter on every result with a single value at each point (see
+        scalar_result_keys), along every trajectory of the design.
+        :return: (parameters, effects), with effects of shape (trajectories, parameters, results)
+        """
+        data = self.dataframe_aggregated().sort_values(by=[MorrisJSONNotebook.TRAJECTORY, MorrisJSONNotebook.STEP])
+        varied = np.asarray(data[MorrisJSONNotebook.VARIED_PARAMETER]).astype(str)
+        start = varied == MorrisJSONNotebook.NO_PARAMETER
+        # Sorted, so matches the order of the effects
+        parameters = np.unique(varied[~start]).tolist()
+        trajectories = data[MorrisJSONNotebook.TRAJECTORY].nunique()
+        points = len(parameters) + 1
+        assert len(data) == trajectories * points, "Invalid data length"
+
+        positions = np.where(start, -1, np.searchsorted(parameters, varied))
+        results = self.scalar_result_keys()
+        outputs = np.asarray(data[results], dtype=float).reshape((trajectories, points, len(results)))
+        delta = np.asarray(data[MorrisJSONNotebook.DELTA], dtype=float).reshape((trajectories, points))
+        return parameters, elementary_effects(outputs, delta, positions.reshape((trajectories, points)),
+                                              len(parameters))
+
+    def calculate_morris_indices(self):
+        """
+        Morris screening measures of every uncertain parameter for every result: the mean of the elementary effects
+        (mu), the mean of their absolute values (mu*), which ranks the parameters by overall influence, and their
+        standard deviation (sigma), which shows non-linearity or interactions.
+        :return: DataFrame indexed by (parameter, result) with columns MU, MU_STAR and SIGMA
+        """
+        parameters, effects = self.elementary_effects()
+        sigma = np.std(effects, axis=0, ddof=1) if len(effects) > 1 else np.full(effects.shape[1:], np.nan)
+
+        index = MultiIndex.from_product([parameters, self.scalar_result_keys()], names=['parameter', 'result'])
+        return DataFrame({MorrisJSONNotebook.MU: np.mean(effects, axis=0).ravel(),
+                          MorrisJSONNotebook.MU_STAR: np.mean(np.abs(effects), axis=0).ravel(),
+                          MorrisJSONNotebook.SIGMA: sigma.ravel()},
+                         index=index, columns=[MorrisJSONNotebook.MU, MorrisJSONNotebook.MU_STAR,
+                                               MorrisJSONNotebook.SIGMA])
+
+    def influential_parameters(self, fraction=0.1, results=None):
+        """
+        Parameters that matter to any of the results, for a more expensive analysis of just those parameters (e.g.
+        by passing them to EFASTLab.set_required_parameters). A parameter matters to a result if its mu* is at least
+        the given fraction of the largest mu* of any parameter for that result.
+        :param fraction: fraction of the largest mu* for a parameter to be included
+        :param results: results to consider (defaults to all)
+        :return: list of parameter names, most influential first
+        """
+        mu_star = self.calculate_morris_indices()[MorrisJSONNotebook.MU_STAR].unstack('result')
+        if results is not None:
+            mu_star = mu_star[results]
+        relative = mu_star / mu_star.max(axis=0)
+        influence = relative.max(axis=1)
+        return influence[influence >= fraction].sort_values(ascending=False).index.tolist()
+
+
+class MorrisColumnarNotebook(ColumnarStorage, MorrisJSONNotebook):
+    """
+    MorrisJSONNotebook analysis over memory-mapped column storage, for designs too large to hold as JSON.
+    """
+    pass
@@ -0,0 +1,2 @@
+from sobollab import *
+from sobolnotebook import *
\ No newline at end of file
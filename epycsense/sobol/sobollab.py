@@ -0,0 +1,149 @@
+import epyc
+import numpy as np
+import scipy.stats as stats
+from .sobolnotebook import SobolJSONNotebook
+from ..design.parameterspace import ArrayParameterSpace
+from ..design.resume import Resumable
+from ..design.streams import SeededDesign, resolve_seed, uniform_rows
+from ..parallel.chunkedsubmission import ChunkedSubmission
+from ..parallel.processpool import ProcessPoolExecution
+from ..lhs.lhslab import UNIFORM_DISTRIBUTION, NORMAL_DISTRIBUTION, LOGNORMAL_DISTRIBUTION
+
+# Reference material for the Saltelli design:
+#
+# Saltelli A.
+# "Making best use of model evaluations to compute sensitivity indices."
+# Comput Phys Commun 2002; 145: 280-97. doi:10.1016/S0010-4655(02)00280-1
+
+
+def saltelli_parameter_space(sample_number, parameters, second_order=True, seed=None):
+    """
+    Generate model inputs for estimating Sobol' indices with a Saltelli design.
+
+    Two independent samples of the uncertain parameters, A and B, are drawn, each with sample_number rows. For each
+    uncertain parameter i, AB_i is A with column i taken from B and (for second-order indices) BA_i is B with column
+    i taken from A. The design holds all of these matrices, giving sample_number * (k + 2) runs, or
+    sample_number * (2k + 2) with second-order matrices, for k uncertain parameters.
+
+    Parameters are specified as for lhs_samples, i.e. [low, high, distribution] for uncertain parameters and a single
+    value for certain ones.
+    :param sample_number: number of rows in each of the A and B matrices
+    :param parameters: parameters and values (from epyc)
+    :param second_order: include the BA_i matrices needed for second-order indices
+    :param seed: integer or RandomState for a reproducible sample (see resolve_seed), or None
+    :return: ArrayParameterSpace
+    """
+    assert sample_number > 1, "Sample number must be > 1"
+
+    uncertain_params = [(p, v[0], v[1], v[2]) for (p, v) in parameters.iteritems() if len(v) > 1]
+    certain_params = {p: v[0] for (p, v) in parameters.iteritems() if len(v) == 1}
+    names = [q[0] for q in uncertain_params]
+    k = len(uncertain_params)
+
+    # Independent A and B samples on [0,1)
+    base = uniform_rows(resolve_seed(seed), 0, sample_number, 2 * k)
+    A = base[:, :k]
+    B = base[:, k:]
+
+    # AB_i for every parameter at once: A repeated for each parameter, with the diagonal block taken from B
+    swap = np.eye(k, dtype=bool)[:, np.newaxis, :]
+    blocks = [A[np.newaxis], B[np.newaxis], np.where(swap, B[np.newaxis], A[np.newaxis])]
+    matrices = [SobolJSONNotebook.MATRIX_A, SobolJSONNotebook.MATRIX_B] + [SobolJSONNotebook.MATRIX_AB] * k
+    matrix_parameters = [SobolJSONNotebook.NO_PARAMETER] * 2 + names
+    if second_order:
+        blocks.append(np.where(swap, A[np.newaxis], B[np.newaxis]))
+        matrices.extend([SobolJSONNotebook.MATRIX_BA] * k)
+        matrix_parameters.extend(names)
+    x = np.concatenate(blocks).reshape((-1, k))
+
+    # Convert 0-1 values into values within the parameter range, based on distribution values and distribution type.
+    for q in range(k):
+        _, d1, d2, dist = uncertain_params[q]
+        if dist == UNIFORM_DISTRIBUTION:
+            assert d1 < d2, "Second value must exceed first for uniform distribution: {0}, {1}".format(d1, d2)
+            x[:, q] = x[:, q] * (d2 - d1) + d1
+        elif dist == NORMAL_DISTRIBUTION:
+            assert d2 > 0, "Standard deviation for normal must exceed 0"
+            x[:, q] = stats.norm.ppf(x[:, q], loc=d1, scale=d2)
+        elif dist == LOGNORMAL_DISTRIBUTION:
+            x[:, q] = stats.lognorm.ppf(x[:, q], d1, d2)
+        else:
+            raise Exception("Invalid distribtion")
+
+    # Bookkeeping columns for each row
+    columns = [(names[q], x[:, q]) for q in range(k)]
+    columns.extend([(SobolJSONNotebook.MATRIX, np.repeat(matrices, sample_number)),
+                    (SobolJSONNotebook.MATRIX_PARAMETER, np.repeat(matrix_parameters, sample_number)),
+                    (SobolJSONNotebook.SAMPLE_ROW, np.tile(np.arange(sample_number), len(matrices)))])
+    samples = ArrayParameterSpace(columns, certain_params)
+    return samples
+
+
+def saltelli_samples(sample_number, parameters, second_order=True, seed=None):
+    """
+    Generate the model inputs of a Saltelli design as a list of dicts. See saltelli_parameter_space.
+    :return: list of dicts
+    """
+    return list(saltelli_parameter_space(sample_number, parameters, second_order, seed))
+
+
+def saltelli_design_size(sample_number, parameters, second_order=True):
+    """
+    Number of runs in a Saltelli design, without generating it.
+    :return: number of runs
+    """
+    k = len([p for (p, v) in parameters.iteritems() if len(v) > 1])
+    return sample_number * ((2 * k if second_order else k) + 2)
+
+
+class SobolDesign(SeededDesign):
+    """
+    Settings and parameter space of a Saltelli design, shared by SobolLab and SobolClusterLab.
+    """
+
+    _sample_number = 0
+    _second_order = True
+
+    def set_sample_number(self, samples):
+        self._sample_number = samples
+
+    def set_second_order(self, second_order):
+        self._second_order = second_order
+
+    def __len__(self):
+        """The number of runs in the design, without generating it."""
+        if len(self._parameters) == 0:
+            return 0
+        return saltelli_design_size(self._sample_number, self._parameters, self._second_order)
+
+    def parameterSpace(self):
+        """Return the parameter space of the experiment as a sequence of dicts,
+        with each dict mapping each parameter name to a value. The dicts are
+        only created as the space is iterated over.
+        :returns: the parameter space as an ArrayParameterSpace"""
+        if len(self._parameters) == 0:
+            return []
+        else:
+            assert (self._sample_number > 1), "Sample number invalid: {0}. Set using {1}()"\
+                .format(self._sample_number, self.set_sample_number.__name__)
+            return self._remaining(saltelli_parameter_space(self._sample_number, self._parameters, self._second_order,
+                                                            self._seed))
+
+
+class SobolLab(SobolDesign, Resumable, epyc.Lab):
+    pass
+
+
+class SobolProcessPoolLab(ProcessPoolExecution, SobolLab):
+    """
+    SobolLab running on a pool of local worker processes rather than in this process.
+    """
+    pass
+
+class SobolClusterLab(ChunkedSubmission, SobolDesign, Resumable, epyc.ClusterLab):
+    def __init__(self, notebook, profile, debug=False):
+        epyc.ClusterLab.__init__(self, notebook, profile=profile, debug=debug)
+
+    def _mixup(self, ps):
+        # Shuffle the order of the points rather than swapping generated dicts
+        return ps.shuffle(self._seed)
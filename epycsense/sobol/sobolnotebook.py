@@ -0,0 +1,196 @@
+import numpy as np
+import scipy.stats as stats
+from pandas import DataFrame, MultiIndex
+from ..aggregated.aggregationnotebook import *
+from ..aggregated.columnarnotebook import ColumnarStorage
+from ..design.streams import random_state
+
+# Reference material for Sobol' indices:
+#
+# Saltelli A.
+# "Making best use of model evaluations to compute sensitivity indices."
+# Comput Phys Commun 2002; 145: 280-97. doi:10.1016/S0010-4655(02)00280-1
+#
+# Saltelli A, Annoni P, Azzini I, Campolongo F, Ratto M, Tarantola S.
+# "Variance based sensitivity analysis of model output. Design and estimator for the total sensitivity index."
+# Comput Phys Commun 2010; 181: 259-70. doi:10.1016/j.cpc.2009.09.018
+
+
+def sobol_indices(A, B, AB, BA=None):
+    """
+    Estimate Sobol' sensitivity indices from the model outputs of a Saltelli design.
+
+    First-order indices use the Saltelli et al. (2010) estimator and total-order indices the Jansen estimator. If the
+    BA matrices are given, second-order indices are estimated as per Saltelli (2002). Every estimator is a mean over
+    the sample axis, so all parameters and outputs (and any leading axes, e.g. bootstrap resamples) are handled in
+    one call.
+    :param A: outputs of the A matrix, array of shape (..., sample_number, outputs)
+    :param B: outputs of the B matrix, array of shape (..., sample_number, outputs)
+    :param AB: outputs of the AB_i matrices (A with column i from B), shape (parameters, ..., sample_number, outputs)
+    :param BA: outputs of the BA_i matrices (B with column i from A), as for AB, or None
+    :return: dict of S1 and ST arrays of shape (parameters, ..., outputs), plus S2 of shape
+    (parameters, parameters, ..., outputs) if BA is given, symmetric with NaN on the diagonal
+    """
+    sample_number = A.shape[-2]
+    V = np.var(np.concatenate([A, B], axis=-2), axis=-2)
+
+    indices = {SobolJSONNotebook.S1: np.mean(B * (AB - A), axis=-2) / V,
+               SobolJSONNotebook.ST: 0.5 * np.mean((A - AB) ** 2, axis=-2) / V}
+
+    if BA is not None:
+        # Mean of BA_j * AB_k over the samples for all pairs at once
+        Vjk = np.einsum('j...nm,k...nm->jk...m', BA, AB) / sample_number - np.mean(A * B, axis=-2)
+        S1 = indices[SobolJSONNotebook.S1]
+        S2 = Vjk / V - S1[:, np.newaxis] - S1[np.newaxis, :]
+        # Each pair is estimated twice (BA_j AB_k and BA_k AB_j), so average the two
+        S2 = 0.5 * (S2 + np.swapaxes(S2, 0, 1))
+        diagonal = np.arange(S2.shape[0])
+        S2[diagonal, diagonal] = np.nan
+        indices[SobolJSONNotebook.S2] = S2
+
+    return indices
+
+
+def sobol_confidence_intervals(A, B, AB, BA=None, resamples=1000, confidence_level=0.95, block_size=100, seed=None):
+    """
+    Bootstrap confidence intervals for the indices of sobol_indices. Resampling the rows of the design is done with
+    index arrays and a block of resamples is estimated in a single call to sobol_indices.
+    :param resamples: number of bootstrap resamples
+    :param confidence_level: confidence level of the intervals
+    :param block_size: number of resamples estimated at once (limits memory use)
+    :param seed: integer or RandomState for reproducible intervals (see resolve_seed), or None
+    :return: dict of half-widths of the confidence intervals for each index, shaped as per sobol_indices
+    """
+    sample_number = A.shape[-2]
+    rng = random_state(seed)
+    estimates = {}
+    for start in range(0, resamples, block_size):
+        rows = rng.randint(sample_number, size=(min(block_size, resamples - start), sample_number))
+        block = sobol_indices(A[rows], B[rows], AB[:, rows], None if BA is None else BA[:, rows])
+        for (index, values) in block.iteritems():
+            estimates.setdefault(index, []).append(values)
+
+    z = stats.norm.ppf(0.5 + confidence_level / 2.0)
+    # Resamples are on the axis after the parameter axes
+    return {index: z * np.std(np.concatenate(values, axis=values[0].ndim - 2), axis=values[0].ndim - 2)
+            for (index, values) in estimates.iteritems()}
+
+
+class SobolJSONNotebook(AggregationJSONNotebook):
+    SAMPLE_ROW = 'sample_row'
+    MATRIX = 'matrix'
+    MATRIX_PARAMETER = 'matrix_parameter'
+
+    MATRIX_A = 'A'
+    MATRIX_B = 'B'
+    MATRIX_AB = 'AB'
+    MATRIX_BA = 'BA'
+    # Matrix parameter of the A and B rows, which don't take a column from the other matrix
+    NO_PARAMETER = 'none'
+
+    S1 = 'S1'
+    S1_CONF = 'S1_conf'
+    ST = 'ST'
+    ST_CONF = 'ST_conf'
+    S2 = 'S2'
+    S2_CONF = 'S2_conf'
+
+    """
+    epyc Notebook for analysing results out of an epyc.SobolLab or epyc.SobolClusterLab
+    """
+
+    def __init__(self, name, create=True, description=None):
+        AggregationJSONNotebook.__init__(self, name, create, description)
+
+    def uncertain_parameters(self):
+        """
+        Uncertain parameters (excludes the Saltelli design values)
+        :return:
+        """
+        params = AggregationJSONNotebook.uncertain_parameters(self)
+        for p in [SobolJSONNotebook.SAMPLE_ROW, SobolJSONNotebook.MATRIX, SobolJSONNotebook.MATRIX_PARAMETER]:
+            if p in params:
+                params.remove(p)
+        return params
+
+    def sobol_matrices(self):
+        """
+        Outputs of the Saltelli design, arranged as the A, B, AB_i and (if run) BA_i matrices. The outputs are those of
+        the results with a single value at each point (see scalar_result_keys), in order.
+        :return: (parameters, A, B, AB, BA), with A and B of shape (sample_number, outputs), AB and BA of shape
+        (parameters, sample_number, outputs) and BA None if the design has no second-order matrices
+        """
+        data = self.dataframe_aggregated().sort_values(by=[SobolJSONNotebook.MATRIX,
+                                                           SobolJSONNotebook.MATRIX_PARAMETER,
+                                                           SobolJSONNotebook.SAMPLE_ROW])
+        matrices = data[SobolJSONNotebook.MATRIX]
+        # Sorted, so matches the order of the rows
+        parameters = np.unique(data[SobolJSONNotebook.MATRIX_PARAMETER][matrices == SobolJSONNotebook.MATRIX_AB])\
+            .tolist()
+        sample_number = int(max(data[SobolJSONNotebook.SAMPLE_ROW])) + 1
+        results = self.scalar_result_keys()
+        outputs = np.asarray(data[results], dtype=float)
+
+        def matrix(name, blocks):
+            values = outputs[np.asarray(matrices == name)]
+            assert len(values) == blocks * sample_number, "Invalid data length for matrix {0}".format(name)
+            return values.reshape((blocks, sample_number, len(results)))
+
+        A = matrix(SobolJSONNotebook.MATRIX_A, 1)[0]
+        B = matrix(SobolJSONNotebook.MATRIX_B, 1)[0]
+        AB = matrix(SobolJSONNotebook.MATRIX_AB, len(parameters))
+        BA = None
+        if (matrices == SobolJSONNotebook.MATRIX_BA).any():
+            BA = matrix(SobolJSONNotebook.MATRIX_BA, len(parameters))
+        return parameters, A, B, AB, BA
+
+    def calculate_sensitivity_indices(self, resamples=1000, confidence_level=0.95, seed=None):
+        """
+        Calculate the first and total-order Sobol' indices of every uncertain parameter for every result, with
+        bootstrap confidence intervals.
+        :param resamples: number of bootstrap resamples
+        :param confidence_level: confidence level of the intervals
+        :param seed: integer or RandomState for reproducible intervals (see resolve_seed), or None
+        :return: DataFrame indexed by (parameter, result) with columns S1, S1_CONF, ST and ST_CONF
+        """
+        parameters, A, B, AB, _ = self.sobol_matrices()
+        indices = sobol_indices(A, B, AB)
+        conf = sobol_confidence_intervals(A, B, AB, resamples=resamples, confidence_level=confidence_level, seed=seed)
+
+        index = MultiIndex.from_product([parameters, self.scalar_result_keys()], names=['parameter', 'result'])
+        return DataFrame({SobolJSONNotebook.S1: indices[SobolJSONNotebook.S1].ravel(),
+                          SobolJSONNotebook.S1_CONF: conf[SobolJSONNotebook.S1].ravel(),
+                          SobolJSONNotebook.ST: indices[SobolJSONNotebook.ST].ravel(),
+                          SobolJSONNotebook.ST_CONF: conf[SobolJSONNotebook.ST].ravel()},
+                         index=index, columns=[SobolJSONNotebook.S1, SobolJSONNotebook.S1_CONF,
+                                               SobolJSONNotebook.ST, SobolJSONNotebook.ST_CONF])
+
+    def calculate_second_order_indices(self, resamples=1000, confidence_level=0.95, seed=None):
+        """
+        Calculate the second-order Sobol' indices of every pair of uncertain parameters for every result, with
+        bootstrap confidence intervals. Requires the design to have been run with second-order matrices.
+        :param resamples: number of bootstrap resamples
+        :param confidence_level: confidence level of the intervals
+        :param seed: integer or RandomState for reproducible intervals (see resolve_seed), or None
+        :return: DataFrame indexed by (parameter_1, parameter_2, result) with columns S2 and S2_CONF
+        """
+        parameters, A, B, AB, BA = self.sobol_matrices()
+        assert BA is not None, "Design has no second-order matrices"
+        indices = sobol_indices(A, B, AB, BA)
+        conf = sobol_confidence_intervals(A, B, AB, BA, resamples=resamples, confidence_level=confidence_level,
+                                          seed=seed)
+
+        # Each unordered pair once
+        j, k = np.triu_indices(len(parameters), 1)
+        pairs = [(parameters[a], parameters[b], r) for (a, b) in zip(j, k) for r in self.scalar_result_keys()]
+        index = MultiIndex.from_tuples(pairs, names=['parameter_1', 'parameter_2', 'result'])
+        return DataFrame({SobolJSONNotebook.S2: indices[SobolJSONNotebook.S2][j, k].ravel(),
+                          SobolJSONNotebook.S2_CONF: conf[SobolJSONNotebook.S2][j, k].ravel()},
+                         index=index, columns=[SobolJSONNotebook.S2, SobolJSONNotebook.S2_CONF])
+
+
+class SobolColumnarNotebook(ColumnarStorage, SobolJSONNotebook):
+    """
+    SobolJSONNotebook analysis over memory-mapped column storage, for designs too large to hold as JSON.
+    """
+    pass
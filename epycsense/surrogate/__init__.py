@@ -0,0 +1 @@
+from polynomialchaos import *
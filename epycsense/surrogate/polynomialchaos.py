@@ -0,0 +1,158 @@
+import itertools
+import numpy as np
+from numpy.polynomial.legendre import legvander
+from scipy.special import comb
+from pandas import DataFrame, Index, MultiIndex
+
+# Reference material for polynomial chaos surrogates:
+#
+# Sudret B.
+# "Global sensitivity analysis using polynomial chaos expansions."
+# Reliab Eng Syst Saf 2008; 93: 964-79. doi:10.1016/j.ress.2007.04.002
+#
+# Blatman G, Sudret B.
+# "Adaptive sparse polynomial chaos expansion based on least angle regression."
+# J Comput Phys 2011; 230: 2345-67. doi:10.1016/j.jcp.2010.12.021
+
+S1 = 'S1'
+ST = 'ST'
+DEGREE = 'degree'
+LOO_ERROR = 'loo_error'
+
+
+def rank_quantiles(x):
+    """
+    Transform each parameter onto [-1, 1] by its ranks, so that its values are uniformly spread (exactly so for a
+    Latin hypercube design). Sobol' indices are unchanged by a monotonic transformation of each parameter, so the
+    expansion can be fitted on the transformed values whatever the parameters' distributions.
+    :param x: array of shape (runs, parameters)
+    :return: array of the same shape with values in (-1, 1)
+    """
+    ranks = np.argsort(np.argsort(x, axis=0), axis=0)
+    return 2 * (ranks + 0.5) / len(x) - 1
+
+
+def total_degree_indices(parameters, degree):
+    """
+    Multi-indices of the polynomials of total degree up to the given degree.
+    :param parameters: number of parameters
+    :param degree: maximum total degree
+    :return: integer array with a row per polynomial (the constant first) giving its degree in each parameter
+    """
+    rows = [np.bincount(np.array(c, dtype=int), minlength=parameters)
+            for d in range(degree + 1) for c in itertools.combinations_with_replacement(range(parameters), d)]
+    return np.array(rows, dtype=int).reshape((-1, parameters))
+
+
+def total_degree_size(parameters, degree):
+    """
+    Number of polynomials of total degree up to the given degree, i.e. of rows of total_degree_indices, without
+    building them.
+    :param parameters: number of parameters
+    :param degree: maximum total degree
+    :return: number of polynomials
+    """
+    return comb(parameters + degree, degree, exact=True)
+
+
+def legendre_design(z, indices):
+    """
+    Values of the orthonormal multivariate Legendre polynomials at each run.
+    :param z: array of shape (runs, parameters) with values in [-1, 1]
+    :param indices: multi-indices of the polynomials (see total_degree_indices)
+    :return: array of shape (runs, polynomials)
+    """
+    degree = int(indices.max()) if indices.size else 0
+    # Univariate polynomials of every parameter, as (run, parameter, degree), scaled to unit variance
+    univariate = legvander(z, degree) * np.sqrt(2 * np.arange(degree + 1) + 1)
+    design = np.ones((len(z), len(indices)))
+    for j in range(z.shape[1]):
+        design *= univariate[:, j, indices[:, j]]
+    return design
+
+
+def fit_polynomial_chaos(z, outputs, degree):
+    """
+    Least-squares fit of a Legendre polynomial chaos expansion of the given total degree to every output at once,
+    with the leave-one-out error of each fit found from the diagonal of the hat matrix rather than by refitting.
+    :param z: array of shape (runs, parameters) with values in [-1, 1]
+    :param outputs: array of shape (runs, outputs)
+    :param degree: total degree of the expansion
+    :return: (indices, coefficients, loo_error), with coefficients of shape (polynomials, outputs) and the
+    leave-one-out error of each output relative to its variance
+    """
+    indices = total_degree_indices(z.shape[1], degree)
+    assert len(indices) < len(z), "Degree {0} needs more than {1} runs".format(degree, len(indices))
+    design = legendre_design(z, indices)
+    coefficients = np.linalg.lstsq(design, outputs, rcond=None)[0]
+
+    q, _ = np.linalg.qr(design)
+    leverage = np.sum(q ** 2, axis=1)
+    residuals = (outputs - design.dot(coefficients)) / (1 - leverage)[:, np.newaxis]
+    loo_error = np.mean(residuals ** 2, axis=0) / np.var(outputs, axis=0)
+    return indices, coefficients, loo_error
+
+
+def polynomial_chaos_indices(indices, coefficients):
+    """
+    First and total-order Sobol' indices of a polynomial chaos expansion, from its coefficients. The variance of an
+    orthonormal expansion is the sum of its squared coefficients (excluding the constant), and the variance due to a
+    set of parameters is the sum over the polynomials of those parameters.
+    :param indices: multi-indices of the polynomials (see total_degree_indices)
+    :param coefficients: array of shape (polynomials, outputs)
+    :return: dict of S1 and ST arrays of shape (parameters, outputs)
+    """
+    squared = coefficients ** 2
+    involved = indices > 0
+    variance = np.sum(squared[involved.any(axis=1)], axis=0)
+    alone = involved & (involved.sum(axis=1) == 1)[:, np.newaxis]
+    return {S1: alone.T.astype(float).dot(squared) / variance,
+            ST: involved.T.astype(float).dot(squared) / variance}
+
+
+def surrogate_sensitivity_indices(notebook, degree=None, max_degree=6):
+    """
+    Variance-based sensitivity indices of every uncertain parameter for every result from the runs already held in a
+    notebook (e.g. those of a LatinHypercubeLab), by fitting a polynomial chaos expansion to the results and finding
+    the indices analytically from its coefficients, without running a further design.
+
+    If no degree is given, expansions of each degree up to max_degree (that the number of runs can support) are
+    fitted and the one with the smallest leave-one-out error is used for each result. The leave-one-out error of the
+    fit used, relative to the variance of the result, shows how far the surrogate (and so the indices) can be
+    trusted: values of a few percent or less indicate a good fit.
+    Only results with a single value at each point are included (see scalar_result_keys).
+    :param notebook: notebook of aggregated results, e.g. a LatinHypercubeJSONNotebook
+    :param degree: total degree of the expansion, or None to choose it for each result
+    :param max_degree: highest degree tried if choosing the degree
+    :return: (indices, errors), where indices is a DataFrame indexed by (parameter, result) with columns S1 and ST,
+    and errors is a DataFrame indexed by result with columns DEGREE and LOO_ERROR
+    """
+    data = notebook.dataframe_aggregated()
+    params = notebook.uncertain_parameters()
+    results = notebook.scalar_result_keys()
+    z = rank_quantiles(np.asarray(data[params], dtype=float))
+    outputs = np.asarray(data[results], dtype=float)
+
+    if degree is not None:
+        degrees = [degree]
+    else:
+        degrees = [d for d in range(1, max_degree + 1) if total_degree_size(len(params), d) < len(z)]
+        assert degrees, "Too few runs to fit an expansion"
+
+    best_error = np.full(len(results), np.inf)
+    best_degree = np.zeros(len(results), dtype=int)
+    s1 = np.empty((len(params), len(results)))
+    st = np.empty((len(params), len(results)))
+    for d in degrees:
+        indices, coefficients, loo_error = fit_polynomial_chaos(z, outputs, d)
+        better = loo_error < best_error
+        sobol = polynomial_chaos_indices(indices, coefficients)
+        s1[:, better] = sobol[S1][:, better]
+        st[:, better] = sobol[ST][:, better]
+        best_error[better] = loo_error[better]
+        best_degree[better] = d
+
+    index = MultiIndex.from_product([params, results], names=['parameter', 'result'])
+    return (DataFrame({S1: s1.ravel(), ST: st.ravel()}, index=index, columns=[S1, ST]),
+            DataFrame({DEGREE: best_degree, LOO_ERROR: best_error}, index=Index(results, name='result'),
+                      columns=[DEGREE, LOO_ERROR]))
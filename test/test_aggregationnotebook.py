@@ -1,5 +1,6 @@
 import unittest
 import numpy
+from datetime import datetime
 from epycsense import *
 
 
@@ -27,6 +28,13 @@ class Model(epyc.Experiment):
         return results
 
 
+class FailingModel(Model):
+    def do(self, params):
+        if params[self.PARAM_X2] == 3:
+            raise Exception("Failed")
+        return Model.do(self, params)
+
+
 class AggregationJSONNotebookTestCase(unittest.TestCase):
 
     def setUp(self):
@@ -34,8 +42,9 @@ class AggregationJSONNotebookTestCase(unittest.TestCase):
 
     def tearDown(self):
         # # Get rid of json file
-        if os.path.exists(self.filename):
-            os.remove(self.filename)
+        for fn in [self.filename, self.filename + '.journal']:
+            if os.path.exists(fn):
+                os.remove(fn)
 
     def test_repetition(self):
         # Original run
@@ -68,6 +77,141 @@ class AggregationJSONNotebookTestCase(unittest.TestCase):
             for k,v in res.iteritems():
                 self.assertAlmostEqual(v,res2[k])
 
+    def test_incremental_aggregation(self):
+        nb = AggregationJSONNotebook(self.filename, create=True)
+        lab = epyc.Lab(nb)
+        lab[Model.PARAM_X1] = 2
+        lab[Model.PARAM_X2] = [2, 3, 4]
+        lab[Model.PARAM_X3] = 5
+        lab[Model.PARAM_X4] = 6
+        lab.runExperiment(Model())
+
+        df = nb.dataframe_aggregated()
+        self.assertEqual(len(df), 3)
+        self.assertItemsEqual(nb.uncertain_parameters(), [Model.PARAM_X2])
+        # Unchanged data is not rebuilt
+        self.assertIs(nb.dataframe_aggregated(), df)
+
+        # New points are appended, repeated points are re-aggregated
+        lab[Model.PARAM_X4] = [6, 7]
+        lab.runExperiment(Model())
+        df = nb.dataframe_aggregated()
+        self.assertEqual(len(df), 6)
+        self.assertEqual(len(nb.aggregated_results()), 6)
+        self.assertItemsEqual(nb.uncertain_parameters(), [Model.PARAM_X2, Model.PARAM_X4])
+
+        # Further repetitions of existing points are re-aggregated in place
+        lab.runExperiment(Model())
+        df = nb.dataframe_aggregated()
+        self.assertEqual(len(df), 6)
+        for j in nb.aggregated_results():
+            params = j[Experiment.PARAMETERS]
+            reps = nb.resultsFor(params)
+            self.assertEqual(len(reps), 3 if params[Model.PARAM_X4] == 6 else 2)
+            row = df[(df[Model.PARAM_X2] == params[Model.PARAM_X2]) & (df[Model.PARAM_X4] == params[Model.PARAM_X4])]
+            self.assertEqual(len(row), 1)
+            self.assertAlmostEqual(row[Model.RESULT_2].iloc[0],
+                                   numpy.mean([r[Experiment.RESULTS][Model.RESULT_2] for r in reps]))
+
+    def test_reducers(self):
+        nb = AggregationJSONNotebook(self.filename, create=True)
+        lab = epyc.Lab(nb)
+        lab[Model.PARAM_X1] = 2
+        lab[Model.PARAM_X2] = [2, 3, 4]
+        lab[Model.PARAM_X3] = 5
+        lab[Model.PARAM_X4] = [6, 7]
+        lab.runExperiment(RepeatedExperiment(Model(), 5))
+
+        reducers = [(MEAN, numpy.mean), (MEDIAN, numpy.median), (VARIANCE, lambda v: numpy.var(v, ddof=1)),
+                    (0.25, lambda v: numpy.percentile(v, 25)), (numpy.max, numpy.max)]
+        for (reducer, expected) in reducers:
+            nb.set_reducer(reducer)
+            df = nb.dataframe_aggregated()
+            self.assertEqual(len(df), 6)
+            for j in nb.aggregated_results():
+                params = j[Experiment.PARAMETERS]
+                reps = [r[Experiment.RESULTS][Model.RESULT_2] for r in nb.resultsFor(params)]
+                self.assertAlmostEqual(j[Experiment.RESULTS][Model.RESULT_2], expected(reps))
+
+        # Only points with new repetitions are re-aggregated
+        nb.set_reducer(MEDIAN)
+        before = nb.dataframe_aggregated().copy()
+        lab[Model.PARAM_X4] = 7
+        lab.runExperiment(Model())
+        after = nb.dataframe_aggregated()
+        unchanged = after[Model.PARAM_X4] == 6
+        self.assertTrue((after[unchanged] == before[unchanged]).all().all())
+        for j in nb.aggregated_results():
+            if j[Experiment.PARAMETERS][Model.PARAM_X4] == 7:
+                reps = nb.resultsFor(j[Experiment.PARAMETERS])
+                self.assertEqual(len(reps), 6)
+                self.assertAlmostEqual(j[Experiment.RESULTS][Model.RESULT_2],
+                                       numpy.median([r[Experiment.RESULTS][Model.RESULT_2] for r in reps]))
+
+    def test_failed_runs(self):
+        nb = AggregationJSONNotebook(self.filename, create=True)
+        lab = epyc.Lab(nb)
+        lab[Model.PARAM_X1] = 2
+        lab[Model.PARAM_X2] = [2, 3, 4]
+        lab[Model.PARAM_X3] = 5
+        lab[Model.PARAM_X4] = 6
+        lab.runExperiment(RepeatedExperiment(FailingModel(), 2))
+        # Failed runs are left out of the aggregation
+        self.assertItemsEqual(nb.dataframe_aggregated()[Model.PARAM_X2], [2, 4])
+
+    def run_uncommitted(self, nb, x2):
+        # Results added as they would be by a lab interrupted before committing
+        e = Model()
+        for v in x2:
+            nb.addResult(e.set({Model.PARAM_X1: 2, Model.PARAM_X2: v, Model.PARAM_X3: 5, Model.PARAM_X4: 6}).run())
+
+    def test_journal(self):
+        nb = AggregationJSONNotebook(self.filename, create=True)
+        self.run_uncommitted(nb, [2, 3])
+        journal = nb.journal_name()
+        self.assertTrue(os.path.exists(journal))
+        # A line per result, after the header
+        with open(journal) as f:
+            self.assertEqual(len(f.readlines()), 3)
+
+        # Committing compacts the journal into the notebook
+        nb.commit()
+        self.assertFalse(os.path.exists(journal))
+        self.run_uncommitted(nb, [4])
+
+        # Reopening recovers the uncommitted result
+        nb_post = AggregationJSONNotebook(self.filename, create=False)
+        self.assertEqual(nb_post.numberOfResults(), 3)
+        self.assertFalse(os.path.exists(journal))
+        self.assertItemsEqual(nb_post.dataframe_aggregated()[Model.PARAM_X2], [2, 3, 4])
+        r = nb_post.resultsFor({Model.PARAM_X1: 2, Model.PARAM_X2: 4, Model.PARAM_X3: 5, Model.PARAM_X4: 6})[0]
+        self.assertIsInstance(r[Experiment.METADATA][Experiment.START_TIME], datetime)
+
+        # Creating discards any journal
+        self.run_uncommitted(nb_post, [5])
+        nb_new = AggregationJSONNotebook(self.filename, create=True)
+        self.assertFalse(os.path.exists(journal))
+        self.assertEqual(nb_new.numberOfResults(), 0)
+
+    def test_journal_recovery(self):
+        # Interrupted before the notebook was ever committed, and while writing to the journal
+        nb = AggregationJSONNotebook(self.filename, create=True)
+        self.run_uncommitted(nb, [2, 3])
+        with open(nb.journal_name(), 'a') as f:
+            f.write('{"result": {"par')
+        nb_post = AggregationJSONNotebook(self.filename, create=False)
+        self.assertEqual(nb_post.numberOfResults(), 2)
+
+        # A journal left behind after it was committed isn't replayed again
+        self.run_uncommitted(nb_post, [4])
+        with open(nb_post.journal_name()) as f:
+            stale = f.read()
+        nb_post.commit()
+        with open(nb_post.journal_name(), 'w') as f:
+            f.write(stale)
+        nb_post = AggregationJSONNotebook(self.filename, create=False)
+        self.assertEqual(nb_post.numberOfResults(), 3)
+
 
 if __name__ == '__main__':
     unittest.main()
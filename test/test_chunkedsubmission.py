@@ -0,0 +1,128 @@
+import unittest
+import pickle
+from epycsense import *
+import numpy
+
+
+class Model(epyc.Experiment):
+    PARAM_A = 'a'
+    PARAM_B = 'b'
+    RESULT = 'result'
+
+    def do(self, params):
+        return {Model.RESULT: params[self.PARAM_A] * params[self.PARAM_B]}
+
+
+class StubAsyncResult(object):
+    # The result of a job, as returned by Client.get_result
+    def __init__(self, value):
+        self._value = value
+        self._ready = False
+
+    def ready(self):
+        return self._ready
+
+    def get(self):
+        assert self._ready
+        return self._value
+
+
+class StubAsyncMessage(object):
+    def __init__(self, msg_ids):
+        self.msg_ids = msg_ids
+
+
+class StubClient(object):
+    # A cluster which runs each job as it's submitted, but only reports it complete once finish() is called
+    def __init__(self):
+        self.jobs = {}
+        self.purged = []
+
+    def load_balanced_view(self):
+        return self
+
+    def apply_async(self, f, *args):
+        jobid = 'job{0}'.format(len(self.jobs))
+        self.jobs[jobid] = StubAsyncResult(f(*args))
+        return StubAsyncMessage([jobid])
+
+    def finish(self):
+        for result in self.jobs.values():
+            result._ready = True
+
+    def get_result(self, jobid, block=None):
+        return self.jobs[jobid]
+
+    def purge_hub_results(self, jobid):
+        self.purged.append(jobid)
+
+    def close(self):
+        pass
+
+
+class StubClusterLab(ChunkedSubmission, epyc.ClusterLab):
+    def __init__(self, notebook, client):
+        self._stub = client
+        epyc.ClusterLab.__init__(self, notebook)
+
+    def open(self):
+        self._client = self._stub
+
+
+class ChunkedSubmissionTestCase(unittest.TestCase):
+
+    def test_chunk_job_id(self):
+        pending = chunk_job_id('1f2e-3d4c', 17)
+        self.assertEqual(split_chunk_job_id(pending), ('1f2e-3d4c', 17))
+        self.assertEqual(split_chunk_job_id(u'1f2e-3d4c'), (u'1f2e-3d4c', None))
+
+    def test_run_chunk(self):
+        space = ArrayParameterSpace([(Model.PARAM_A, numpy.arange(10.0))], {Model.PARAM_B: 3}).shuffle(seed=1)
+        chunk = space[4:8]
+        # Chunks travel to the engines as arrays, not dicts
+        chunk = pickle.loads(pickle.dumps(chunk, pickle.HIGHEST_PROTOCOL))
+
+        results = run_chunk(Model(), chunk)
+        self.assertEqual(len(results), 4)
+        for (row, res) in zip(space[4:8], results):
+            self.assertEqual(res[epyc.Experiment.PARAMETERS], row)
+            self.assertEqual(res[epyc.Experiment.RESULTS][Model.RESULT], row[Model.PARAM_A] * 3)
+            self.assertTrue(res[epyc.Experiment.METADATA][epyc.Experiment.STATUS])
+
+    def test_update_results(self):
+        # Each job still awaited is collected and purged once
+        for (chunk_size, jobs) in [(None, 9), (4, 3), (10, 1)]:
+            client = StubClient()
+            nb = epyc.LabNotebook()
+            lab = StubClusterLab(nb, client)
+            lab[Model.PARAM_A] = range(10)
+            lab[Model.PARAM_B] = 3
+            lab.set_chunk_size(chunk_size)
+            lab.runExperiment(Model())
+            self.assertEqual(nb.numberOfPendingResults(), 10)
+
+            # Nothing is added until the jobs complete
+            self.assertEqual(lab.updateResults(), 0)
+            client.finish()
+
+            # Points cancelled since submission are left out
+            cancelled = sorted(nb.pendingResults())[0]
+            nb.cancelPendingResult(cancelled)
+            self.assertEqual(lab.updateResults(), 9)
+            self.assertEqual(nb.numberOfPendingResults(), 0)
+            self.assertEqual(nb.numberOfResults(), 9)
+            for res in nb.results():
+                self.assertEqual(res[epyc.Experiment.RESULTS][Model.RESULT],
+                                 res[epyc.Experiment.PARAMETERS][Model.PARAM_A] * 3)
+            self.assertEqual(len(client.purged), jobs)
+            self.assertEqual(lab.updateResults(), 0)
+
+    def test_set_chunk_size(self):
+        # Cluster labs take a chunk size (running them requires an ipcluster)
+        for cls in [LatinHypercubeClusterLab, EFASTClusterLab, SobolClusterLab, ScatterClusterLab]:
+            self.assertTrue(issubclass(cls, ChunkedSubmission))
+            self.assertIsNone(cls._chunk_size)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,300 @@
+import unittest
+import numpy
+import shutil
+from epycsense import *
+
+
+class Model(epyc.Experiment):
+    PARAM_X1 = 'x1'
+    PARAM_X2 = 'x2'
+    PARAM_X3 = 'x3'
+    PARAM_X4 = 'x4'
+    SA_PARAMS = [PARAM_X1, PARAM_X2, PARAM_X3, PARAM_X4]
+
+    RESULT_1 = 'res1'
+    RESULT_2 = 'res2'
+    RESULT_3 = 'res3'
+    SA_RESULTS = [RESULT_1,
+                  RESULT_2,
+                  RESULT_3]
+
+    def do(self, params):
+        results = {Model.RESULT_1: params[self.PARAM_X1],
+                   Model.RESULT_2: numpy.random.random() * params[self.PARAM_X2],
+                   Model.RESULT_3: params[self.PARAM_X3] + params[self.PARAM_X4]}
+        return results
+
+
+class FailingModel(Model):
+    def do(self, params):
+        if params[self.PARAM_X2] == 3:
+            raise Exception("Failed")
+        return Model.do(self, params)
+
+
+class AggregationColumnarNotebookTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.filename = 'columnartest.json'
+        self.json_filename = 'columnartest_json.json'
+
+    def tearDown(self):
+        for fn in [self.filename, self.json_filename]:
+            if os.path.exists(fn):
+                os.remove(fn)
+            if os.path.exists(fn + '.columns'):
+                shutil.rmtree(fn + '.columns')
+
+    def run_lab(self, nb, x4, model=None, reps=3):
+        lab = epyc.Lab(nb)
+        lab[Model.PARAM_X1] = 2
+        lab[Model.PARAM_X2] = [2, 3, 4]
+        lab[Model.PARAM_X3] = 5.5
+        lab[Model.PARAM_X4] = x4
+        lab.runExperiment(RepeatedExperiment(model or Model(), reps))
+
+    def test_aggregation_matches_json(self):
+        numpy.random.seed(1)
+        nb = AggregationColumnarNotebook(self.filename, create=True)
+        self.run_lab(nb, [6, 7, 8])
+        numpy.random.seed(1)
+        nb_json = AggregationJSONNotebook(self.json_filename, create=True)
+        self.run_lab(nb_json, [6, 7, 8])
+
+        keys = Model.SA_PARAMS + Model.SA_RESULTS
+        expected = nb_json.dataframe_aggregated()[keys].sort_values(by=keys).reset_index(drop=True)
+        actual = nb.dataframe_aggregated()[keys].sort_values(by=keys).reset_index(drop=True)
+        self.assertTrue(numpy.allclose(numpy.asarray(actual, dtype=float), numpy.asarray(expected, dtype=float)))
+        self.assertItemsEqual(nb.uncertain_parameters(), [Model.PARAM_X2, Model.PARAM_X4])
+        self.assertItemsEqual(nb.certain_parameters(), [Model.PARAM_X1, Model.PARAM_X3])
+
+        # Reload from file, with the columns mapped rather than read
+        nb_post = AggregationColumnarNotebook(self.filename, create=False)
+        self.assertEqual(nb_post.numberOfResults(), 27)
+        self.assertTrue(isinstance(nb_post.column(epyc.Experiment.PARAMETERS, Model.PARAM_X2), numpy.memmap))
+        actual = nb_post.dataframe_aggregated()[keys].sort_values(by=keys).reset_index(drop=True)
+        self.assertTrue(numpy.allclose(numpy.asarray(actual, dtype=float), numpy.asarray(expected, dtype=float)))
+
+    def test_reducer(self):
+        numpy.random.seed(1)
+        nb = AggregationColumnarNotebook(self.filename, create=True)
+        self.run_lab(nb, [6, 7], reps=5)
+        numpy.random.seed(1)
+        nb_json = AggregationJSONNotebook(self.json_filename, create=True)
+        self.run_lab(nb_json, [6, 7], reps=5)
+
+        keys = Model.SA_PARAMS + Model.SA_RESULTS
+        for reducer in [MEDIAN, 0.75]:
+            nb.set_reducer(reducer)
+            nb_json.set_reducer(reducer)
+            expected = nb_json.dataframe_aggregated()[keys].sort_values(by=keys).reset_index(drop=True)
+            actual = nb.dataframe_aggregated()[keys].sort_values(by=keys).reset_index(drop=True)
+            self.assertTrue(numpy.allclose(numpy.asarray(actual, dtype=float), numpy.asarray(expected, dtype=float)))
+
+    def test_append(self):
+        nb = AggregationColumnarNotebook(self.filename, create=True)
+        self.run_lab(nb, [6, 7])
+        column_file = os.path.join(self.filename + '.columns', '0.bin')
+        size = os.path.getsize(column_file)
+        self.assertEqual(size, 18 * 8)
+
+        nb = AggregationColumnarNotebook(self.filename, create=False)
+        self.run_lab(nb, [8])
+        # Committed runs are extended in place
+        self.assertEqual(os.path.getsize(column_file), 27 * 8)
+
+        nb = AggregationColumnarNotebook(self.filename, create=False)
+        self.assertEqual(nb.numberOfResults(), 27)
+        df = nb.dataframe_aggregated()
+        self.assertEqual(len(df), 9)
+        self.assertItemsEqual(df[Model.PARAM_X4].unique(), [6, 7, 8])
+        for _, row in df.iterrows():
+            self.assertEqual(row[Model.RESULT_3], row[Model.PARAM_X3] + row[Model.PARAM_X4])
+
+    def test_interrupted_commit(self):
+        for compressed in [False, True]:
+            nb = AggregationColumnarNotebook(self.filename, create=True)
+            nb.set_storage(compressed=compressed)
+            self.run_lab(nb, [6, 7])
+            self.assertFalse(os.path.exists(self.filename + '.tmp'))
+
+            # Runs written to the columns without the index being updated, as by a commit cut short
+            nb = AggregationColumnarNotebook(self.filename, create=False)
+            rows = nb.results()
+            nb._append_rows(self.filename, rows[:5])
+
+            # are dropped on loading, and don't get in the way of later commits
+            nb = AggregationColumnarNotebook(self.filename, create=False)
+            self.assertEqual(nb.numberOfResults(), 18)
+            self.run_lab(nb, [8])
+            nb = AggregationColumnarNotebook(self.filename, create=False)
+            self.assertEqual(nb.numberOfResults(), 27)
+            self.assertItemsEqual(nb.column(epyc.Experiment.PARAMETERS, Model.PARAM_X4), [6] * 9 + [7] * 9 + [8] * 9)
+
+            os.remove(self.filename)
+            shutil.rmtree(self.filename + '.columns')
+
+    def test_results_view(self):
+        nb = AggregationColumnarNotebook(self.filename, create=True)
+        self.run_lab(nb, [6, 7], reps=2)
+        expected = nb.results()
+
+        nb_post = AggregationColumnarNotebook(self.filename, create=False)
+        results = nb_post.results()
+        self.assertEqual(len(results), len(expected))
+        key = lambda r: sorted(r[epyc.Experiment.PARAMETERS].items()) + sorted(r[epyc.Experiment.RESULTS].items())
+        for (r1, r2) in zip(sorted(results, key=key), sorted(expected, key=key)):
+            self.assertEqual(r1[epyc.Experiment.PARAMETERS], r2[epyc.Experiment.PARAMETERS])
+            self.assertEqual(r1[epyc.Experiment.RESULTS], r2[epyc.Experiment.RESULTS])
+            self.assertEqual(r1[epyc.Experiment.METADATA][epyc.Experiment.START_TIME],
+                             r2[epyc.Experiment.METADATA][epyc.Experiment.START_TIME])
+        self.assertEqual(len(nb_post.resultsFor({Model.PARAM_X1: 2, Model.PARAM_X2: 3, Model.PARAM_X3: 5.5,
+                                                 Model.PARAM_X4: 6})), 2)
+
+    def test_failed_runs(self):
+        nb = AggregationColumnarNotebook(self.filename, create=True)
+        self.run_lab(nb, [6, 7], model=FailingModel(), reps=2)
+
+        nb_post = AggregationColumnarNotebook(self.filename, create=False)
+        self.assertEqual(nb_post.numberOfResults(), 12)
+        # Failed runs are left out of the aggregation
+        df = nb_post.dataframe_aggregated()
+        self.assertItemsEqual(df[Model.PARAM_X2].unique(), [2, 4])
+        self.assertEqual(len(nb_post.dataframe(only_successful=True)), 8)
+        self.assertEqual(len(nb_post.dataframe(only_successful=False)), 12)
+
+    def test_storage(self):
+        numpy.random.seed(1)
+        nb = AggregationColumnarNotebook(self.filename, create=True)
+        nb.set_storage(constants=True, dictionaries=True, float32=True, compressed=True)
+        self.run_lab(nb, [6, 7])
+        numpy.random.seed(1)
+        nb_json = AggregationJSONNotebook(self.json_filename, create=True)
+        self.run_lab(nb_json, [6, 7])
+
+        nb = AggregationColumnarNotebook(self.filename, create=False)
+        definitions = {(d['section'], d['name']): d for d in nb._column_definitions}
+        x1 = definitions[(epyc.Experiment.PARAMETERS, Model.PARAM_X1)]
+        self.assertEqual(x1['encoding'], CONSTANT_ENCODING)
+        self.assertFalse(os.path.exists(os.path.join(self.filename + '.columns', '{0}.bin'.format(
+            nb._column_definitions.index(x1)))))
+        self.assertEqual(definitions[(epyc.Experiment.PARAMETERS, Model.PARAM_X2)]['dtype'], '<i1')
+        self.assertEqual(definitions[(epyc.Experiment.RESULTS, Model.RESULT_2)]['dtype'], '<f4')
+        self.assertEqual(len(definitions[(epyc.Experiment.RESULTS, Model.RESULT_2)]['blocks']), 1)
+
+        keys = Model.SA_PARAMS + Model.SA_RESULTS
+        expected = nb_json.dataframe_aggregated()[keys].sort_values(by=keys).reset_index(drop=True)
+        actual = nb.dataframe_aggregated()[keys].sort_values(by=keys).reset_index(drop=True)
+        self.assertTrue(numpy.allclose(numpy.asarray(actual, dtype=float), numpy.asarray(expected, dtype=float)))
+
+        # New values that don't fit the storage are stored as the column is rewritten
+        lab = epyc.Lab(nb)
+        lab[Model.PARAM_X1] = 3
+        lab[Model.PARAM_X2] = 1000
+        lab[Model.PARAM_X3] = 5.5
+        lab[Model.PARAM_X4] = 8
+        lab.runExperiment(Model())
+        nb = AggregationColumnarNotebook(self.filename, create=False)
+        definitions = {(d['section'], d['name']): d for d in nb._column_definitions}
+        self.assertNotIn('encoding', definitions[(epyc.Experiment.PARAMETERS, Model.PARAM_X1)])
+        self.assertEqual(definitions[(epyc.Experiment.PARAMETERS, Model.PARAM_X2)]['dtype'], '<i2')
+        self.assertEqual(definitions[(epyc.Experiment.PARAMETERS, Model.PARAM_X3)]['encoding'], CONSTANT_ENCODING)
+        self.assertEqual(len(definitions[(epyc.Experiment.RESULTS, Model.RESULT_2)]['blocks']), 2)
+        self.assertEqual(list(nb.column(epyc.Experiment.PARAMETERS, Model.PARAM_X1)), [2] * 18 + [3])
+        x2 = list(nb.column(epyc.Experiment.PARAMETERS, Model.PARAM_X2))
+        self.assertEqual(sorted(x2), [2] * 6 + [3] * 6 + [4] * 6 + [1000])
+        self.assertEqual(x2[-1], 1000)
+        self.assertEqual(nb.numberOfResults(), 19)
+
+    def test_compact(self):
+        nb = AggregationColumnarNotebook(self.filename, create=True)
+        self.run_lab(nb, [6, 7], reps=2)
+        expected = nb.dataframe(only_successful=False)
+        size = sum(os.path.getsize(os.path.join(self.filename + '.columns', f))
+                   for f in os.listdir(self.filename + '.columns'))
+
+        nb.set_storage(constants=True, dictionaries=True, float32=True, compressed=True)
+        nb.compact()
+        compacted = sum(os.path.getsize(os.path.join(self.filename + '.columns', f))
+                        for f in os.listdir(self.filename + '.columns'))
+        self.assertTrue(compacted < size / 2)
+
+        nb = AggregationColumnarNotebook(self.filename, create=False)
+        actual = nb.dataframe(only_successful=False)
+        for c in expected.columns:
+            if expected[c].dtype.kind == 'f':
+                self.assertTrue(numpy.allclose(actual[c], expected[c], rtol=1e-6))
+            else:
+                self.assertEqual(list(actual[c]), list(expected[c]))
+
+
+class EFASTColumnarNotebookTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.filename = 'columnarefasttest.json'
+
+    def tearDown(self):
+        if os.path.exists(self.filename):
+            os.remove(self.filename)
+        if os.path.exists(self.filename + '.columns'):
+            shutil.rmtree(self.filename + '.columns')
+
+    def run_lab(self, storage):
+        nb = EFASTColumnarNotebook(self.filename, create=True)
+        if storage:
+            nb.set_storage(constants=True, dictionaries=True, float32=True, compressed=True)
+        lab = EFASTLab(nb)
+        lab[Model.PARAM_X1] = [0, 1, UNIFORM_DISTRIBUTION]
+        lab[Model.PARAM_X2] = [0, 1, UNIFORM_DISTRIBUTION]
+        lab[Model.PARAM_X3] = [0, 1, UNIFORM_DISTRIBUTION]
+        lab[Model.PARAM_X4] = 1
+        lab.set_sample_number(65)
+        lab.set_resample_number(2)
+        lab.set_interference_factor(4)
+        lab.set_seed(7)
+        numpy.random.seed(7)
+        lab.runExperiment(Model())
+        size = sum(os.path.getsize(os.path.join(self.filename + '.columns', f))
+                   for f in os.listdir(self.filename + '.columns'))
+        return EFASTColumnarNotebook(self.filename, create=False), size
+
+    def test_storage(self):
+        nb, size = self.run_lab(False)
+        expected_s1, _ = nb.generate_sensitivity_indices()
+        nb, compact_size = self.run_lab(True)
+        s1, _ = nb.generate_sensitivity_indices()
+        self.assertTrue(compact_size < size / 3)
+        self.assertItemsEqual(s1.keys(), expected_s1.keys())
+        for k in s1:
+            self.assertTrue(numpy.allclose(s1[k], expected_s1[k], atol=1e-3))
+
+
+class LatinHypercubeColumnarNotebookTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.filename = 'columnarlhstest.json'
+
+    def tearDown(self):
+        if os.path.exists(self.filename):
+            os.remove(self.filename)
+        if os.path.exists(self.filename + '.columns'):
+            shutil.rmtree(self.filename + '.columns')
+
+    def test_calculate_all_prcc(self):
+        nb = LatinHypercubeColumnarNotebook(self.filename, create=True)
+        lab = LatinHypercubeLab(nb)
+        lab[Model.PARAM_X1] = [0, 10, UNIFORM_DISTRIBUTION]
+        lab[Model.PARAM_X2] = [0, 10, UNIFORM_DISTRIBUTION]
+        lab[Model.PARAM_X3] = [0, 10, UNIFORM_DISTRIBUTION]
+        lab[Model.PARAM_X4] = 1
+        lab.set_stratifications(50)
+        lab.runExperiment(Model())
+
+        nb_post = LatinHypercubeColumnarNotebook(self.filename, create=False)
+        prcc = nb_post.calculate_all_prcc()
+        self.assertAlmostEqual(prcc.loc[(Model.PARAM_X1, Model.RESULT_1), LatinHypercubeJSONNotebook.PRCC], 1.0)
+        self.assertAlmostEqual(prcc.loc[(Model.PARAM_X3, Model.RESULT_3), LatinHypercubeJSONNotebook.PRCC], 1.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,29 @@
+import unittest
+from epycsense import *
+
+
+class ConvergenceTestCase(unittest.TestCase):
+
+    def test_index_ranking(self):
+        indices = {('a', 'r1'): 0.1, ('b', 'r1'): -0.5, ('c', 'r1'): 0.3, ('a', 'r2'): 0.9, ('b', 'r2'): 0.2}
+        self.assertEqual(index_ranking(indices), {'r1': ['b', 'c', 'a'], 'r2': ['a', 'b']})
+        self.assertEqual(index_ranking(indices, 1), {'r1': ['b'], 'r2': ['a']})
+
+    def test_indices_converged(self):
+        previous = {('a', 'r1'): 0.1, ('b', 'r1'): 0.5, ('c', 'r1'): 0.45}
+        current = {('a', 'r1'): 0.12, ('b', 'r1'): 0.44, ('c', 'r1'): 0.47}
+        self.assertFalse(indices_converged(None, current, 0.1))
+        self.assertTrue(indices_converged(previous, current, 0.1))
+        self.assertFalse(indices_converged(previous, current, 0.01))
+        # Top parameter has changed
+        self.assertFalse(indices_converged(previous, current, 0.1, top=1))
+        # Top two are the same set but not the same order
+        self.assertFalse(indices_converged(previous, current, 0.1, top=2))
+        self.assertTrue(indices_converged(previous, previous, 0.0, top=3))
+        # Different indices
+        self.assertFalse(indices_converged(previous, {('a', 'r1'): 0.1}, 0.1))
+        self.assertFalse(indices_converged(previous, dict(previous, **{('a', 'r1'): float('nan')}), 0.1))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -101,11 +101,51 @@ class EFASTLabTestCase(unittest.TestCase):
         req_params = ['a','b','c']
         self.lab.set_required_parameters(req_params)
 
+        self.assertEqual(len(self.lab), 257*5*3)
         ps = self.lab.parameterSpace()
         self.assertEqual(len(ps), 257*5*3)
         for sample in ps:
             self.assertTrue(sample['parameter_of_interest'] in req_params)
 
+    def test_parameter_space_search_curves(self):
+        params = {'a': (0, 10, UNIFORM_DISTRIBUTION), 'b': (70, 80, UNIFORM_DISTRIBUTION)}
+        for k, v in params.iteritems():
+            self.lab[k] = v
+        self.lab['i'] = 99
+
+        samples = 257
+        resamples = 3
+        self.lab.set_sample_number(samples)
+        self.lab.set_interference_factor(4)
+        self.lab.set_resample_number(resamples)
+        self.lab.set_required_parameters(['a', 'dummy'])
+
+        ps = self.lab.parameterSpace()
+        self.assertEqual(len(ps), 2 * resamples * samples)
+
+        omega_max = numpy.floor((samples - 1.0) / (2.0 * 4))
+        for poi in ['a', 'dummy']:
+            for rs in range(resamples):
+                block = [row for row in ps if row['parameter_of_interest'] == poi and row['resample_number'] == rs]
+                self.assertEqual([row['run_number'] for row in block], range(samples))
+                for row in block:
+                    self.assertEqual(row['i'], 99)
+                # The parameter of interest follows the search curve with the maximum frequency
+                values = numpy.array([row[poi] for row in block])
+                spectrum = numpy.absolute(numpy.fft.rfft(values - numpy.mean(values)))
+                self.assertEqual(numpy.argmax(spectrum), omega_max)
+
+    def test_seed(self):
+        params = {'a': (0, 10, UNIFORM_DISTRIBUTION), 'b': (70, 80, UNIFORM_DISTRIBUTION), 'i': (99,)}
+        space = efast_parameter_space(65, 4, dict(params), 3, [], seed=11)
+        self.assertEqual(list(space), list(efast_parameter_space(65, 4, dict(params), 3, [], seed=11)))
+        self.assertNotEqual(list(space), list(efast_parameter_space(65, 4, dict(params), 3, [], seed=12)))
+
+        # A resample generated on its own (e.g. in a later batch) matches the same resample of a larger design
+        later = efast_parameter_space(65, 4, dict(params), 1, [], first_resample=2, seed=11)
+        self.assertEqual(list(later), [row for row in space if row['resample_number'] == 2])
+
+
 # TODO - testing cluster would require an ipcluster to be running
 
 if __name__ == '__main__':
@@ -59,6 +59,161 @@ class LotkaVolterraModel(epyc.Experiment):
         return output
 
 
+class LinearModel(epyc.Experiment):
+    PARAM_A = 'a'
+    PARAM_B = 'b'
+    PARAM_C = 'c'
+
+    RESULT_A = 'res_a'
+    RESULT_AB = 'res_ab'
+    SA_RESULTS = [RESULT_A, RESULT_AB]
+
+    def do(self, params):
+        return {LinearModel.RESULT_A: params[self.PARAM_A],
+                LinearModel.RESULT_AB: 4 * params[self.PARAM_A] + params[self.PARAM_B] + 0.01 * params[self.PARAM_C]}
+
+
+class TrajectoryModel(epyc.Experiment):
+    PARAM_A = 'a'
+    PARAM_B = 'b'
+
+    RESULT_TRAJECTORY = 'trajectory'
+    RESULT_START = 'start'
+    TIME_POINTS = 11
+
+    def do(self, params):
+        # Moves from depending on a at the start to b at the end
+        t = numpy.linspace(0, 1, TrajectoryModel.TIME_POINTS)
+        return {TrajectoryModel.RESULT_TRAJECTORY: ((1 - t) * params[self.PARAM_A] + t * params[self.PARAM_B]).tolist(),
+                TrajectoryModel.RESULT_START: params[self.PARAM_A]}
+
+
+class EFASTIndicesTestCase(unittest.TestCase):
+
+    def test_efast_indices(self):
+        # Reference: one FFT per search curve per output
+        outputs = numpy.random.random((3, 2, 129, 4))
+        interference_factor = 4
+        s1, st = efast_indices(outputs, interference_factor)
+        self.assertEqual(s1.shape, (3, 2, 4))
+
+        omega = numpy.floor((129 - 1.0) / (2.0 * interference_factor))
+        for index in numpy.ndindex(3, 2):
+            for r in range(4):
+                f = numpy.fft.fft(outputs[index][:, r])
+                Sp = numpy.power(numpy.absolute(f[numpy.arange(1, int((129 + 1) / 2))]) / 129, 2)
+                V = 2 * numpy.sum(Sp)
+                q = numpy.arange(1, interference_factor + 1) * int(omega) - 1
+                self.assertAlmostEqual(s1[index][r], 2 * numpy.sum(Sp[q]) / V)
+                q2 = numpy.arange(int(omega / 2))
+                self.assertAlmostEqual(st[index][r], 1 - 2 * numpy.sum(Sp[q2]) / V)
+
+    def test_parallel_efast_indices(self):
+        outputs = numpy.random.random((3, 2, 129, 7))
+        s1, st = efast_indices(outputs, 4)
+        for processes in [1, 2, 4]:
+            parallel_s1, parallel_st = parallel_efast_indices(outputs, 4, processes)
+            self.assertTrue(numpy.array_equal(s1, parallel_s1))
+            self.assertTrue(numpy.array_equal(st, parallel_st))
+
+        # No outputs gives empty indices
+        s1, st = parallel_efast_indices(numpy.random.random((3, 2, 129, 0)), 4, 2)
+        self.assertEqual(s1.shape, (3, 2, 0))
+        self.assertEqual(st.shape, (3, 2, 0))
+
+
+class EFASTJSONNotebookLinearTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.filename = 'efastlinear.json'
+
+    def tearDown(self):
+        if os.path.exists(self.filename):
+            os.remove(self.filename)
+
+    def test_generate_sensitivity_indices(self):
+        nb = EFASTJSONNotebook(self.filename, True)
+        lab = EFASTLab(nb)
+        lab[LinearModel.PARAM_A] = [0, 1, UNIFORM_DISTRIBUTION]
+        lab[LinearModel.PARAM_B] = [0, 1, UNIFORM_DISTRIBUTION]
+        lab[LinearModel.PARAM_C] = [0, 1, UNIFORM_DISTRIBUTION]
+        lab.set_sample_number(65)
+        lab.set_resample_number(2)
+        lab.set_interference_factor(4)
+        lab.runExperiment(LinearModel())
+
+        res_s1, res_st = nb.generate_sensitivity_indices()
+        params = ['a', 'b', 'c', 'dummy']
+        self.assertItemsEqual(res_s1.keys(), [(r, p) for r in LinearModel.SA_RESULTS for p in params])
+        for key in res_s1:
+            self.assertEqual(len(res_s1[key]), 2)
+            self.assertEqual(len(res_st[key]), 2)
+            for (s1, st) in zip(res_s1[key], res_st[key]):
+                self.assertTrue(0 <= s1 <= st <= 1)
+
+        self.assertTrue(min(res_s1[(LinearModel.RESULT_A, 'a')]) > 0.9)
+        self.assertTrue(max(res_s1[(LinearModel.RESULT_A, 'b')]) < 0.1)
+        self.assertTrue(min(res_s1[(LinearModel.RESULT_AB, 'a')]) > max(res_s1[(LinearModel.RESULT_AB, 'b')]))
+        self.assertTrue(max(res_s1[(LinearModel.RESULT_AB, 'dummy')]) < 0.1)
+
+        parallel_s1, parallel_st = nb.generate_sensitivity_indices(processes=2)
+        self.assertEqual(parallel_s1, res_s1)
+        self.assertEqual(parallel_st, res_st)
+
+    def test_run_until_converged(self):
+        numpy.random.seed(4)
+        nb = EFASTJSONNotebook(self.filename, True)
+        lab = EFASTLab(nb)
+        lab[LinearModel.PARAM_A] = [0, 1, UNIFORM_DISTRIBUTION]
+        lab[LinearModel.PARAM_B] = [0, 1, UNIFORM_DISTRIBUTION]
+        lab[LinearModel.PARAM_C] = [0, 1, UNIFORM_DISTRIBUTION]
+        lab.set_sample_number(65)
+        lab.set_resample_number(1)
+        lab.set_interference_factor(4)
+        self.assertTrue(lab.run_until_converged(LinearModel(), tolerance=0.05, top=2, max_resamples=10))
+
+        # Resamples are numbered on from earlier batches
+        res_s1, _ = nb.generate_sensitivity_indices()
+        resamples = len(res_s1[(LinearModel.RESULT_A, 'a')])
+        self.assertTrue(2 <= resamples <= 10)
+        self.assertEqual(nb.numberOfResults(), 4 * 65 * resamples)
+
+        # Stops at the maximum if the tolerance can't be met
+        self.assertFalse(lab.run_until_converged(LinearModel(), tolerance=0.0, max_resamples=resamples + 2))
+        res_s1, _ = nb.generate_sensitivity_indices()
+        self.assertEqual(len(res_s1[(LinearModel.RESULT_A, 'a')]), resamples + 2)
+
+    def test_generate_sensitivity_indices_over_time(self):
+        nb = EFASTJSONNotebook(self.filename, True)
+        lab = EFASTLab(nb)
+        lab[TrajectoryModel.PARAM_A] = [0, 1, UNIFORM_DISTRIBUTION]
+        lab[TrajectoryModel.PARAM_B] = [0, 1, UNIFORM_DISTRIBUTION]
+        lab.set_sample_number(65)
+        lab.set_resample_number(2)
+        lab.set_interference_factor(4)
+        lab.runExperiment(TrajectoryModel())
+
+        s1, st = nb.generate_sensitivity_indices_over_time(TrajectoryModel.RESULT_TRAJECTORY)
+        self.assertEqual(s1.shape, (TrajectoryModel.TIME_POINTS, 3))
+        self.assertItemsEqual(s1.columns, ['a', 'b', 'dummy'])
+        self.assertTrue(s1['a'][0] > 0.9)
+        self.assertTrue(s1['b'][TrajectoryModel.TIME_POINTS - 1] > 0.9)
+        self.assertTrue((s1 <= st + 1e-10).all().all())
+
+        parallel_s1, parallel_st = nb.generate_sensitivity_indices_over_time(TrajectoryModel.RESULT_TRAJECTORY,
+                                                                             processes=2)
+        self.assertTrue(numpy.allclose(parallel_s1, s1))
+        self.assertTrue(numpy.allclose(parallel_st, st))
+
+        # The whole-notebook analysis covers only the scalar result
+        self.assertEqual(nb.scalar_result_keys(), [TrajectoryModel.RESULT_START])
+        S1, _ = nb.generate_sensitivity_indices()
+        self.assertItemsEqual(set(rk for (rk, _) in S1.keys()), [TrajectoryModel.RESULT_START])
+        # The over-time indices are averaged over the resamples
+        self.assertAlmostEqual(numpy.mean(S1[(TrajectoryModel.RESULT_START, TrajectoryModel.PARAM_A)]),
+                               s1[TrajectoryModel.PARAM_A][0])
+
+
 class EFASTJSONNotebookTestCase(unittest.TestCase):
 
     def setUp(self):
@@ -3,6 +3,7 @@ from epycsense import *
 import numpy
 import os
 import json
+import scipy.stats as stats
 
 
 class Model(epyc.Experiment):
@@ -40,8 +41,9 @@ class LHSLabTestCase(unittest.TestCase):
 
     def tearDown(self):
         # # Get rid of json file
-        if os.path.exists(self.filename):
-            os.remove(self.filename)
+        for fn in [self.filename, self.filename + '.journal']:
+            if os.path.exists(fn):
+                os.remove(fn)
 
     def test_initialise(self):
         pass
@@ -104,6 +106,127 @@ class LHSLabTestCase(unittest.TestCase):
             self.assertItemsEqual(v, values[k])
         self.assertItemsEqual(values[Model.PARAM_FIX], [4,]*stratifications)
 
+    def test_lazy_parameter_space(self):
+        params = {'a': [0, 10, UNIFORM_DISTRIBUTION], 'b': [10, 2, NORMAL_DISTRIBUTION]}
+        for k, v in params.iteritems():
+            self.lab[k] = v
+        self.lab['d'] = 99
+        stratifications = 40
+        self.lab.set_stratifications(stratifications)
+        self.assertEqual(len(self.lab), stratifications)
+
+        ps = self.lab.parameterSpace()
+        self.assertEqual(len(ps), stratifications)
+        rows = list(ps)
+        self.assertEqual(len(rows), stratifications)
+        # Latin property: every stratum of every uncertain parameter used exactly once
+        self.assertTrue(numpy.allclose(sorted(r['a'] for r in rows),
+                                       10 * numpy.linspace(0, 1, stratifications + 2)[1:-1]))
+        self.assertEqual(len(set(r['b'] for r in rows)), stratifications)
+        self.assertEqual(len(set(r['dummy'] for r in rows)), stratifications)
+        for r in rows:
+            self.assertEqual(r['d'], 99)
+
+
+    def test_double_stratifications(self):
+        self.lab['a'] = [0, 10, UNIFORM_DISTRIBUTION]
+        self.lab['b'] = [10, 2, NORMAL_DISTRIBUTION]
+        self.lab['d'] = 99
+        self.lab.set_stratifications(20)
+        existing = list(self.lab.parameterSpace())
+
+        self.lab.double_stratifications()
+        self.assertEqual(len(self.lab), 21)
+        new = list(self.lab.parameterSpace())
+        self.assertEqual(len(new), 21)
+
+        # The combined design is a Latin hypercube of 41 stratifications
+        combined = existing + new
+        self.assertTrue(numpy.allclose(sorted(r['a'] for r in combined), 10 * numpy.linspace(0, 1, 43)[1:-1]))
+        self.assertEqual(len(set(r['b'] for r in combined)), 41)
+        self.assertEqual(len(set(r['dummy'] for r in combined)), 41)
+        for r in new:
+            self.assertEqual(r['d'], 99)
+
+        # And can be doubled again
+        self.lab.double_stratifications()
+        self.assertEqual(len(self.lab), 42)
+
+
+    def test_lhs_sample_matrix(self):
+        params = {'a': [0, 10, UNIFORM_DISTRIBUTION], 'b': [10, 2, NORMAL_DISTRIBUTION],
+                  'c': [0.5, 1, LOGNORMAL_DISTRIBUTION], 'd': [99]}
+        matrix, names = lhs_sample_matrix(params, 30)
+        self.assertEqual(matrix.shape, (30, 4))
+        self.assertItemsEqual(names, ['a', 'b', 'c', 'dummy'])
+
+        d = numpy.linspace(0, 1, 32)[1:-1]
+        expected = {'a': 10 * d, 'b': stats.norm.ppf(d, 10, 2), 'c': stats.lognorm.ppf(d, 0.5, 1), 'dummy': 10 * d}
+        for (q, name) in enumerate(names):
+            self.assertTrue(numpy.allclose(numpy.sort(matrix[:, q]), expected[name]))
+        # Columns are permuted independently
+        self.assertFalse(all((numpy.argsort(matrix[:, q]) == numpy.argsort(matrix[:, 0])).all()
+                             for q in range(1, 4)))
+
+
+    def test_seed(self):
+        params = {'a': [0, 10, UNIFORM_DISTRIBUTION], 'b': [10, 2, NORMAL_DISTRIBUTION], 'd': [99]}
+        matrix, names = lhs_sample_matrix(params, 50, seed=3)
+        self.assertTrue((lhs_sample_matrix(params, 50, seed=3)[0] == matrix).all())
+        self.assertFalse((lhs_sample_matrix(params, 50, seed=4)[0] == matrix).all())
+        self.assertTrue((lhs_sample_matrix(params, 50, seed=numpy.random.RandomState(3))[0] ==
+                         lhs_sample_matrix(params, 50, seed=numpy.random.RandomState(3))[0]).all())
+
+        for k, v in params.iteritems():
+            self.lab[k] = v
+        self.lab.set_stratifications(50)
+        self.lab.set_seed(3)
+        self.assertEqual(list(self.lab.parameterSpace()), list(self.lab.parameterSpace()))
+        self.assertEqual(list(self.lab.parameterSpace()), lhs_samples(params, 50, 3))
+        self.lab.double_stratifications()
+        refinement = list(self.lab.parameterSpace())
+        self.assertEqual(refinement, list(lhs_refinement_parameter_space(params, 50, 3)))
+
+    def test_resume(self):
+        params = {'a': [0, 10, UNIFORM_DISTRIBUTION], 'b': [10, 20, UNIFORM_DISTRIBUTION], 'd': [99]}
+        nb = LatinHypercubeJSONNotebook(self.filename, create=True)
+        lab = LatinHypercubeLab(nb)
+        for k, v in params.iteritems():
+            lab[k] = v
+        lab.set_stratifications(20)
+        lab.set_seed(5)
+        with self.assertRaises(KeyboardInterrupt):
+            lab.runExperiment(InterruptedModel(12))
+
+        # Reopened from the journal, only the remaining points are run
+        nb = LatinHypercubeJSONNotebook(self.filename, create=False)
+        self.assertEqual(nb.numberOfResults(), 12)
+        lab = LatinHypercubeLab(nb)
+        for k, v in params.iteritems():
+            lab[k] = v
+        lab.set_stratifications(20)
+        lab.set_seed(5)
+        lab.set_resume(True)
+        self.assertEqual(len(lab.parameterSpace()), 8)
+        lab.runExperiment(InterruptedModel(8))
+        self.assertEqual(nb.numberOfResults(), 20)
+        self.assertEqual(len(lab.parameterSpace()), 0)
+        nb.stratifications()
+
+
+class InterruptedModel(epyc.Experiment):
+    """Model whose run is interrupted after a number of points."""
+
+    def __init__(self, points):
+        epyc.Experiment.__init__(self)
+        self._points = points
+
+    def do(self, params):
+        if self._points == 0:
+            raise KeyboardInterrupt()
+        self._points -= 1
+        return {'y': params['a'] + params['b']}
+
 
 # TODO - testing cluster would require an ipcluster to be running
 
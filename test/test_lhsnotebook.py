@@ -1,4 +1,5 @@
 import unittest
+import multiprocessing
 from epycsense import *
 import numpy
 import os
@@ -60,6 +61,38 @@ class LotkaVolterraModel(epyc.Experiment):
         return output
 
 
+class LinearModel(epyc.Experiment):
+    PARAM_X1 = 'x1'
+    PARAM_X2 = 'x2'
+    PARAM_X3 = 'x3'
+    PARAM_FIX = 'fix'
+
+    RESULT_X1 = 'res_x1'
+    RESULT_X2_X3 = 'res_x2_x3'
+    RESULT_RANDOM = 'res_random'
+    SA_RESULTS = [RESULT_X1, RESULT_X2_X3, RESULT_RANDOM]
+
+    def do(self, params):
+        return {LinearModel.RESULT_X1: params[self.PARAM_X1] * params[self.PARAM_FIX] + 5 * numpy.random.random(),
+                LinearModel.RESULT_X2_X3: params[self.PARAM_X2] - params[self.PARAM_X3] ** 2,
+                LinearModel.RESULT_RANDOM: numpy.random.random()}
+
+
+class TrajectoryModel(epyc.Experiment):
+    PARAM_X1 = 'x1'
+    PARAM_X2 = 'x2'
+
+    RESULT_TRAJECTORY = 'trajectory'
+    RESULT_START = 'start'
+    TIME_POINTS = 11
+
+    def do(self, params):
+        # Moves from depending on x1 at the start to x2 at the end
+        t = numpy.linspace(0, 1, TrajectoryModel.TIME_POINTS)
+        y = (1 - t) * params[self.PARAM_X1] + t * params[self.PARAM_X2] + 0.01 * numpy.random.random(len(t))
+        return {TrajectoryModel.RESULT_TRAJECTORY: y.tolist(), TrajectoryModel.RESULT_START: y[0]}
+
+
 class LatinHypercubeJSONNotebookTestCase(unittest.TestCase):
     def setUp(self):
         self.filename = 'prcc.json'
@@ -168,5 +201,163 @@ class LatinHypercubeJSONNotebookTestCase(unittest.TestCase):
         for k,v in nb_post.get_all_prcc().iteritems():
             print k, v
 
+
+class LatinHypercubeJSONNotebookBatchPRCCTestCase(unittest.TestCase):
+    def setUp(self):
+        self.filename = 'prcc_batch.json'
+        self.nb = LatinHypercubeJSONNotebook(self.filename, True)
+        lab = LatinHypercubeLab(self.nb)
+        lab[LinearModel.PARAM_X1] = [0, 10, UNIFORM_DISTRIBUTION]
+        lab[LinearModel.PARAM_X2] = [5, 1, NORMAL_DISTRIBUTION]
+        lab[LinearModel.PARAM_X3] = [0, 2, UNIFORM_DISTRIBUTION]
+        lab[LinearModel.PARAM_FIX] = 3
+        lab.set_stratifications(50)
+        lab.runExperiment(RepeatedExperiment(LinearModel(), 2))
+
+    def tearDown(self):
+        if os.path.exists(self.filename):
+            os.remove(self.filename)
+
+    def test_calculate_all_prcc_matches_calculate_prcc(self):
+        table = self.nb.calculate_all_prcc()
+
+        self.assertItemsEqual(table.index.tolist(), [(p, r) for p in self.nb.uncertain_parameters()
+                                                     for r in LinearModel.SA_RESULTS])
+        for (p, r), row in table.iterrows():
+            corr, p_value = self.nb.calculate_prcc(p, r)
+            self.assertAlmostEqual(row[LatinHypercubeJSONNotebook.PRCC], corr[0], places=10)
+            self.assertAlmostEqual(row[LatinHypercubeJSONNotebook.P_VALUE], p_value[0], places=10)
+
+    def test_get_all_prcc(self):
+        prccs = self.nb.get_all_prcc()
+        self.assertItemsEqual(prccs.keys(), [(p, r) for p in self.nb.uncertain_parameters()
+                                             for r in LinearModel.SA_RESULTS])
+        self.assertTrue(prccs[(LinearModel.PARAM_X1, LinearModel.RESULT_X1)][0] > 0.9)
+        self.assertTrue(prccs[(LinearModel.PARAM_X3, LinearModel.RESULT_X2_X3)][0] < -0.9)
+
+    def test_calculate_prcc_confidence_intervals(self):
+        table = self.nb.calculate_prcc_confidence_intervals(resamples=200, seed=2)
+        self.assertTrue(numpy.allclose(table[LatinHypercubeJSONNotebook.PRCC],
+                                       self.nb.calculate_all_prcc()[LatinHypercubeJSONNotebook.PRCC]))
+        self.assertTrue((table[LatinHypercubeJSONNotebook.PRCC_LOWER] <=
+                         table[LatinHypercubeJSONNotebook.PRCC_UPPER]).all())
+        row = table.loc[(LinearModel.PARAM_X1, LinearModel.RESULT_X1)]
+        self.assertTrue(0.8 < row[LatinHypercubeJSONNotebook.PRCC_LOWER] <= row[LatinHypercubeJSONNotebook.PRCC])
+
+        # The same resamples give the same intervals on a pool of processes
+        pool = multiprocessing.Pool(2)
+        try:
+            pooled = self.nb.calculate_prcc_confidence_intervals(resamples=200, pool=pool, seed=2)
+        finally:
+            pool.close()
+            pool.join()
+        self.assertTrue(numpy.allclose(pooled, table))
+
+
+
+class LatinHypercubeJSONNotebookDoublingTestCase(unittest.TestCase):
+    def setUp(self):
+        self.filename = 'prcc_doubling.json'
+
+    def tearDown(self):
+        if os.path.exists(self.filename):
+            os.remove(self.filename)
+
+    def test_double_stratifications(self):
+        nb = LatinHypercubeJSONNotebook(self.filename, True)
+        lab = LatinHypercubeLab(nb)
+        lab[LinearModel.PARAM_X1] = [0, 10, UNIFORM_DISTRIBUTION]
+        lab[LinearModel.PARAM_X2] = [5, 1, NORMAL_DISTRIBUTION]
+        lab[LinearModel.PARAM_X3] = [0, 2, UNIFORM_DISTRIBUTION]
+        lab[LinearModel.PARAM_FIX] = 3
+        lab.set_stratifications(30)
+        lab.runExperiment(LinearModel())
+        self.assertEqual(nb.stratifications(), 30)
+
+        # Extend the design from the notebook in a new lab, running only the new points
+        nb_post = LatinHypercubeJSONNotebook(self.filename, False)
+        lab_post = LatinHypercubeLab(nb_post)
+        lab_post[LinearModel.PARAM_X1] = [0, 10, UNIFORM_DISTRIBUTION]
+        lab_post[LinearModel.PARAM_X2] = [5, 1, NORMAL_DISTRIBUTION]
+        lab_post[LinearModel.PARAM_X3] = [0, 2, UNIFORM_DISTRIBUTION]
+        lab_post[LinearModel.PARAM_FIX] = 3
+        lab_post.double_stratifications()
+        lab_post.runExperiment(LinearModel())
+
+        self.assertEqual(nb_post.numberOfResults(), 61)
+        self.assertEqual(nb_post.stratifications(), 61)
+
+        # Running again doesn't resubmit the new points
+        self.assertEqual(len(lab_post), 0)
+        lab_post.runExperiment(LinearModel())
+        self.assertEqual(nb_post.numberOfResults(), 61)
+        prccs = nb_post.get_all_prcc()
+        self.assertTrue(prccs[(LinearModel.PARAM_X1, LinearModel.RESULT_X1)][0] > 0.9)
+
+
+    def test_run_until_converged(self):
+        numpy.random.seed(5)
+        nb = LatinHypercubeJSONNotebook(self.filename, True)
+        lab = LatinHypercubeLab(nb)
+        lab[LinearModel.PARAM_X1] = [0, 10, UNIFORM_DISTRIBUTION]
+        lab[LinearModel.PARAM_X2] = [5, 1, NORMAL_DISTRIBUTION]
+        lab[LinearModel.PARAM_X3] = [0, 2, UNIFORM_DISTRIBUTION]
+        lab[LinearModel.PARAM_FIX] = 3
+        lab.set_stratifications(20)
+        self.assertTrue(lab.run_until_converged(LinearModel(), tolerance=0.2, top=1, max_stratifications=1000))
+        self.assertIn(nb.stratifications(), [41, 83, 167, 335, 671])
+        self.assertEqual(nb.numberOfResults(), nb.stratifications())
+
+        # Stops before exceeding the maximum design size
+        size = nb.stratifications()
+        self.assertFalse(lab.run_until_converged(LinearModel(), tolerance=0.0, max_stratifications=2 * size + 1))
+        self.assertEqual(nb.stratifications(), 2 * size + 1)
+
+
+class LatinHypercubeJSONNotebookTimeSeriesTestCase(unittest.TestCase):
+    def setUp(self):
+        self.filename = 'prcc_time.json'
+
+    def tearDown(self):
+        if os.path.exists(self.filename):
+            os.remove(self.filename)
+
+    def test_calculate_prcc_over_time(self):
+        nb = LatinHypercubeJSONNotebook(self.filename, True)
+        lab = LatinHypercubeLab(nb)
+        lab[TrajectoryModel.PARAM_X1] = [0, 1, UNIFORM_DISTRIBUTION]
+        lab[TrajectoryModel.PARAM_X2] = [0, 1, UNIFORM_DISTRIBUTION]
+        lab.set_stratifications(50)
+        lab.runExperiment(RepeatedExperiment(TrajectoryModel(), 2))
+
+        nb_post = LatinHypercubeJSONNotebook(self.filename, False)
+        self.assertEqual(nb_post.result_matrix(TrajectoryModel.RESULT_TRAJECTORY).shape,
+                         (50, TrajectoryModel.TIME_POINTS))
+        prcc, p_values = nb_post.calculate_prcc_over_time(TrajectoryModel.RESULT_TRAJECTORY)
+        self.assertEqual(prcc.shape, (TrajectoryModel.TIME_POINTS, 3))
+        self.assertItemsEqual(prcc.columns, [TrajectoryModel.PARAM_X1, TrajectoryModel.PARAM_X2, 'dummy'])
+        self.assertTrue(prcc[TrajectoryModel.PARAM_X1][0] > 0.9)
+        self.assertTrue(prcc[TrajectoryModel.PARAM_X2][TrajectoryModel.TIME_POINTS - 1] > 0.9)
+        self.assertTrue(p_values[TrajectoryModel.PARAM_X1][0] < 0.01)
+
+        # Each time point is as if it were a separate result
+        mid = TrajectoryModel.TIME_POINTS / 2
+        df = nb_post.dataframe_aggregated().copy()
+        df['mid'] = nb_post.result_matrix(TrajectoryModel.RESULT_TRAJECTORY, df)[:, mid]
+        params = nb_post.uncertain_parameters()
+        expected, _ = prcc_matrix(numpy.asarray(df[params].rank(), dtype=float),
+                                  numpy.asarray(df[['mid']].rank(), dtype=float))
+        self.assertTrue(numpy.allclose(prcc.loc[mid, params], expected[:, 0]))
+
+        # The whole-notebook analyses cover only the scalar result, which is the first time point
+        self.assertEqual(nb_post.scalar_result_keys(), [TrajectoryModel.RESULT_START])
+        table = nb_post.calculate_all_prcc()
+        self.assertItemsEqual(table.index.get_level_values('result').unique(), [TrajectoryModel.RESULT_START])
+        self.assertTrue(table.loc[(TrajectoryModel.PARAM_X1, TrajectoryModel.RESULT_START),
+                                  LatinHypercubeJSONNotebook.PRCC] > 0.9)
+        intervals = nb_post.calculate_prcc_confidence_intervals(resamples=20, seed=1)
+        self.assertEqual(len(intervals), len(params))
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,112 @@
+import unittest
+from epycsense import *
+import numpy
+import os
+
+
+class Model(epyc.Experiment):
+    PARAM_X1 = 'x1'
+    PARAM_X2 = 'x2'
+    PARAM_X3 = 'x3'
+    PARAM_FIX = 'fix'
+    SA_PARAMS = [PARAM_X1, PARAM_X2, PARAM_X3, PARAM_FIX]
+
+    RESULT_SUM = 'sum'
+    SA_RESULTS = [RESULT_SUM]
+
+    def do(self, params):
+        return {Model.RESULT_SUM: params[self.PARAM_X1] + params[self.PARAM_X2] + params[self.PARAM_X3]}
+
+
+class MorrisLabTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.filename = 'morrislabtest.json'
+        self.nb = MorrisJSONNotebook(self.filename, True)
+        self.lab = MorrisLab(self.nb)
+        self.lab[Model.PARAM_X1] = [0, 10, UNIFORM_DISTRIBUTION]
+        self.lab[Model.PARAM_X2] = [5, 1, NORMAL_DISTRIBUTION]
+        self.lab[Model.PARAM_X3] = [0.5, 1, LOGNORMAL_DISTRIBUTION]
+        self.lab[Model.PARAM_FIX] = 3
+
+    def tearDown(self):
+        for fn in [self.filename, self.filename + '.journal']:
+            if os.path.exists(fn):
+                os.remove(fn)
+
+    def test_parameter_space(self):
+        self.lab.set_trajectories(10)
+        self.lab.set_seed(4)
+        space = self.lab.parameterSpace()
+        self.assertEqual(len(space), 10 * 4)
+        self.assertEqual(len(self.lab), len(space))
+        self.assertEqual(space.constants(), {Model.PARAM_FIX: 3})
+
+        uncertain = [Model.PARAM_X1, Model.PARAM_X2, Model.PARAM_X3]
+        x = space.matrix(uncertain)
+        trajectories = space.column(MorrisJSONNotebook.TRAJECTORY)
+        steps = space.column(MorrisJSONNotebook.STEP)
+        varied = space.column(MorrisJSONNotebook.VARIED_PARAMETER)
+        delta = space.column(MorrisJSONNotebook.DELTA)
+        self.assertEqual(trajectories.tolist(), numpy.repeat(numpy.arange(10), 4).tolist())
+        self.assertEqual(steps.tolist(), numpy.tile(numpy.arange(4), 10).tolist())
+        # The levels of x1 are the quantiles (i + 0.5) / 4 of its range
+        self.assertItemsEqual(numpy.unique(x[:, 0]), [1.25, 3.75, 6.25, 8.75])
+
+        for t in range(10):
+            rows = numpy.flatnonzero(trajectories == t)
+            self.assertEqual(varied[rows[0]], MorrisJSONNotebook.NO_PARAMETER)
+            self.assertEqual(delta[rows[0]], 0)
+            self.assertItemsEqual(varied[rows[1:]], uncertain)
+            for r in rows[1:]:
+                i = uncertain.index(varied[r])
+                # Only the varied parameter moves, by half the levels
+                self.assertEqual(numpy.flatnonzero(x[r] != x[r - 1]).tolist(), [i])
+                self.assertEqual(abs(delta[r]), 0.5)
+                if i == 0:
+                    self.assertAlmostEqual(x[r, 0] - x[r - 1, 0], 10 * delta[r])
+
+    def test_trajectory_distances(self):
+        numpy.random.seed(4)
+        points = numpy.random.random((30, 4, 3))
+        expected = numpy.array([[numpy.sqrt(((a[:, numpy.newaxis] - b[numpy.newaxis]) ** 2).sum(axis=2)).sum()
+                                 for b in points] for a in points])
+        self.assertTrue(numpy.allclose(trajectory_distances(points), expected))
+
+        # Found a block of trajectories at a time, however small the blocks
+        import epycsense.screening.morrislab as morrislab
+        size = morrislab.DISTANCE_BLOCK_SIZE
+        try:
+            # One trajectory, then seven, at a time
+            for block_size in [1, 30 * 4 * 4 * 7]:
+                morrislab.DISTANCE_BLOCK_SIZE = block_size
+                self.assertTrue(numpy.allclose(trajectory_distances(points), expected))
+        finally:
+            morrislab.DISTANCE_BLOCK_SIZE = size
+
+    def test_select_trajectories(self):
+        # The most spread out trajectories are chosen from the candidates
+        points = numpy.zeros((5, 2, 1))
+        points[:, :, 0] = [[0, 1], [0, 1], [10, 11], [5, 6], [0, 1]]
+        self.assertItemsEqual(select_trajectories(points, 2), [0, 2])
+
+        self.lab.set_trajectories(5)
+        self.lab.set_candidates(50)
+        self.lab.set_seed(1)
+        space = self.lab.parameterSpace()
+        self.assertEqual(len(space), 5 * 4)
+        chosen = space.matrix([Model.PARAM_X1, Model.PARAM_X2, Model.PARAM_X3]).reshape((5, 4, 3))
+
+        # More spread out than the same number of trajectories without selection
+        self.lab.set_candidates(None)
+        plain = self.lab.parameterSpace().matrix([Model.PARAM_X1, Model.PARAM_X2, Model.PARAM_X3]).reshape((5, 4, 3))
+        self.assertGreater((trajectory_distances(chosen) ** 2).sum(), (trajectory_distances(plain) ** 2).sum())
+
+    def test_run(self):
+        self.lab.set_trajectories(5)
+        self.lab.runExperiment(Model())
+        self.assertEqual(len(self.nb.dataframe_aggregated()), 5 * 4)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,143 @@
+import unittest
+from epycsense import *
+import numpy
+import os
+
+
+class LinearModel(epyc.Experiment):
+    PARAM_X1 = 'x1'
+    PARAM_X2 = 'x2'
+    PARAM_X3 = 'x3'
+    PARAM_X4 = 'x4'
+    SA_PARAMS = [PARAM_X1, PARAM_X2, PARAM_X3, PARAM_X4]
+
+    RESULT_Y = 'y'
+    RESULT_X4 = 'y_x4'
+    SA_RESULTS = [RESULT_Y, RESULT_X4]
+
+    def do(self, params):
+        x1 = params[self.PARAM_X1]
+        x2 = params[self.PARAM_X2]
+        x3 = params[self.PARAM_X3]
+        x4 = params[self.PARAM_X4]
+        return {LinearModel.RESULT_Y: 10 * x1 + x2 + x1 * x3,
+                LinearModel.RESULT_X4: x4}
+
+
+class TrajectoryModel(LinearModel):
+    # An array-valued result alongside the scalar ones
+    RESULT_TRAJECTORY = 'path'
+
+    def do(self, params):
+        results = LinearModel.do(self, params)
+        results[TrajectoryModel.RESULT_TRAJECTORY] = [params[p] for p in self.SA_PARAMS]
+        return results
+
+
+class MorrisJSONNotebookTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.filename = 'morrisnotebooktest.json'
+        self.nb = MorrisJSONNotebook(self.filename, True)
+        self.lab = MorrisLab(self.nb)
+        for p in LinearModel.SA_PARAMS:
+            self.lab[p] = [0, 1, UNIFORM_DISTRIBUTION]
+        self.lab.set_trajectories(20)
+        self.lab.set_seed(2)
+
+    def tearDown(self):
+        for fn in [self.filename, self.filename + '.journal']:
+            if os.path.exists(fn):
+                os.remove(fn)
+
+    def test_elementary_effects(self):
+        # Effects of a trajectory stepping x1 then x2 by the same move
+        outputs = numpy.array([[[0.0], [5.0], [6.0]]])
+        delta = numpy.array([[0.0, 0.5, -0.5]])
+        varied = numpy.array([[-1, 1, 0]])
+        effects = elementary_effects(outputs, delta, varied, 2)
+        self.assertEqual(effects.tolist(), [[[-2.0], [10.0]]])
+
+    def test_array_result(self):
+        # Array-valued results are left out of the indices
+        self.lab.runExperiment(TrajectoryModel())
+        indices = self.nb.calculate_morris_indices()
+        self.assertItemsEqual(indices.index.get_level_values('result').unique(), LinearModel.SA_RESULTS)
+
+    def test_morris_indices(self):
+        self.lab.runExperiment(LinearModel())
+
+        self.assertItemsEqual(self.nb.uncertain_parameters(), LinearModel.SA_PARAMS)
+        indices = self.nb.calculate_morris_indices()
+        self.assertItemsEqual(indices.index.tolist(), [(p, r) for p in LinearModel.SA_PARAMS
+                                                       for r in LinearModel.SA_RESULTS])
+
+        y = indices.xs(LinearModel.RESULT_Y, level='result')
+        # Linear in x2, so every effect is the same
+        self.assertAlmostEqual(y.loc[LinearModel.PARAM_X2, MorrisJSONNotebook.MU], 1.0)
+        self.assertAlmostEqual(y.loc[LinearModel.PARAM_X2, MorrisJSONNotebook.MU_STAR], 1.0)
+        self.assertAlmostEqual(y.loc[LinearModel.PARAM_X2, MorrisJSONNotebook.SIGMA], 0.0)
+        # x1 interacts with x3, so its effects vary
+        self.assertTrue(10 < y.loc[LinearModel.PARAM_X1, MorrisJSONNotebook.MU_STAR] < 11)
+        self.assertGreater(y.loc[LinearModel.PARAM_X1, MorrisJSONNotebook.SIGMA], 0)
+        self.assertAlmostEqual(y.loc[LinearModel.PARAM_X4, MorrisJSONNotebook.MU_STAR], 0.0)
+
+        x4 = indices.xs(LinearModel.RESULT_X4, level='result')
+        self.assertAlmostEqual(x4.loc[LinearModel.PARAM_X4, MorrisJSONNotebook.MU_STAR], 1.0)
+
+    def test_influential_parameters(self):
+        self.lab.runExperiment(LinearModel())
+
+        self.assertEqual(self.nb.influential_parameters(0.2, [LinearModel.RESULT_Y]), [LinearModel.PARAM_X1])
+        self.assertItemsEqual(self.nb.influential_parameters(0.01, [LinearModel.RESULT_Y]),
+                              [LinearModel.PARAM_X1, LinearModel.PARAM_X2, LinearModel.PARAM_X3])
+        # x4 is the only parameter that matters to its result
+        self.assertItemsEqual(self.nb.influential_parameters(0.2), [LinearModel.PARAM_X1, LinearModel.PARAM_X4])
+
+        # Screened parameters go straight into an EFAST design
+        efast_nb = EFASTJSONNotebook('morris_efast.json', True)
+        try:
+            efast = EFASTLab(efast_nb)
+            for p in LinearModel.SA_PARAMS:
+                efast[p] = [0, 1, UNIFORM_DISTRIBUTION]
+            efast.set_sample_number(65)
+            efast.set_interference_factor(4)
+            efast.set_resample_number(1)
+            efast.set_required_parameters(self.nb.influential_parameters(0.2))
+            space = efast.parameterSpace()
+            self.assertItemsEqual(numpy.unique(space.column(EFASTJSONNotebook.PARAMETER_OF_INTEREST)),
+                                  [LinearModel.PARAM_X1, LinearModel.PARAM_X4])
+        finally:
+            for fn in ['morris_efast.json', 'morris_efast.json.journal']:
+                if os.path.exists(fn):
+                    os.remove(fn)
+
+
+class MorrisColumnarNotebookTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.filename = 'morriscolumnartest.json'
+
+    def tearDown(self):
+        import shutil
+        if os.path.exists(self.filename):
+            os.remove(self.filename)
+        if os.path.exists(self.filename + '.columns'):
+            shutil.rmtree(self.filename + '.columns')
+
+    def test_morris_indices(self):
+        nb = MorrisColumnarNotebook(self.filename, True)
+        lab = MorrisLab(nb)
+        for p in LinearModel.SA_PARAMS:
+            lab[p] = [0, 1, UNIFORM_DISTRIBUTION]
+        lab.set_trajectories(10)
+        lab.set_seed(2)
+        lab.runExperiment(LinearModel())
+
+        indices = MorrisColumnarNotebook(self.filename, False).calculate_morris_indices()
+        self.assertAlmostEqual(indices.loc[(LinearModel.PARAM_X2, LinearModel.RESULT_Y), MorrisJSONNotebook.MU_STAR],
+                               1.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
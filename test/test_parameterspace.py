@@ -0,0 +1,71 @@
+import unittest
+from epycsense import *
+import numpy
+
+
+class ArrayParameterSpaceTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.a = numpy.arange(25) * 0.5
+        self.b = numpy.array(['p', 'q', 'r', 's', 't'] * 5)
+        self.space = ArrayParameterSpace([('a', self.a), ('b', self.b)], {'c': 7})
+        self.space.CHUNK_SIZE = 4
+
+    def test_length(self):
+        self.assertEqual(len(self.space), 25)
+        self.assertEqual(len(ArrayParameterSpace([])), 0)
+
+    def test_iterate(self):
+        rows = list(self.space)
+        self.assertEqual(len(rows), 25)
+        for i, row in enumerate(rows):
+            self.assertEqual(row, {'a': self.a[i], 'b': self.b[i], 'c': 7})
+            # Values are plain Python types, as expected by the notebooks
+            self.assertIs(type(row['a']), float)
+            self.assertIs(type(row['b']), str)
+
+    def test_iterate_is_lazy(self):
+        it = iter(self.space)
+        self.assertEqual(next(it), {'a': 0.0, 'b': 'p', 'c': 7})
+
+    def test_getitem(self):
+        self.assertEqual(self.space[3], {'a': 1.5, 'b': 's', 'c': 7})
+        self.assertEqual(self.space[-1], {'a': 12.0, 'b': 't', 'c': 7})
+        with self.assertRaises(IndexError):
+            self.space[25]
+
+    def test_slice(self):
+        part = self.space[5:10]
+        self.assertEqual(len(part), 5)
+        self.assertEqual(list(part), list(self.space)[5:10])
+
+    def test_matrix(self):
+        space = ArrayParameterSpace([('a', self.a), ('d', self.a * 2)], {'c': 7})
+        self.assertEqual(space.matrix().shape, (25, 2))
+        self.assertTrue((space.matrix(['d']) == (self.a * 2)[:, numpy.newaxis]).all())
+        space.shuffle()
+        rows = list(space)
+        self.assertTrue((space.matrix()[:, 0] == [r['a'] for r in rows]).all())
+
+    def test_shuffle(self):
+        before = list(self.space)
+        self.space.shuffle()
+        after = list(self.space)
+        self.assertEqual(len(after), 25)
+        self.assertItemsEqual([r['a'] for r in after], [r['a'] for r in before])
+        for row in after:
+            self.assertIn(row, before)
+        self.assertItemsEqual(self.space.column('a'), self.a)
+        self.assertEqual(list(self.space.column('a')), [r['a'] for r in after])
+
+    def test_subset(self):
+        self.space.shuffle(3)
+        rows = list(self.space)
+        subset = self.space.subset(numpy.array([4, 0, 7]))
+        self.assertEqual(list(subset), [rows[4], rows[0], rows[7]])
+        mask = numpy.arange(25) % 2 == 0
+        self.assertEqual(list(self.space.subset(mask)), rows[::2])
+
+
+if __name__ == '__main__':
+    unittest.main()
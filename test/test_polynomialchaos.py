@@ -0,0 +1,96 @@
+import unittest
+from epycsense import *
+import numpy
+import os
+
+
+class IshigamiModel(epyc.Experiment):
+    PARAM_X1 = 'x1'
+    PARAM_X2 = 'x2'
+    PARAM_X3 = 'x3'
+    SA_PARAMS = [PARAM_X1, PARAM_X2, PARAM_X3]
+
+    RESULT_Y = 'y'
+    RESULT_X1 = 'y_x1'
+    SA_RESULTS = [RESULT_Y, RESULT_X1]
+    # Array-valued, so left out of the analysis
+    RESULT_TRAJECTORY = 'trajectory'
+
+    def do(self, params):
+        x1 = params[self.PARAM_X1]
+        x2 = params[self.PARAM_X2]
+        x3 = params[self.PARAM_X3]
+        return {IshigamiModel.RESULT_Y: numpy.sin(x1) + 7 * numpy.sin(x2) ** 2 + 0.1 * x3 ** 4 * numpy.sin(x1),
+                IshigamiModel.RESULT_X1: numpy.exp(x1),
+                IshigamiModel.RESULT_TRAJECTORY: [x1, x2, x3]}
+
+
+# Analytic indices of the Ishigami function (a = 7, b = 0.1) for x1, x2 and x3
+ISHIGAMI_S1 = [0.3139, 0.4424, 0.0]
+ISHIGAMI_ST = [0.5576, 0.4424, 0.2437]
+
+
+class PolynomialChaosTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.filename = 'polynomialchaostest.json'
+
+    def tearDown(self):
+        for fn in [self.filename, self.filename + '.journal']:
+            if os.path.exists(fn):
+                os.remove(fn)
+
+    def test_total_degree_indices(self):
+        indices = total_degree_indices(3, 2)
+        self.assertEqual(len(indices), 10)
+        self.assertEqual(indices[0].tolist(), [0, 0, 0])
+        self.assertTrue((indices.sum(axis=1) <= 2).all())
+        self.assertEqual(len(set(map(tuple, indices))), 10)
+        for (k, d) in [(3, 2), (5, 4), (1, 6)]:
+            self.assertEqual(total_degree_size(k, d), len(total_degree_indices(k, d)))
+        # Counted without building the indices
+        self.assertEqual(total_degree_size(50, 6), 32468436)
+
+    def test_polynomial_indices(self):
+        # y = z1 + 2 z2 + z1 z3 on uniform [-1, 1], with variances 1/3, 4/3 and 1/9
+        numpy.random.seed(1)
+        z = numpy.random.uniform(-1, 1, (200, 3))
+        y = z[:, 0] + 2 * z[:, 1] + z[:, 0] * z[:, 2]
+        indices, coefficients, loo_error = fit_polynomial_chaos(z, y[:, numpy.newaxis], 2)
+        self.assertLess(loo_error[0], 1e-20)
+
+        sobol = polynomial_chaos_indices(indices, coefficients)
+        total = 1 / 3.0 + 4 / 3.0 + 1 / 9.0
+        self.assertTrue(numpy.allclose(sobol[S1][:, 0], [1 / 3.0 / total, 4 / 3.0 / total, 0]))
+        self.assertTrue(numpy.allclose(sobol[ST][:, 0], [(1 / 3.0 + 1 / 9.0) / total, 4 / 3.0 / total,
+                                                         1 / 9.0 / total]))
+
+    def test_surrogate_sensitivity_indices(self):
+        nb = LatinHypercubeJSONNotebook(self.filename, True)
+        lab = LatinHypercubeLab(nb)
+        for p in IshigamiModel.SA_PARAMS:
+            lab[p] = [-numpy.pi, numpy.pi, UNIFORM_DISTRIBUTION]
+        lab.set_stratifications(1000)
+        lab.set_seed(1)
+        lab.runExperiment(IshigamiModel())
+
+        indices, errors = surrogate_sensitivity_indices(nb)
+        self.assertItemsEqual(errors.index, IshigamiModel.SA_RESULTS)
+        # The surrogate fits well, so can be trusted
+        self.assertLess(errors.loc[IshigamiModel.RESULT_Y, LOO_ERROR], 0.05)
+        self.assertLess(errors.loc[IshigamiModel.RESULT_X1, LOO_ERROR], 0.01)
+        for (p, s1, st) in zip(IshigamiModel.SA_PARAMS, ISHIGAMI_S1, ISHIGAMI_ST):
+            self.assertAlmostEqual(indices.loc[(p, IshigamiModel.RESULT_Y), S1], s1, delta=0.05)
+            self.assertAlmostEqual(indices.loc[(p, IshigamiModel.RESULT_Y), ST], st, delta=0.05)
+        # The dummy parameter has no effect
+        self.assertLess(indices.loc[(DUMMY, IshigamiModel.RESULT_Y), ST], 0.05)
+        self.assertAlmostEqual(indices.loc[(IshigamiModel.PARAM_X1, IshigamiModel.RESULT_X1), S1], 1.0, delta=0.01)
+
+        # A low-degree fit of the same runs is much less trustworthy
+        _, low = surrogate_sensitivity_indices(nb, degree=2)
+        self.assertGreater(low.loc[IshigamiModel.RESULT_Y, LOO_ERROR], 0.5)
+        self.assertEqual(low.loc[IshigamiModel.RESULT_Y, DEGREE], 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
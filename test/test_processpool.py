@@ -0,0 +1,92 @@
+import unittest
+from epycsense import *
+import numpy
+import os
+
+
+class Model(epyc.Experiment):
+    PARAM_X1 = 'x1'
+    PARAM_X2 = 'x2'
+    PARAM_FIX = 'fix'
+
+    RESULT_SUM = 'sum'
+    RESULT_PRODUCT = 'product'
+
+    def do(self, params):
+        return {Model.RESULT_SUM: params[self.PARAM_X1] + params[self.PARAM_X2],
+                Model.RESULT_PRODUCT: params[self.PARAM_X1] * params[self.PARAM_X2] * params[self.PARAM_FIX]}
+
+
+class ProcessPoolLabTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.filenames = ['processpool_serial.json', 'processpool_parallel.json']
+
+    def tearDown(self):
+        for fn in self.filenames:
+            if os.path.exists(fn):
+                os.remove(fn)
+
+    def setup_lab(self, lab):
+        lab[Model.PARAM_X1] = [0, 10, UNIFORM_DISTRIBUTION]
+        lab[Model.PARAM_X2] = [5, 1, NORMAL_DISTRIBUTION]
+        lab[Model.PARAM_FIX] = 3
+        lab.set_seed(8)
+
+    def sorted_table(self, nb):
+        df = nb.dataframe_aggregated()
+        return df.sort_values(by=list(sorted(df.columns))).reset_index(drop=True)[sorted(df.columns)]
+
+    def test_lhs(self):
+        serial = LatinHypercubeJSONNotebook(self.filenames[0], True)
+        lab = LatinHypercubeLab(serial)
+        self.setup_lab(lab)
+        lab.set_stratifications(101)
+        lab.runExperiment(Model())
+
+        for ordered in [True, False]:
+            parallel = LatinHypercubeJSONNotebook(self.filenames[1], True)
+            lab = LatinHypercubeProcessPoolLab(parallel)
+            self.setup_lab(lab)
+            lab.set_stratifications(101)
+            lab.set_processes(3)
+            lab.set_chunk_size(7)
+            lab.set_ordered(ordered)
+            lab.runExperiment(Model())
+
+            self.assertEqual(parallel.numberOfResults(), 101)
+            self.assertTrue(self.sorted_table(parallel).equals(self.sorted_table(serial)))
+            if ordered:
+                self.assertEqual([r[epyc.Experiment.PARAMETERS] for r in parallel.results()],
+                                 [r[epyc.Experiment.PARAMETERS] for r in serial.results()])
+
+            # Results are committed
+            reloaded = LatinHypercubeJSONNotebook(self.filenames[1], False)
+            self.assertEqual(reloaded.numberOfResults(), 101)
+
+    def test_efast(self):
+        nbs = []
+        for (fn, cls) in zip(self.filenames, [EFASTLab, EFASTProcessPoolLab]):
+            nb = EFASTJSONNotebook(fn, True)
+            lab = cls(nb)
+            self.setup_lab(lab)
+            lab.set_sample_number(65)
+            lab.set_resample_number(2)
+            lab.set_interference_factor(4)
+            lab.runExperiment(Model())
+            nbs.append(nb)
+        self.assertEqual(nbs[0].generate_sensitivity_indices(), nbs[1].generate_sensitivity_indices())
+
+    def test_scatter(self):
+        nb = ScatterJSONNotebook(self.filenames[1], True)
+        lab = ScatterProcessPoolLab(nb)
+        lab[Model.PARAM_X1] = [1, 2, 3, 4]
+        lab[Model.PARAM_X2] = [5, 6, 7]
+        lab[Model.PARAM_FIX] = 2
+        lab.set_processes(2)
+        lab.runExperiment(Model())
+        self.assertEqual(nb.numberOfResults(), 3 + 2 + 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,49 @@
+import unittest
+from epycsense import *
+import numpy
+import scipy.stats as stats
+import os
+
+
+class RBDFASTLabTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.filename = 'rbdfastlabtest.json'
+        self.nb = RBDFASTJSONNotebook(self.filename, True)
+        self.lab = RBDFASTLab(self.nb)
+        self.lab['x1'] = [0, 10, UNIFORM_DISTRIBUTION]
+        self.lab['x2'] = [5, 1, NORMAL_DISTRIBUTION]
+        self.lab['x3'] = [0.5, 1, LOGNORMAL_DISTRIBUTION]
+        self.lab['fix'] = 3
+
+    def tearDown(self):
+        for fn in [self.filename, self.filename + '.journal']:
+            if os.path.exists(fn):
+                os.remove(fn)
+
+    def test_parameter_space(self):
+        self.lab.set_sample_number(100)
+        self.lab.set_seed(5)
+        space = self.lab.parameterSpace()
+        # A single design of N runs, whatever the number of parameters
+        self.assertEqual(len(space), 100)
+        self.assertEqual(len(self.lab), 100)
+        self.assertItemsEqual(space.names(), ['x1', 'x2', 'x3'])
+        self.assertEqual(space.constants(), {'fix': 3})
+
+        x1 = space.column('x1')
+        self.assertTrue((x1 > 0).all() and (x1 < 10).all())
+        self.assertTrue((space.column('x3') > 0).all())
+        # Every parameter follows the same search curve, in its own order
+        curve = numpy.sort(x1)
+        self.assertFalse((x1 == curve).all())
+        self.assertTrue(numpy.allclose(numpy.sort(space.column('x2')),
+                                       numpy.sort(5 + stats.norm.ppf(curve / 10.0))))
+        self.assertFalse((numpy.argsort(x1) == numpy.argsort(space.column('x2'))).all())
+
+        # Reproducible
+        self.assertEqual(list(self.lab.parameterSpace()), list(space))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,92 @@
+import unittest
+from epycsense import *
+import numpy
+import os
+
+
+class IshigamiModel(epyc.Experiment):
+    PARAM_X1 = 'x1'
+    PARAM_X2 = 'x2'
+    PARAM_X3 = 'x3'
+    PARAM_X4 = 'x4'
+    SA_PARAMS = [PARAM_X1, PARAM_X2, PARAM_X3, PARAM_X4]
+
+    RESULT_Y = 'y'
+    RESULT_X4 = 'y_x4'
+    SA_RESULTS = [RESULT_Y, RESULT_X4]
+
+    def do(self, params):
+        x1 = params[self.PARAM_X1]
+        x2 = params[self.PARAM_X2]
+        x3 = params[self.PARAM_X3]
+        return {IshigamiModel.RESULT_Y: numpy.sin(x1) + 7 * numpy.sin(x2) ** 2 + 0.1 * x3 ** 4 * numpy.sin(x1),
+                IshigamiModel.RESULT_X4: params[self.PARAM_X4]}
+
+
+class TrajectoryModel(IshigamiModel):
+    # An array-valued result alongside the scalar ones
+    RESULT_TRAJECTORY = 'trajectory'
+
+    def do(self, params):
+        results = IshigamiModel.do(self, params)
+        results[TrajectoryModel.RESULT_TRAJECTORY] = [params[p] for p in self.SA_PARAMS]
+        return results
+
+
+# Analytic first-order indices of the Ishigami function (a = 7, b = 0.1) for x1, x2 and x3 (x4 has no effect)
+ISHIGAMI_S1 = [0.3139, 0.4424, 0.0, 0.0]
+
+
+class RBDFASTJSONNotebookTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.filename = 'rbdfastnotebooktest.json'
+
+    def tearDown(self):
+        for fn in [self.filename, self.filename + '.journal']:
+            if os.path.exists(fn):
+                os.remove(fn)
+
+    def test_rbd_fast_indices(self):
+        # Additive model, whose first-order indices are its share of the variance
+        numpy.random.seed(3)
+        x = numpy.random.uniform(0, 1, (4000, 3))
+        y = numpy.column_stack([x[:, 0] + 2 * x[:, 1], x[:, 2]])
+        S1 = rbd_fast_indices(x, y)
+        self.assertEqual(S1.shape, (3, 2))
+        self.assertTrue(numpy.allclose(S1[:, 0], [0.2, 0.8, 0.0], atol=0.03))
+        self.assertTrue(numpy.allclose(S1[:, 1], [0.0, 0.0, 1.0], atol=0.03))
+
+    def test_analyse(self):
+        nb = RBDFASTJSONNotebook(self.filename, True)
+        lab = RBDFASTLab(nb)
+        for p in IshigamiModel.SA_PARAMS:
+            lab[p] = [-numpy.pi, numpy.pi, UNIFORM_DISTRIBUTION]
+        lab.set_sample_number(2000)
+        lab.set_seed(1)
+        lab.runExperiment(IshigamiModel())
+
+        indices = nb.calculate_sensitivity_indices()
+        self.assertItemsEqual(indices.index.tolist(), [(p, r) for p in IshigamiModel.SA_PARAMS
+                                                       for r in IshigamiModel.SA_RESULTS])
+        S1 = indices[RBDFASTJSONNotebook.S1]
+        for (p, s) in zip(IshigamiModel.SA_PARAMS, ISHIGAMI_S1):
+            self.assertAlmostEqual(S1[(p, IshigamiModel.RESULT_Y)], s, delta=0.05)
+        self.assertAlmostEqual(S1[(IshigamiModel.PARAM_X4, IshigamiModel.RESULT_X4)], 1.0, delta=0.02)
+
+    def test_array_result(self):
+        nb = RBDFASTJSONNotebook(self.filename, True)
+        lab = RBDFASTLab(nb)
+        for p in IshigamiModel.SA_PARAMS:
+            lab[p] = [-numpy.pi, numpy.pi, UNIFORM_DISTRIBUTION]
+        lab.set_sample_number(200)
+        lab.set_seed(1)
+        lab.runExperiment(TrajectoryModel())
+
+        # Array-valued results are left out of the indices
+        indices = nb.calculate_sensitivity_indices()
+        self.assertItemsEqual(indices.index.get_level_values('result').unique(), IshigamiModel.SA_RESULTS)
+
+
+if __name__ == '__main__':
+    unittest.main()
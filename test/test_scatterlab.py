@@ -91,6 +91,53 @@ class ScatterLabTestCase(unittest.TestCase):
                     vals[q] = params[q][len(params[q])/2]
                 self.assertTrue(vals in param_samples)
 
+    def test_float_grid(self):
+        # Values are placed by position, so values equal to the baseline (as floats) still give one point each
+        params = {'a': [0.0, -0.0, 0.5], 'b': list(numpy.linspace(0, 1, 7)), 'c': [3]}
+        ps = oat_parameter_space(params)
+
+        self.assertEqual(len(ps), 2 + 6 + 1)
+        varied = ps.varied()
+        self.assertItemsEqual(varied, ['a'] * 2 + ['b'] * 6 + [NO_VARIED_PARAMETER])
+        for (point, p) in zip(ps, varied):
+            self.assertEqual(point['c'], 3)
+            for q in ['a', 'b']:
+                if q != p:
+                    self.assertEqual(point[q], params[q][len(params[q]) / 2])
+        self.assertItemsEqual([point['b'] for (point, p) in zip(ps, varied) if p == 'b'],
+                              params['b'][:3] + params['b'][4:])
+
+        # Which parameter each point varies is kept when resuming part of the design
+        sub = ps.subset(numpy.arange(len(ps)) % 2 == 0)
+        self.assertEqual(sub.varied().tolist(), varied[::2].tolist())
+
+    def test_trajectories(self):
+        params = {'a': range(4), 'b': range(6), 'c': range(5), 'd': 1}
+        self.lab.set_trajectories(20)
+        self.lab.set_seed(3)
+        for k, v in params.iteritems():
+            self.lab[k] = v
+        ps = self.lab.parameterSpace()
+        self.assertEqual(len(ps), 20 * 4)
+
+        points = list(ps)
+        varied = ps.varied()
+        for t in range(20):
+            trajectory = points[t * 4:(t + 1) * 4]
+            self.assertEqual(varied[t * 4], NO_VARIED_PARAMETER)
+            # Each parameter is moved once, by half its number of levels
+            self.assertItemsEqual(varied[t * 4 + 1:(t + 1) * 4], ['a', 'b', 'c'])
+            for i in range(1, 4):
+                p = varied[t * 4 + i]
+                self.assertEqual([q for q in params if trajectory[i][q] != trajectory[i - 1][q]], [p])
+                self.assertEqual(abs(trajectory[i][p] - trajectory[i - 1][p]), len(params[p]) / 2)
+            for point in trajectory:
+                for q in params:
+                    self.assertIn(point[q], params[q] if isinstance(params[q], list) else [params[q]])
+
+        # Reproducible
+        self.assertEqual(list(self.lab.parameterSpace()), points)
+
 # TODO - testing cluster would require an ipcluster to be running
 # class ScatterClusterLabTestCase(unittest.TestCase):
 #
@@ -3,6 +3,8 @@ from epycsense import *
 import numpy
 import os
 import json
+import shutil
+import tempfile
 
 
 class Model(epyc.Experiment):
@@ -40,12 +42,17 @@ class ScatterJSONNotebookTestCase(unittest.TestCase):
         self.rep_filename = 'scatterlabtest_repetitions.json'
         self.rep_nb = ScatterJSONNotebook(self.filename, True)
 
+        self.columnar_filename = 'scatterlabtest_columnar.json'
+
     def tearDown(self):
         # # Get rid of json file
         if os.path.exists(self.filename):
             os.remove(self.filename)
         if os.path.exists(self.rep_filename):
             os.remove(self.rep_filename)
+        if os.path.exists(self.columnar_filename):
+            os.remove(self.columnar_filename)
+        shutil.rmtree(self.columnar_filename + '.columns', ignore_errors=True)
 
     def test_initialise(self):
         pass
@@ -76,6 +83,81 @@ class ScatterJSONNotebookTestCase(unittest.TestCase):
 
         self.rep_nb.plot_scatter_graphs(folder='scatter_reps')
 
+    def test_scatter_series(self):
+        params = {Model.PARAM_X1: range(0, 10),
+                  Model.PARAM_X2: range(0, 10),
+                  Model.PARAM_X3: range(0, 10),
+                  Model.PARAM_FIX: 4}
+        lab = ScatterLab(self.nb)
+        for k, v in params.iteritems():
+            lab[k] = v
+        lab.runExperiment(epyc.RepeatedExperiment(Model(), 5))
+
+        series = self.nb.scatter_series()
+        self.assertItemsEqual(series.keys(), [(p, r) for p in [Model.PARAM_X1, Model.PARAM_X2, Model.PARAM_X3]
+                                              for r in Model.SA_RESULTS])
+        for ((p, r), (x_data, y_data)) in series.iteritems():
+            # Every value of the parameter once, with the others at their baseline
+            self.assertItemsEqual(x_data, range(0, 10))
+            self.assertEqual(len(y_data), 10)
+        x_data, y_data = series[(Model.PARAM_X1, Model.RESULT_2_X1)]
+        numpy.testing.assert_array_almost_equal(y_data, 4 * x_data)
+
+    def test_baselines(self):
+        # The baseline is the middle of each list as given, not of the sorted values
+        params = {Model.PARAM_X1: [9, 0, 5, 3],
+                  Model.PARAM_X2: [2, 7, 1],
+                  Model.PARAM_X3: [1],
+                  Model.PARAM_FIX: 4}
+        for nb in [self.nb, ScatterColumnarNotebook(self.columnar_filename, True)]:
+            lab = ScatterLab(nb)
+            for k, v in params.iteritems():
+                lab[k] = v
+            lab.runExperiment(Model())
+
+            nb_post = nb.__class__(nb.name(), False)
+            self.assertEqual(nb_post.baselines(), {Model.PARAM_X1: 5, Model.PARAM_X2: 7})
+            series = nb_post.scatter_series()
+            self.assertItemsEqual(series[(Model.PARAM_X1, Model.RESULT_2_X1)][0], [9, 0, 5, 3])
+            self.assertItemsEqual(series[(Model.PARAM_X2, Model.RESULT_2_X1)][0], [2, 7, 1])
+            # Only the points varying x1 (and the baseline) are in its graph
+            numpy.testing.assert_array_almost_equal(series[(Model.PARAM_X1, Model.RESULT_2_X1)][1],
+                                                    4 * series[(Model.PARAM_X1, Model.RESULT_2_X1)][0])
+
+        # Baselines not recorded (e.g. in an older notebook) are worked out from the results
+        for recorded in [{}, {Model.PARAM_X1: 5}]:
+            self.nb.set_baselines(recorded)
+            series = self.nb.scatter_series()
+            self.assertItemsEqual(series[(Model.PARAM_X1, Model.RESULT_2_X1)][0], [9, 0, 5, 3])
+            self.assertItemsEqual(series[(Model.PARAM_X2, Model.RESULT_2_X1)][0], [2, 7, 1])
+
+        # A design of trajectories has no baselines
+        lab = ScatterLab(self.nb)
+        for k, v in params.iteritems():
+            lab[k] = v
+        lab.set_trajectories(2)
+        lab.parameterSpace()
+        self.assertEqual(self.nb.baselines(), {})
+
+    def test_plot_scatter_graphs_parallel(self):
+        params = {Model.PARAM_X1: range(0, 10),
+                  Model.PARAM_X2: range(0, 10),
+                  Model.PARAM_X3: range(0, 10),
+                  Model.PARAM_FIX: 4}
+        lab = ScatterLab(self.nb)
+        for k, v in params.iteritems():
+            lab[k] = v
+        lab.runExperiment(Model())
+
+        folder = tempfile.mkdtemp()
+        try:
+            self.nb.plot_scatter_graphs(folder=folder, processes=2)
+            self.assertItemsEqual(os.listdir(folder), ['{0}_{1}.png'.format(p, r)
+                                                       for p in [Model.PARAM_X1, Model.PARAM_X2, Model.PARAM_X3]
+                                                       for r in Model.SA_RESULTS])
+        finally:
+            shutil.rmtree(folder)
+
 
 if __name__ == '__main__':
     unittest.main()
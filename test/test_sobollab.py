@@ -0,0 +1,92 @@
+import unittest
+from epycsense import *
+import numpy
+import os
+
+
+class Model(epyc.Experiment):
+    PARAM_X1 = 'x1'
+    PARAM_X2 = 'x2'
+    PARAM_X3 = 'x3'
+    PARAM_FIX = 'fix'
+    SA_PARAMS = [PARAM_X1, PARAM_X2, PARAM_X3, PARAM_FIX]
+
+    RESULT_SUM = 'sum'
+    SA_RESULTS = [RESULT_SUM]
+
+    def do(self, params):
+        return {Model.RESULT_SUM: params[self.PARAM_X1] + params[self.PARAM_X2] + params[self.PARAM_X3]}
+
+
+class SobolLabTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.filename = 'sobollabtest.json'
+        self.nb = SobolJSONNotebook(self.filename, True)
+        self.lab = SobolLab(self.nb)
+        self.lab[Model.PARAM_X1] = [0, 10, UNIFORM_DISTRIBUTION]
+        self.lab[Model.PARAM_X2] = [5, 1, NORMAL_DISTRIBUTION]
+        self.lab[Model.PARAM_X3] = [0.5, 1, LOGNORMAL_DISTRIBUTION]
+        self.lab[Model.PARAM_FIX] = 3
+
+    def tearDown(self):
+        if os.path.exists(self.filename):
+            os.remove(self.filename)
+
+    def test_parameter_space(self):
+        self.lab.set_sample_number(10)
+        space = self.lab.parameterSpace()
+        self.assertEqual(len(space), 10 * (2 * 3 + 2))
+        self.assertEqual(len(self.lab), len(space))
+
+        uncertain = [Model.PARAM_X1, Model.PARAM_X2, Model.PARAM_X3]
+        matrices = space.column(SobolJSONNotebook.MATRIX)
+        matrix_parameters = space.column(SobolJSONNotebook.MATRIX_PARAMETER)
+        rows = space.column(SobolJSONNotebook.SAMPLE_ROW)
+        x = numpy.column_stack([space.column(p) for p in uncertain])
+
+        A = x[matrices == SobolJSONNotebook.MATRIX_A]
+        B = x[matrices == SobolJSONNotebook.MATRIX_B]
+        self.assertTrue((rows[matrices == SobolJSONNotebook.MATRIX_A] == numpy.arange(10)).all())
+        self.assertTrue((A[:, 0] >= 0).all() and (A[:, 0] <= 10).all())
+        self.assertTrue((A[:, 2] > 1).all())
+
+        for (i, p) in enumerate(uncertain):
+            # AB_i is A with column i from B, BA_i is B with column i from A
+            AB = x[(matrices == SobolJSONNotebook.MATRIX_AB) & (matrix_parameters == p)]
+            BA = x[(matrices == SobolJSONNotebook.MATRIX_BA) & (matrix_parameters == p)]
+            expected_AB = A.copy()
+            expected_AB[:, i] = B[:, i]
+            expected_BA = B.copy()
+            expected_BA[:, i] = A[:, i]
+            self.assertTrue((AB == expected_AB).all())
+            self.assertTrue((BA == expected_BA).all())
+
+        for row in space:
+            self.assertEqual(row[Model.PARAM_FIX], 3)
+
+    def test_parameter_space_first_order(self):
+        self.lab.set_sample_number(10)
+        self.lab.set_second_order(False)
+        space = self.lab.parameterSpace()
+        self.assertEqual(len(space), 10 * (3 + 2))
+        self.assertEqual(len(self.lab), len(space))
+        self.assertFalse((space.column(SobolJSONNotebook.MATRIX) == SobolJSONNotebook.MATRIX_BA).any())
+
+    def test_run(self):
+        self.lab.set_sample_number(5)
+        self.lab.runExperiment(Model())
+        self.assertEqual(self.nb.numberOfResults(), 40)
+        self.assertItemsEqual(self.nb.uncertain_parameters(), [Model.PARAM_X1, Model.PARAM_X2, Model.PARAM_X3])
+
+
+    def test_seed(self):
+        self.lab.set_sample_number(10)
+        self.lab.set_seed(5)
+        self.assertEqual(list(self.lab.parameterSpace()), list(self.lab.parameterSpace()))
+        self.assertNotEqual(list(self.lab.parameterSpace()),
+                            saltelli_samples(10, self.lab._parameters, seed=6))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,147 @@
+import unittest
+from epycsense import *
+import numpy
+import os
+
+
+class IshigamiModel(epyc.Experiment):
+    PARAM_X1 = 'x1'
+    PARAM_X2 = 'x2'
+    PARAM_X3 = 'x3'
+    SA_PARAMS = [PARAM_X1, PARAM_X2, PARAM_X3]
+
+    RESULT_Y = 'y'
+    RESULT_X1 = 'y_x1'
+    SA_RESULTS = [RESULT_Y, RESULT_X1]
+
+    def do(self, params):
+        x1 = params[self.PARAM_X1]
+        x2 = params[self.PARAM_X2]
+        x3 = params[self.PARAM_X3]
+        return {IshigamiModel.RESULT_Y: numpy.sin(x1) + 7 * numpy.sin(x2) ** 2 + 0.1 * x3 ** 4 * numpy.sin(x1),
+                IshigamiModel.RESULT_X1: x1}
+
+
+class TrajectoryModel(IshigamiModel):
+    # An array-valued result alongside the scalar ones
+    RESULT_TRAJECTORY = 'trajectory'
+
+    def do(self, params):
+        results = IshigamiModel.do(self, params)
+        results[TrajectoryModel.RESULT_TRAJECTORY] = [params[p] for p in self.SA_PARAMS]
+        return results
+
+
+# Analytic indices of the Ishigami function (a = 7, b = 0.1) for x1, x2 and x3
+ISHIGAMI_S1 = [0.3139, 0.4424, 0.0]
+ISHIGAMI_ST = [0.5576, 0.4424, 0.2437]
+ISHIGAMI_S13 = 0.2437
+
+
+class SobolIndicesTestCase(unittest.TestCase):
+
+    def ishigami(self, x):
+        return numpy.sin(x[..., 0]) + 7 * numpy.sin(x[..., 1]) ** 2 + 0.1 * x[..., 2] ** 4 * numpy.sin(x[..., 0])
+
+    def test_sobol_indices(self):
+        numpy.random.seed(2)
+        N = 20000
+        A = numpy.random.uniform(-numpy.pi, numpy.pi, (N, 3))
+        B = numpy.random.uniform(-numpy.pi, numpy.pi, (N, 3))
+        AB = numpy.array([numpy.where(numpy.arange(3) == i, B, A) for i in range(3)])
+        BA = numpy.array([numpy.where(numpy.arange(3) == i, A, B) for i in range(3)])
+
+        indices = sobol_indices(self.ishigami(A)[:, numpy.newaxis], self.ishigami(B)[:, numpy.newaxis],
+                                self.ishigami(AB)[..., numpy.newaxis], self.ishigami(BA)[..., numpy.newaxis])
+        self.assertTrue(numpy.allclose(indices[SobolJSONNotebook.S1][:, 0], ISHIGAMI_S1, atol=0.03))
+        self.assertTrue(numpy.allclose(indices[SobolJSONNotebook.ST][:, 0], ISHIGAMI_ST, atol=0.03))
+        self.assertAlmostEqual(indices[SobolJSONNotebook.S2][0, 2, 0], ISHIGAMI_S13, delta=0.03)
+        self.assertAlmostEqual(indices[SobolJSONNotebook.S2][0, 1, 0], 0.0, delta=0.03)
+        self.assertTrue(numpy.isnan(indices[SobolJSONNotebook.S2][1, 1, 0]))
+
+        # Leading axes are estimated independently
+        stacked = sobol_indices(numpy.array([self.ishigami(A)[:, numpy.newaxis]] * 2),
+                                numpy.array([self.ishigami(B)[:, numpy.newaxis]] * 2),
+                                numpy.array([self.ishigami(AB)[..., numpy.newaxis]] * 2).swapaxes(0, 1))
+        self.assertTrue(numpy.allclose(stacked[SobolJSONNotebook.S1][:, 1], indices[SobolJSONNotebook.S1]))
+
+    def test_confidence_intervals_seed(self):
+        numpy.random.seed(2)
+        N = 200
+        A = numpy.random.uniform(-numpy.pi, numpy.pi, (N, 3))
+        B = numpy.random.uniform(-numpy.pi, numpy.pi, (N, 3))
+        AB = numpy.array([numpy.where(numpy.arange(3) == i, B, A) for i in range(3)])
+        outputs = (self.ishigami(A)[:, numpy.newaxis], self.ishigami(B)[:, numpy.newaxis],
+                   self.ishigami(AB)[..., numpy.newaxis])
+
+        first = sobol_confidence_intervals(*outputs, resamples=50, seed=7)
+        # Draws from the global random state in between don't affect seeded intervals
+        numpy.random.uniform()
+        second = sobol_confidence_intervals(*outputs, resamples=50, seed=7)
+        other = sobol_confidence_intervals(*outputs, resamples=50, seed=8)
+        for index in [SobolJSONNotebook.S1, SobolJSONNotebook.ST]:
+            self.assertTrue(numpy.array_equal(first[index], second[index]))
+            self.assertFalse(numpy.array_equal(first[index], other[index]))
+
+
+class SobolJSONNotebookTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.filename = 'sobolnotebooktest.json'
+
+    def tearDown(self):
+        if os.path.exists(self.filename):
+            os.remove(self.filename)
+
+    def test_calculate_sensitivity_indices(self):
+        numpy.random.seed(3)
+        nb = SobolJSONNotebook(self.filename, True)
+        lab = SobolLab(nb)
+        for p in IshigamiModel.SA_PARAMS:
+            lab[p] = [-numpy.pi, numpy.pi, UNIFORM_DISTRIBUTION]
+        lab.set_sample_number(500)
+        lab.runExperiment(IshigamiModel())
+
+        indices = nb.calculate_sensitivity_indices(resamples=200)
+        self.assertItemsEqual(indices.columns, [SobolJSONNotebook.S1, SobolJSONNotebook.S1_CONF,
+                                                SobolJSONNotebook.ST, SobolJSONNotebook.ST_CONF])
+        for (p, s1, st) in zip(IshigamiModel.SA_PARAMS, ISHIGAMI_S1, ISHIGAMI_ST):
+            row = indices.loc[(p, IshigamiModel.RESULT_Y)]
+            self.assertAlmostEqual(row[SobolJSONNotebook.S1], s1, delta=0.15)
+            self.assertAlmostEqual(row[SobolJSONNotebook.ST], st, delta=0.15)
+            self.assertTrue(0 < row[SobolJSONNotebook.S1_CONF] < 0.3)
+        # A result depending only on x1
+        self.assertAlmostEqual(indices.loc[(IshigamiModel.PARAM_X1, IshigamiModel.RESULT_X1), SobolJSONNotebook.S1],
+                               1.0, delta=0.15)
+        self.assertAlmostEqual(indices.loc[(IshigamiModel.PARAM_X2, IshigamiModel.RESULT_X1), SobolJSONNotebook.ST],
+                               0.0)
+
+        second = nb.calculate_second_order_indices(resamples=200)
+        self.assertEqual(len(second), 3 * 2)
+        self.assertAlmostEqual(second.loc[(IshigamiModel.PARAM_X1, IshigamiModel.PARAM_X3, IshigamiModel.RESULT_Y),
+                                          SobolJSONNotebook.S2], ISHIGAMI_S13, delta=0.2)
+
+        # The same seed gives the same intervals
+        seeded = nb.calculate_sensitivity_indices(resamples=50, seed=5)
+        self.assertTrue(seeded.equals(nb.calculate_sensitivity_indices(resamples=50, seed=5)))
+        seeded = nb.calculate_second_order_indices(resamples=50, seed=5)
+        self.assertTrue(seeded.equals(nb.calculate_second_order_indices(resamples=50, seed=5)))
+
+    def test_array_result(self):
+        nb = SobolJSONNotebook(self.filename, True)
+        lab = SobolLab(nb)
+        for p in IshigamiModel.SA_PARAMS:
+            lab[p] = [-numpy.pi, numpy.pi, UNIFORM_DISTRIBUTION]
+        lab.set_sample_number(50)
+        lab.set_seed(1)
+        lab.runExperiment(TrajectoryModel())
+
+        # Array-valued results are left out of the indices
+        indices = nb.calculate_sensitivity_indices(resamples=10, seed=1)
+        self.assertItemsEqual(indices.index.get_level_values('result').unique(), IshigamiModel.SA_RESULTS)
+        second = nb.calculate_second_order_indices(resamples=10, seed=1)
+        self.assertItemsEqual(second.index.get_level_values('result').unique(), IshigamiModel.SA_RESULTS)
+
+
+if __name__ == '__main__':
+    unittest.main()
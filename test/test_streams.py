@@ -0,0 +1,32 @@
+import unittest
+from epycsense import *
+import numpy
+
+
+class StreamsTestCase(unittest.TestCase):
+
+    def test_resolve_seed(self):
+        self.assertIsNone(resolve_seed(None))
+        self.assertEqual(resolve_seed(42), 42)
+        self.assertEqual(resolve_seed(numpy.random.RandomState(1)), resolve_seed(numpy.random.RandomState(1)))
+        self.assertRaises(AssertionError, resolve_seed, -1)
+
+    def test_uniform_rows_chunks(self):
+        rows = uniform_rows(7, 0, 3 * BLOCK_SIZE + 17, 4)
+        self.assertEqual(rows.shape, (3 * BLOCK_SIZE + 17, 4))
+        # Any split of the rows gives exactly the same numbers
+        for size in [1, 100, BLOCK_SIZE, BLOCK_SIZE + 1]:
+            chunks = [uniform_rows(7, start, min(start + size, len(rows)), 4) for start in range(0, len(rows), size)]
+            self.assertTrue((numpy.concatenate(chunks) == rows).all())
+
+    def test_uniform_rows_streams(self):
+        a = uniform_rows(7, 0, 10, 3)
+        self.assertTrue((uniform_rows(7, 0, 10, 3) == a).all())
+        self.assertFalse((uniform_rows(8, 0, 10, 3) == a).any())
+        self.assertFalse((uniform_rows(7, 0, 10, 3, stream=ORDER_STREAM) == a).any())
+        self.assertEqual(uniform_rows(None, 0, 10, 3).shape, (10, 3))
+        self.assertEqual(uniform_rows(7, 5, 5, 3).shape, (0, 3))
+
+
+if __name__ == '__main__':
+    unittest.main()